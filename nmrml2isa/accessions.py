@@ -0,0 +1,91 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module normalises the accessions of the CV terms found in nmrML
+files (such as ``NMR:1000031`` or ``UO_0000325``) to the URLs used in
+ISA-Tab files.
+
+Conversions are memoised in a bounded table, since the same few hundred
+accessions appear in every file of a study. `Record` objects convert their
+``accession`` when it is set, so extracted metadata never needs a second
+pass; `urllize` converts the accessions of metadata built from plain
+dictionaries.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+from . import __version__, __author__, __email__
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+#: the maximum number of memoised accession URLs
+MEMO_SIZE = 4096
+
+#: the URL prefixes of accessions, by accession prefix
+PREFIXES = [
+    ('NMR', 'http://nmrML.org/nmrCV#', False),
+    ('UO', 'http://purl.obolibrary.org/obo/', True),
+    ('CHEBI', 'http://purl.obolibrary.org/obo/', True),
+    ('C', 'http://ncicb.nci.nih.gov/xml/owl/EVS/Thesaurus.owl#', True),
+]
+
+_urls = {}
+
+
+def _convert(accession):
+    for prefix, url, underscore in PREFIXES:
+        if accession.startswith(prefix):
+            return url + (accession.replace(':', '_') if underscore else accession)
+    return accession
+
+
+def accession_url(accession):
+    """Get the URL of an accession.
+
+    Accessions that already are URLs, and accessions from unknown
+    ontologies, are returned unchanged.
+
+    Example:
+        >>> accession_url('UO:0000325')
+        'http://purl.obolibrary.org/obo/UO_0000325'
+    """
+    try:
+        return _urls[accession]
+    except KeyError:
+        pass
+    url = accession if 'http' in accession else _convert(accession)
+    if len(_urls) >= MEMO_SIZE:
+        _urls.clear()
+    _urls[accession] = url
+    return url
+
+
+def urllize(meta):
+    """Convert the accessions of the terms of *meta* to URLs, in place.
+
+    Arguments:
+        meta (Mapping): a metadata dictionary, the values of which are
+            terms, values, or ``entry_list`` mappings of terms
+    """
+    stack = [value for value in meta.values() if isinstance(value, Mapping)]
+    while stack:
+        mapping = stack.pop()
+        for key, value in mapping.items():
+            if isinstance(value, Mapping):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(x for x in value if isinstance(x, Mapping))
+            elif key == 'accession':
+                mapping[key] = accession_url(value)
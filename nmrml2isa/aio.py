@@ -0,0 +1,339 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes an `asyncio` API to nmrml2isa: **convert**, the
+counterpart of `nmrml2isa.parsing.convert`, and **iter_metadata**, an
+asynchronous iterator over the metadata of nmrML files, yielded as soon as
+each file is parsed.
+
+Files are read in an I/O executor, and their metadata is extracted in
+another executor (either can be a thread or a process pool, and both
+default to the default executor of the event loop), so that the event loop
+is never blocked. At most *max_in_flight* files are being read, parsed or
+waiting to be consumed at once, which bounds the memory used whatever the
+number of files. Cancelling a conversion (or closing an iterator) cancels
+the reads and extractions that have not started yet. A conversion writes
+its files to a temporary directory next to the output, and only moves them
+into place once all of them were written, so that a cancelled or failed
+conversion leaves the output directory as it was.
+
+This module requires Python 3.5 or later.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import asyncio
+import concurrent.futures
+import io
+import os
+import shutil
+import tempfile
+import warnings
+
+from . import __version__, __author__, __email__
+from .isa import ISA_Tab
+from .nmrml import nmrMLmeta
+from .ontology import load_index
+from .parsing import find_files
+from .prefetch import read_source
+from .usermeta import UserMetaLoader
+from .utils import NMR_CV_PATH
+
+
+#: the default maximum number of files read or parsed at once
+MAX_IN_FLIGHT = 8
+
+# the ontology index of a worker process, loaded by its first extraction
+_worker_ontology = None
+
+
+def _extract(source, data, ontology, options):
+    """Extract the metadata of a file read in memory.
+
+    *ontology* is `None` when extracting in a worker process, which then
+    loads its own index once instead of receiving it with each file.
+    """
+    global _worker_ontology
+    if ontology is None:
+        if _worker_ontology is None:
+            _worker_ontology = load_index(NMR_CV_PATH)
+        ontology = _worker_ontology
+    handle = io.BytesIO(data)
+    handle.name, handle.size = getattr(source, 'name', source), len(data)
+    return nmrMLmeta(handle, ontology, **options).meta
+
+
+class MetadataIterator(object):
+    """An asynchronous iterator over the metadata of nmrML files.
+
+    Use `iter_metadata` to create one.
+    """
+
+    def __init__(self, in_path, ontology, executor, io_executor, max_in_flight, ordered, options):
+        self.in_path = in_path
+        self.files = None
+        self._sources = None
+        self._reader = None
+        self._ontology = ontology
+        self._executor = executor
+        self._io_executor = io_executor
+        self._max_in_flight = max(1, max_in_flight)
+        self._ordered = ordered
+        self._options = options
+        self._pending = set()
+        self._ready = {}
+        self._next = 0
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    @property
+    def _in_processes(self):
+        return isinstance(self._executor, concurrent.futures.ProcessPoolExecutor)
+
+    async def find_files(self):
+        """Find the files to parse, unless they were already found.
+
+        The first iteration finds them otherwise.
+
+        Returns:
+            list: the nmrML files (or `ArchiveMember` references) found
+            in *in_path*, sorted
+        """
+        if self.files is None:
+            loop = asyncio.get_event_loop()
+            self.files, self._reader = await loop.run_in_executor(self._io_executor, find_files, self.in_path)
+            self._sources = enumerate(self.files)
+        return self.files
+
+    async def _start(self):
+        await self.find_files()
+        # worker processes load their own index instead
+        if self._ontology is None and not self._in_processes:
+            loop = asyncio.get_event_loop()
+            self._ontology = await loop.run_in_executor(self._io_executor, load_index, NMR_CV_PATH)
+
+    async def _process(self, index, source):
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(self._io_executor, read_source, source)
+        ontology = None if self._in_processes else self._ontology
+        meta = await loop.run_in_executor(self._executor, _extract, source, data, ontology, self._options)
+        return index, source, meta
+
+    def _schedule(self):
+        # files waiting to be consumed count as in flight as well
+        while len(self._pending) + len(self._ready) < self._max_in_flight:
+            try:
+                index, source = next(self._sources)
+            except StopIteration:
+                return
+            self._pending.add(asyncio.ensure_future(self._process(index, source)))
+
+    def _pop_ready(self):
+        if self._ordered:
+            if self._next in self._ready:
+                self._next += 1
+                return self._ready.pop(self._next - 1)
+        elif self._ready:
+            return self._ready.pop(next(iter(self._ready)))
+        return None
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    async def __anext__(self):
+        if self._closed:
+            raise asyncio.CancelledError()
+        try:
+            await self._start()
+            while True:
+                ready = self._pop_ready()
+                if ready is not None:
+                    return ready
+                self._schedule()
+                if not self._pending:
+                    self._close_reader()
+                    raise StopAsyncIteration()
+                done, self._pending = await asyncio.wait(
+                    self._pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, source, meta = task.result()
+                    self._ready[index] = (source, meta)
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """Cancel the files not parsed yet, and close the iterator.
+        """
+        self._closed = True
+        for task in self._pending:
+            task.cancel()
+        if self._pending:
+            await asyncio.wait(self._pending)
+        self._pending, self._ready = set(), {}
+        self._close_reader()
+
+
+def iter_metadata(in_path, ordered=True, executor=None, io_executor=None,
+                  max_in_flight=MAX_IN_FLIGHT, ontology=None, **options):
+    """Iterate asynchronously over the metadata of the nmrML files found in *in_path*.
+
+    This is the asynchronous counterpart of `nmrml2isa.parsing.iter_metadata`.
+
+    Arguments:
+        in_path (str): path to the directory or archive containing nmrML
+            files, or a glob pattern matching them
+        ordered (bool, optional): yield files in sorted order; otherwise,
+            yield files as soon as they are parsed [default: True]
+        executor (concurrent.futures.Executor, optional): the executor to
+            extract metadata in, or `None` to use the default executor
+            of the event loop [default: None]
+        io_executor (concurrent.futures.Executor, optional): the executor
+            to find and read files in, or `None` to use the default
+            executor of the event loop [default: None]
+        max_in_flight (int, optional): the maximum number of files read,
+            parsed or waiting to be consumed at once [default: MAX_IN_FLIGHT]
+        ontology (OntologyIndex, optional): the index of the nmrCV
+            ontology, or `None` to load it [default: None]
+        **options: the options of `nmrMLmeta` (*streaming*, *early_exit*
+            or *statistics*)
+
+    Returns:
+        MetadataIterator: an asynchronous iterator yielding ``(source,
+        meta)`` tuples, to close with `~MetadataIterator.aclose` (or to
+        use as an asynchronous context manager) if it is not exhausted
+
+    Example:
+        >>> async def count(in_path):
+        ...     async with iter_metadata(in_path, ordered=False) as metadata:
+        ...         return len([meta async for _, meta in metadata])
+    """
+    return MetadataIterator(in_path, ontology, executor, io_executor, max_in_flight, ordered, options)
+
+
+def _make_staging(out_path, study_identifier):
+    """Create a temporary directory in *out_path* to write a study to.
+
+    Returns:
+        str: the temporary directory
+        str: the topmost directory created along with it, or `None` if
+        *out_path* already existed
+    """
+    created, path = None, os.path.abspath(out_path)
+    while not os.path.exists(path):
+        created, path = path, os.path.dirname(path)
+    if created is not None:
+        os.makedirs(out_path)
+    return tempfile.mkdtemp(prefix='.{}-'.format(study_identifier), dir=out_path), created
+
+
+def _publish(staging, out_dir):
+    """Move the files written to *staging* to *out_dir*, replacing older ones."""
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    for name in os.listdir(staging):
+        getattr(os, 'replace', os.rename)(os.path.join(staging, name), os.path.join(out_dir, name))
+
+
+def _discard(staging, out_path, created):
+    """Remove *staging*, and the directories created along with it if empty.
+
+    Only the temporary directory is removed recursively, so no file that
+    existed before the conversion is ever removed.
+    """
+    shutil.rmtree(staging, ignore_errors=True)
+    path = os.path.abspath(out_path)
+    while created is not None:
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        if path == created:
+            return
+        path = os.path.dirname(path)
+
+
+def _blocking_iter(metadata, loop):
+    """Iterate over the metadata of *metadata* from a thread other than the loop's."""
+    while True:
+        try:
+            _, meta = asyncio.run_coroutine_threadsafe(metadata.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+        yield meta
+
+
+async def convert(in_path, out_path, study_identifier, usermeta=None, template_directory=None,
+                  executor=None, io_executor=None, max_in_flight=MAX_IN_FLIGHT, columnar=None,
+                  ontology=None, **options):
+    """Parse the nmrML files of a study and create its ISA-Tab files.
+
+    The ISA-Tab files are written in a dedicated thread while files are
+    parsed, the same as `nmrml2isa.parsing.convert` does, to a temporary
+    directory in *out_path*: they are only moved to the study directory
+    once all of them were written, replacing the files of a previous
+    conversion, and are discarded if the conversion is cancelled or fails.
+
+    Arguments:
+        in_path (str): path to the directory or archive containing nmrML
+            files, or a glob pattern matching them
+        out_path (str): path to the output directory (new directories will be
+            created here)
+        study_identifier (str): study identifier (e.g. MTBLSxxx)
+        usermeta (str, optional): the path to a json file, a xlsx file or
+            directly a json formatted string containing user-defined
+            metadata [default: None]
+        template_directory (str, optional): the path to a directory
+            containing custom templates [default: None]
+        executor, io_executor, max_in_flight, ontology: see `iter_metadata`
+        columnar (bool or str, optional): also write the metadata as a
+            columnar table (see `nmrml2isa.parsing.convert`) [default: None]
+        **options: the options of `nmrMLmeta` (*streaming*, *early_exit*
+            or *statistics*)
+    """
+    loop = asyncio.get_event_loop()
+    metadata = iter_metadata(in_path, True, executor, io_executor, max_in_flight, ontology, **options)
+    writer = concurrent.futures.ThreadPoolExecutor(1)
+    try:
+        if not await metadata.find_files():
+            warnings.warn("No files were found in {}.".format(in_path))
+            return
+        user = await loop.run_in_executor(io_executor, UserMetaLoader, usermeta)
+        staging, created = await loop.run_in_executor(io_executor, _make_staging, out_path, study_identifier)
+        isa_tab = ISA_Tab(staging, study_identifier, usermeta=user.usermeta,
+                          template_directory=template_directory, columnar=columnar,
+                          statistics=options.get('statistics', False))
+        written = writer.submit(isa_tab.write_stream, _blocking_iter(metadata, loop))
+        try:
+            await asyncio.wrap_future(written)
+            await asyncio.wrap_future(writer.submit(
+                _publish, isa_tab.isa_env['out_dir'], os.path.join(out_path, study_identifier)))
+        finally:
+            # the writer fails on its next file if the conversion was
+            # cancelled, and its thread only removes the temporary
+            # directory once it is done with it
+            await metadata.aclose()
+            await asyncio.wrap_future(writer.submit(_discard, staging, out_path, created))
+    finally:
+        writer.shutdown(wait=False)
+        await metadata.aclose()
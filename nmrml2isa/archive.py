@@ -0,0 +1,199 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **ArchiveReader**, which indexes the nmrML members of
+a zip or tar archive without opening them, and **ArchiveMember**, a small
+picklable reference to one of these members that opens its own handle to
+the archive when it is read, so that members can be sent to worker
+processes instead of being extracted to disk.
+
+Members are only opened while they are read, and each process keeps a
+bounded number of zip archives open (see `MAX_OPEN_ARCHIVES`), so reading
+an archive with thousands of members does not need thousands of handles.
+
+Zip and uncompressed tar archives are read in place. Compressed tar
+archives (``.tar.gz``, ``.tar.bz2``...) cannot be read at random, so they
+are decompressed once to a temporary tar file, which needs as much free
+disk space as the uncompressed archive.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from . import __version__, __author__, __email__
+
+
+#: the suffix of the members to index (case insensitive)
+NMRML_SUFFIX = '.nmrml'
+
+#: the maximum number of zip archives kept open by a process
+MAX_OPEN_ARCHIVES = 8
+
+_open_archives = collections.OrderedDict()
+_open_archives_lock = threading.Lock()
+
+
+def _open_zip_member(path, name):
+    """Open the member *name* of the zip archive at *path*.
+
+    Zip archives are opened once and shared by all threads of a process.
+    They are keyed by process so that workers started with ``fork`` never
+    share a file offset with their parent, and the least recently used
+    archive is closed (once its open members are closed) when more than
+    `MAX_OPEN_ARCHIVES` are open.
+    """
+    import zipfile
+
+    key = (os.getpid(), path)
+    with _open_archives_lock:
+        archive = _open_archives.pop(key, None)
+        if archive is None:
+            archive = zipfile.ZipFile(path)
+        _open_archives[key] = archive
+        while len(_open_archives) > MAX_OPEN_ARCHIVES:
+            stale_key, stale = _open_archives.popitem(last=False)
+            if stale_key[0] == key[0]:
+                stale.close()
+        return archive.open(name)
+
+
+class _Slice(io.RawIOBase):
+    """A read-only view of *size* bytes of a file, starting at *offset*."""
+
+    def __init__(self, path, offset, size):
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)[:self._left]
+        n = self._file.readinto(view)
+        self._left -= n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super(_Slice, self).close()
+
+
+class ArchiveMember(collections.namedtuple('ArchiveMember', ['archive', 'name', 'size', 'offset'])):
+    """A reference to a member of an archive.
+
+    Attributes:
+        archive (str): the path to the archive
+        name (str): the name of the member in the archive
+        size (int): the uncompressed size of the member
+        offset (int): the offset of the member data in an (uncompressed)
+            tar archive, or `None` for a member of a zip archive
+    """
+
+    __slots__ = ()
+
+    def open(self):
+        """Open the member for reading in binary mode.
+
+        Returns:
+            file: a file-like object, to be closed by the caller
+        """
+        if self.offset is None:
+            return _open_zip_member(self.archive, self.name)
+        return io.BufferedReader(_Slice(self.archive, self.offset, self.size))
+
+
+class ArchiveReader(object):
+    """An index of the nmrML members of a zip or tar archive.
+
+    Compressed tar archives cannot be read at random, so they are
+    decompressed once to a temporary file, which is removed when the
+    reader is closed.
+
+    Arguments:
+        path (str): the path to the archive
+        suffix (str, optional): the suffix of the members to index
+            [default: NMRML_SUFFIX]
+    """
+
+    def __init__(self, path, suffix=NMRML_SUFFIX):
+        import tarfile
+        import zipfile
+
+        self.path = path
+        self._tmp = None
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                infos = archive.infolist()
+            self.names = tuple(info.filename for info in infos)
+            self.members = tuple(
+                ArchiveMember(path, info.filename, info.file_size, None)
+                for info in infos if info.filename.lower().endswith(suffix)
+            )
+        else:
+            try:
+                if not self._is_uncompressed_tar(path):
+                    with tarfile.open(path, 'r:*') as compressed:
+                        with tempfile.NamedTemporaryFile(suffix='.tar', delete=False) as tmp:
+                            self._tmp = tmp.name
+                            compressed.fileobj.seek(0)
+                            shutil.copyfileobj(compressed.fileobj, tmp)
+                data_path = self._tmp or path
+                with tarfile.open(data_path, 'r:') as archive:
+                    infos = archive.getmembers()
+                self.names = tuple(info.name for info in infos)
+                self.members = tuple(
+                    ArchiveMember(data_path, info.name, info.size, info.offset_data)
+                    for info in infos if info.isfile() and info.name.lower().endswith(suffix)
+                )
+            except BaseException:
+                # do not leave the temporary copy behind
+                self.close()
+                raise
+
+    @staticmethod
+    def _is_uncompressed_tar(path):
+        import tarfile
+
+        try:
+            tarfile.open(path, 'r:').close()
+        except tarfile.ReadError:
+            return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def close(self):
+        """Remove the temporary copy of a compressed tar archive, if any.
+        """
+        if self._tmp is not None:
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+            self._tmp = None
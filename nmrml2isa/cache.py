@@ -0,0 +1,159 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **MetadataCache**, a persistent cache of the metadata
+extracted from nmrML files, so that converting a study again only needs
+to parse the files that were added or changed since the last run.
+
+Records are stored in a SQLite database, one per file path, along with a
+signature made of the file size and modification time (and optionally a
+hash of its contents), the nmrml2isa version and a fingerprint of the
+ontology used for the extraction: a record is only used if its signature
+still matches.
+
+Records are committed as soon as they are stored, in a database using
+write-ahead logging, so that several conversions (or the jobs of a
+conversion server) can share a cache. A record that cannot be stored
+because the database stays locked is simply not cached.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import hashlib
+import json
+import os
+import warnings
+
+import six
+
+from . import __version__, __author__, __email__
+from .records import compact, json_default
+from .utils import user_cache_dir
+
+
+#: the time to wait for another connection to release the database, in seconds
+TIMEOUT = 30
+
+
+class MetadataCache(object):
+    """A persistent cache of `nmrMLmeta.meta` records.
+
+    Arguments:
+        path (str, optional): the path to the cache database [default:
+            ``metadata.sqlite`` in the user cache directory]
+        fingerprint (str, optional): a fingerprint of the ontology used
+            to extract metadata [default: '']
+        hash_contents (bool, optional): also check the SHA-1 of the file
+            contents, and not only its size and modification time
+            [default: False]
+        options (str, optional): a description of any extraction option
+            that changes the extracted metadata [default: '']
+    """
+
+    def __init__(self, path=None, fingerprint='', hash_contents=False, options=''):
+        self.path = path or os.path.join(user_cache_dir(), 'metadata.sqlite')
+        self.fingerprint = fingerprint
+        self.hash_contents = hash_contents
+        self.options = options
+
+        import sqlite3
+
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._db = sqlite3.connect(self.path, timeout=TIMEOUT)
+        self._warned = False
+        try:
+            # let readers and a writer use the database concurrently
+            self._db.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            pass
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta '
+                             '(path TEXT PRIMARY KEY, signature TEXT, meta TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def signature(self, filepath):
+        """Get the signature of the file at *filepath*.
+
+        Returns:
+            str: the signature, or None if *filepath* is not a file on disk
+        """
+        if not isinstance(filepath, six.string_types):
+            return None
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        key = [__version__, self.fingerprint, self.options, stat.st_size,
+               getattr(stat, 'st_mtime_ns', stat.st_mtime)]
+        if self.hash_contents:
+            digest = hashlib.sha1()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            key.append(digest.hexdigest())
+        return json.dumps(key)
+
+    def has(self, filepath, signature=None):
+        """Check if up-to-date metadata of *filepath* is cached.
+        """
+        signature = signature or self.signature(filepath)
+        return signature is not None and self._db.execute(
+            'SELECT 1 FROM meta WHERE path=? AND signature=?',
+            (os.path.abspath(filepath), signature)).fetchone() is not None
+
+    def get(self, filepath, signature=None):
+        """Get the cached metadata of *filepath*, or None on a cache miss.
+        """
+        signature = signature or self.signature(filepath)
+        if signature is None:
+            return None
+        row = self._db.execute('SELECT meta FROM meta WHERE path=? AND signature=?',
+                               (os.path.abspath(filepath), signature)).fetchone()
+        if row is None:
+            return None
+        # only the top-level mapping is ordered in extracted metadata
+        return compact(collections.OrderedDict(json.loads(row[0])))
+
+    def put(self, filepath, meta, signature=None):
+        """Store the metadata extracted from *filepath*.
+
+        The record is committed at once, so the database is only locked
+        while it is written. If the database stays locked by another
+        connection for more than `TIMEOUT` seconds, the record is not
+        stored (and a warning is emitted once).
+        """
+        import sqlite3
+
+        signature = signature or self.signature(filepath)
+        if signature is None:
+            return
+        try:
+            with self._db:
+                self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?, ?)', (
+                    os.path.abspath(filepath), signature, json.dumps(list(meta.items()), default=json_default),
+                ))
+        except sqlite3.OperationalError as err:
+            if not self._warned:
+                warnings.warn("Metadata cache {} is busy, some files were not cached: {}".format(self.path, err))
+                self._warned = True
+
+    def close(self):
+        """Close the database.
+        """
+        self._db.close()
@@ -0,0 +1,240 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **ColumnarTable**, which collects the metadata of the
+files of a study into typed columns, and writes them as a Parquet file
+(when ``pyarrow`` is installed) or as a NumPy ``.npz`` archive, which are
+much faster to load and scan than the ISA-Tab assay file.
+
+Columns are named after the fields of the ISA-Tab templates, e.g.
+``Temperature[value]`` or ``Temperature[unit][name]``. Numeric fields keep
+their native type (``int64`` or ``float64``), and the other fields are
+dictionary-encoded, since the same terms are found in most files:
+
+* in Parquet files, as dictionary arrays;
+* in NPZ archives, as ``int32`` codes (``-1`` for missing values) stored
+  under the column name, and the categories they index, stored under the
+  column name followed by `CATEGORIES_SUFFIX`. Missing values of integer
+  columns are stored as ``NaN`` in ``float64`` columns, and the order of
+  the columns is stored under ``__columns__``. `read_npz` decodes them.
+
+The fields of ``entry_list`` values (e.g. ``Data Transformation Name``)
+are joined with `ENTRY_SEPARATOR`.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+
+import six
+
+from . import __version__, __author__, __email__
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+#: the supported file formats, with their extension
+FORMATS = collections.OrderedDict([('parquet', '.parquet'), ('npz', '.npz')])
+
+#: the suffix of the categories of a dictionary-encoded column in NPZ files
+CATEGORIES_SUFFIX = '::categories'
+
+#: the separator of the values of the fields of an ``entry_list``
+ENTRY_SEPARATOR = '; '
+
+
+def flatten(meta):
+    """Flatten the metadata of a file into columns.
+
+    Arguments:
+        meta (Mapping): the metadata extracted from a file
+
+    Returns:
+        collections.OrderedDict: the values of the columns, by name
+
+    Example:
+        >>> flatten({'Temperature': {'value': 298.0, 'unit': {'name': 'kelvin'}}})
+        OrderedDict([('Temperature[value]', 298.0), ('Temperature[unit][name]', 'kelvin')])
+    """
+    row = collections.OrderedDict()
+    for key, value in six.iteritems(meta):
+        if not isinstance(value, Mapping):
+            if not isinstance(value, (list, tuple)):
+                row[key] = value
+            continue
+        if 'entry_list' in value:
+            entries = [entry for entry in value['entry_list'] if isinstance(entry, Mapping)]
+            value = collections.OrderedDict()
+            for entry in entries:
+                for field, subvalue in six.iteritems(entry):
+                    if not isinstance(subvalue, Mapping):
+                        value.setdefault(field, []).append(six.text_type(subvalue))
+            for field, values in six.iteritems(value):
+                row['{}[entry_list][{}]'.format(key, field)] = ENTRY_SEPARATOR.join(values)
+            continue
+        for field, subvalue in six.iteritems(value):
+            if isinstance(subvalue, Mapping):
+                for subfield, x in six.iteritems(subvalue):
+                    row['{}[{}][{}]'.format(key, field, subfield)] = x
+            else:
+                row['{}[{}]'.format(key, field)] = subvalue
+    return row
+
+
+def column_kind(values):
+    """Get the kind of a column: ``int``, ``float`` or ``category``.
+    """
+    kind = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, six.integer_types + (float,)):
+            return 'category'
+        if isinstance(value, float):
+            kind = 'float'
+        elif kind is None:
+            kind = 'int'
+    return kind or 'category'
+
+
+def available_format():
+    """Get the best file format supported by the installed libraries.
+
+    Raises:
+        ImportError: when neither ``pyarrow`` nor ``numpy`` is installed
+    """
+    try:
+        import pyarrow.parquet
+        return 'parquet'
+    except ImportError:
+        pass
+    try:
+        import numpy
+        return 'npz'
+    except ImportError:
+        raise ImportError("the columnar export requires pyarrow or numpy")
+
+
+class ColumnarTable(object):
+    """The metadata of the files of a study, stored by column.
+
+    Attributes:
+        columns (collections.OrderedDict): the values of each column, in
+            the order in which columns were first seen, with `None` for
+            the files without a value
+        rows (int): the number of files added
+    """
+
+    def __init__(self):
+        self.columns = collections.OrderedDict()
+        self.rows = 0
+
+    def add(self, meta):
+        """Add the metadata of a file to the table.
+        """
+        for name, value in six.iteritems(flatten(meta)):
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = [None] * self.rows
+            column.append(value)
+        self.rows += 1
+        for column in six.itervalues(self.columns):
+            if len(column) < self.rows:
+                column.append(None)
+
+    def kinds(self):
+        """Get the kind of each column (see `column_kind`).
+        """
+        return collections.OrderedDict((name, column_kind(values)) for name, values in six.iteritems(self.columns))
+
+    def write(self, path, format=None):
+        """Write the table to a file.
+
+        Arguments:
+            path (str): the path to the file, without extension
+            format (str, optional): the format of the file, either
+                ``parquet`` or ``npz``, or `None` to use the best format
+                available (see `available_format`) [default: None]
+
+        Returns:
+            str: the path to the written file
+        """
+        format = format or available_format()
+        path += FORMATS[format]
+        if format == 'parquet':
+            self._write_parquet(path)
+        else:
+            self._write_npz(path)
+        return path
+
+    def _write_parquet(self, path):
+        import pyarrow
+        import pyarrow.parquet
+
+        arrays = []
+        for (name, values), kind in zip(six.iteritems(self.columns), six.itervalues(self.kinds())):
+            if kind == 'int':
+                arrays.append(pyarrow.array(values, type=pyarrow.int64()))
+            elif kind == 'float':
+                arrays.append(pyarrow.array(values, type=pyarrow.float64()))
+            else:
+                strings = [None if v is None else six.text_type(v) for v in values]
+                arrays.append(pyarrow.array(strings, type=pyarrow.string()).dictionary_encode())
+        table = pyarrow.Table.from_arrays(arrays, names=list(self.columns))
+        pyarrow.parquet.write_table(table, path)
+
+    def _write_npz(self, path):
+        import numpy
+
+        arrays = {'__columns__': numpy.array(list(self.columns), dtype=six.text_type)}
+        for (name, values), kind in zip(six.iteritems(self.columns), six.itervalues(self.kinds())):
+            if kind == 'int' and None not in values:
+                arrays[name] = numpy.array(values, dtype=numpy.int64)
+            elif kind in ('int', 'float'):
+                arrays[name] = numpy.array([numpy.nan if v is None else v for v in values], dtype=numpy.float64)
+            else:
+                index = collections.OrderedDict()
+                arrays[name] = numpy.array([
+                    -1 if v is None else index.setdefault(six.text_type(v), len(index))
+                    for v in values
+                ], dtype=numpy.int32)
+                arrays[name + CATEGORIES_SUFFIX] = numpy.array(list(index), dtype=six.text_type)
+        with open(path, 'wb') as f:
+            numpy.savez(f, **arrays)
+
+
+def read_npz(path, columns=None):
+    """Read the columns of a NPZ file written by `ColumnarTable.write`.
+
+    Arguments:
+        path (str): the path to the NPZ file
+        columns (list, optional): the names of the columns to read, or
+            `None` to read all of them [default: None]
+
+    Returns:
+        collections.OrderedDict: the columns, by name, as NumPy arrays;
+        dictionary-encoded columns are decoded to object arrays, with
+        `None` for missing values
+    """
+    import numpy
+
+    table = collections.OrderedDict()
+    with numpy.load(path) as data:
+        for name in columns or data['__columns__']:
+            values = data[name]
+            if name + CATEGORIES_SUFFIX in data.files:
+                categories = data[name + CATEGORIES_SUFFIX].astype(object)
+                values = numpy.append(categories, None)[values]
+            table[six.text_type(name)] = values
+    return table
@@ -0,0 +1,254 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **DispatchTable**, which compiles the tag paths of all
+the elements nmrml2isa extracts metadata from into a single tree of tags,
+and collects the matching elements of a document in one walk, instead of
+running one ElementPath search (and one traversal of the document) per
+path.
+
+Paths are given as tuples of tag local names relative to the root element,
+where ``*`` matches any element. A path may be *scoped* to another one, in
+which case it is relative to it and its matches are grouped by the element
+of the scope they were found in::
+
+    table = DispatchTable(namespace, [
+        ('sources', ('sourceFileList', 'sourceFile'), False, None),
+        ('source_cvs', ('cvParam',), False, 'sources'),
+    ])
+    matches = table.collect(root)
+    for source in matches.all('sources'):
+        cvs = matches.all('source_cvs', source)
+
+The matches of some paths can also be indexed by their ``id`` attribute
+while the document is walked, so that references to them (such as the
+``softwareRef`` attributes) are resolved without searching the document::
+
+    table = DispatchTable(namespace, paths, index=['sources'])
+    source = table.collect(root).ref('sources', 'FID_FILE')
+
+The **Dialect** of a document (its namespace, whether it uses ``cvParam``
+or ``cvTerm`` elements, and where its ``nmrML`` element is) can be sniffed
+from its first bytes with `sniff_dialect`, before it is parsed, or probed
+from its parsed tree with `probe_dialect`.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import re
+
+import six
+
+from . import __version__, __author__, __email__
+
+
+#: the number of bytes read from the start of a document to sniff its dialect
+SNIFF_SIZE = 4096
+
+_COMMENT = re.compile(br'<!--.*?(?:-->|$)', re.DOTALL)
+_START_TAG = re.compile(br'<([^\s/>?!]+)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)')
+_XMLNS = re.compile(br'xmlns(?::([^\s=]+))?\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+class Dialect(collections.namedtuple('Dialect', ['namespace', 'cvParam', 'root'])):
+    """The flavour of nmrML a document is written in.
+
+    Attributes:
+        namespace (str): the URI of the namespace of the nmrML elements,
+            or an empty string if they have none
+        cvParam (str): the local name of the controlled vocabulary terms,
+            either ``cvParam`` or ``cvTerm``
+        root (tuple): the path to the ``nmrML`` element relative to the
+            root element, i.e. ``()`` when the root element is the ``nmrML``
+            element itself, or ``('nmrML',)`` when it is wrapped in another
+            element
+    """
+
+    __slots__ = ()
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def sniff_dialect(head):
+    """Sniff the dialect of a document from its first bytes.
+
+    Arguments:
+        head (bytes): the first bytes of the document (e.g. `SNIFF_SIZE`)
+
+    Returns:
+        Dialect: the dialect of the document, or `None` if it could not be
+        told from *head* (e.g. if no CV term appears in it)
+    """
+    namespaces, wrappers, element, cvParam = {}, 0, None, None
+    for match in _START_TAG.finditer(_COMMENT.sub(b'', head)):
+        try:
+            name = match.group(1).decode('ascii')
+        except UnicodeDecodeError:
+            return None
+        if element is None:
+            for prefix, double, single in _XMLNS.findall(match.group(2)):
+                namespaces[prefix.decode('ascii')] = (double or single).decode('utf-8')
+            prefix, _, local = name.rpartition(':')
+            if local != 'nmrML':
+                wrappers += 1
+                continue
+            element = namespaces.get(prefix, '')
+        elif name.rpartition(':')[-1] in ('cvParam', 'cvTerm'):
+            cvParam = name.rpartition(':')[-1]
+            break
+    if element is None or cvParam is None or wrappers > 1:
+        return None
+    return Dialect(element, cvParam, ('nmrML',) * wrappers)
+
+
+def probe_dialect(tree):
+    """Probe the dialect of a parsed document.
+
+    Arguments:
+        tree (ElementTree): the parsed document
+
+    Returns:
+        Dialect: the dialect of the document
+    """
+    root, layout = tree.getroot(), ()
+    if _localname(root.tag) != 'nmrML':
+        element = next((child for child in root
+                        if isinstance(child.tag, six.string_types)
+                        and _localname(child.tag) == 'nmrML'), None)
+        if element is not None:
+            root, layout = element, ('nmrML',)
+    namespace = root.tag[1:].split('}')[0] if root.tag.startswith('{') else ''
+    ns = {'s': namespace}
+    if root.find('s:instrumentConfigurationList/s:instrumentConfiguration/s:cvTerm', ns) is None:
+        return Dialect(namespace, 'cvParam', layout)
+    return Dialect(namespace, 'cvTerm', layout)
+
+
+class _Node(object):
+    """A node of the tree of compiled tag paths."""
+
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+
+
+class Matches(dict):
+    """The elements collected by a `DispatchTable`, by key and scope.
+
+    Attributes:
+        ids (dict): the indexed elements, by key and by ``id``
+    """
+
+    def __init__(self):
+        super(Matches, self).__init__()
+        self.ids = {}
+
+    def all(self, key, scope=None):
+        """Get all the elements matching *key*, in document order.
+
+        Arguments:
+            key (str): the key of the path
+            scope (Element, optional): the element of the scope of the
+                path, if the path is scoped [default: None]
+        """
+        return self.get((key, scope), [])
+
+    def first(self, key, scope=None):
+        """Get the first element matching *key*, or `None`.
+        """
+        found = self.get((key, scope))
+        return found[0] if found else None
+
+    def ref(self, key, id_):
+        """Get the first element matching *key* with the given ``id``, or `None`.
+
+        Arguments:
+            key (str): the key of an indexed path
+            id_ (str): the ``id`` attribute of the element
+        """
+        return self.ids.get(key, {}).get(id_)
+
+
+class DispatchTable(object):
+    """Tag paths compiled for documents using a given namespace.
+
+    Arguments:
+        namespace (str): the URI of the namespace of the elements, or an
+            empty string for documents without namespace
+        paths (iterable): the paths to collect, as ``(key, path, first,
+            scope)`` tuples, where *path* is a tuple of local names, *first*
+            tells if only the first match is needed, and *scope* is `None`
+            or the key of a path listed before, *path* being relative to it
+        index (iterable, optional): the keys of the (unscoped) paths the
+            matches of which are indexed by ``id`` [default: ()]
+    """
+
+    def __init__(self, namespace, paths, index=()):
+        self.namespace = namespace
+        index = frozenset(index)
+        self._root = _Node()
+        full_paths = {}
+        for key, path, first, scope in paths:
+            depth = None
+            if scope is not None:
+                depth = len(full_paths[scope])
+                path = full_paths[scope] + tuple(path)
+            full_paths[key] = tuple(path)
+            node = self._root
+            for local in path:
+                node = node.children.setdefault(self._qualify(local), _Node())
+            node.entries.append((key, first, depth, key in index))
+
+    def _qualify(self, local):
+        if local == '*' or not self.namespace:
+            return local
+        return '{{{}}}{}'.format(self.namespace, local)
+
+    def collect(self, root):
+        """Collect the elements of the document rooted at *root*.
+
+        Only the branches of the document leading to a compiled path are
+        visited, and comments and processing instructions are skipped.
+
+        Returns:
+            Matches: the matching elements
+        """
+        matches = Matches()
+        self._walk(root, [self._root], [], matches)
+        return matches
+
+    def _walk(self, element, nodes, ancestors, matches):
+        ancestors.append(element)
+        for child in element:
+            tag = child.tag
+            if not isinstance(tag, six.string_types):
+                continue
+            child_nodes = []
+            for node in nodes:
+                for child_node in (node.children.get(tag), node.children.get('*')):
+                    if child_node is None:
+                        continue
+                    child_nodes.append(child_node)
+                    for key, first, depth, indexed in child_node.entries:
+                        scope = None if depth is None else ancestors[depth]
+                        found = matches.setdefault((key, scope), [])
+                        if not (first and found):
+                            found.append(child)
+                        if indexed:
+                            matches.ids.setdefault(key, {}).setdefault(child.get('id'), child)
+            if any(child_node.children for child_node in child_nodes):
+                self._walk(child, child_nodes, ancestors, matches)
+        ancestors.pop()
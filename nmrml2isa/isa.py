@@ -9,23 +9,39 @@ import string
 import six
 import os
 import csv
+import json
+import itertools
+import tempfile
+import warnings
+import collections
 
 from . import __version__, __author__, __email__, __name__
-from .utils import ChainMap, PermissiveFormatter, open_csv
+from .columnar import ColumnarTable
+from .profiling import NULL_PROFILER
+from .records import json_default
+from .utils import ChainMap, CompiledTemplate, PermissiveFormatter, open_csv
 
 class ISA_Tab(object):
 
-    def __init__(self, out_dir, name, usermeta=None, template_directory=None):
+    def __init__(self, out_dir, name, usermeta=None, template_directory=None, profiler=NULL_PROFILER,
+                 columnar=None, statistics=False):
 
         # Create one or several study files / one or several study section in investigation
 
         dirname = os.path.dirname(os.path.realpath(__file__))
         self.usermeta = usermeta or {}
+        self.profiler = profiler
+        # also write the metadata as a columnar table (True for the
+        # best available format, or the name of a format)
+        self.columnar = columnar
+        # add the columns of the data array statistics to the assay
+        self.statistics = statistics
         self.isa_env = {
             'out_dir': os.path.join(out_dir, name),
             'Study Identifier':  name,
             'Study file name': 's_{}.txt'.format(name),
             'Assay file name': 'a_{}_metabolite_profiling_NMR_spectroscopy.txt'.format(name),
+            'Columnar file name': '{}_metadata'.format(name),
             'default_path': os.path.join(dirname, 'default'),
             'template_path': template_directory or os.path.join(dirname, 'default')
         }
@@ -40,49 +56,202 @@ class ISA_Tab(object):
         if not os.path.exists(self.isa_env['out_dir']):
             os.makedirs(self.isa_env['out_dir'])
 
-        h,d = self.make_assay_template(metalist)
+        profiler = self.profiler
+        with profiler.span('schema expansion'):
+            h,d = self.make_assay_template(metalist)
+
+        with profiler.span('investigation'):
+            self.create_investigation(metalist)
+        with profiler.span('study'):
+            self.create_study(metalist)
+        with profiler.span('assay'):
+            self.create_assay(metalist, h, d)
+
+        if self.columnar:
+            with profiler.span('columnar'):
+                table = ColumnarTable()
+                for meta in metalist:
+                    table.add(meta)
+                self.create_columnar(table)
+
+    def write_stream(self, metas):
+        """Write the ISA-Tab files while consuming an iterable of metadata.
+
+        Study rows are written as soon as each metadata dictionary is
+        received. Since the assay columns depend on the whole study, the
+        metadata is also spilled to a temporary file as JSON lines, and
+        assay rows are rendered from there once the layout is settled.
+        Only the first metadata dictionary is kept in memory.
+
+        Arguments:
+            metas (iterable): an iterable of metadata dictionaries
+        """
+        metas = iter(metas)
+        first = next(metas, None)
+        if first is None:
+            return
+
+        self.isa_env['Platform'] = ''
+        self.isa_env['Converter'] = __name__
+        self.isa_env['Converter version'] = __version__
+
+        if not os.path.exists(self.isa_env['out_dir']):
+            os.makedirs(self.isa_env['out_dir'])
 
-        self.create_investigation(metalist)
-        self.create_study(metalist)
-        self.create_assay(metalist, h, d)
+        with tempfile.TemporaryFile() as spill:
+
+            widths = {}
+            table = ColumnarTable() if self.columnar else None
+
+            def spilled():
+                for meta in itertools.chain([first], metas):
+                    if not self.isa_env['Platform'] and 'Instrument' in meta:
+                        self.isa_env['Platform'] = meta['Instrument']
+                    self.update_entry_widths(widths, meta)
+                    if table is not None:
+                        table.add(meta)
+                    spill.write(json.dumps(meta, default=json_default).encode('utf-8'))
+                    spill.write(b'\n')
+                    yield meta
+
+            # files are parsed while the study file is written, so this
+            # stage includes the per-file stages when metadata is streamed
+            profiler = self.profiler
+            with profiler.span('study'):
+                self.create_study(spilled())
+
+            with profiler.span('schema expansion'):
+                h,d = self.expand_assay_template(widths)
+            with profiler.span('investigation'):
+                self.create_investigation([first])
+
+            with profiler.span('assay'):
+                spill.seek(0)
+                self.create_assay(
+                    (json.loads(line.decode('utf-8'), object_pairs_hook=collections.OrderedDict) for line in spill),
+                    h, d,
+                )
+
+            if table is not None:
+                with profiler.span('columnar'):
+                    self.create_columnar(table)
 
     def make_assay_template(self, metalist):
+        """Build the assay headers and cell templates for a whole study.
 
-        template_a_path = os.path.join(self.isa_env['template_path'], 'a_nmrML.txt')
+        Repeated column groups (such as Data Transformation Name) are
+        given as many repetitions as the longest ``entry_list`` of the
+        corresponding field found in any of the files.
+        """
+        widths = {}
+        for meta in metalist:
+            self.update_entry_widths(widths, meta)
+        return self.expand_assay_template(widths)
 
-        with open(template_a_path, 'r') as a_in:
-            headers, data = [x.strip().replace('"', '').split('\t') for x in a_in.readlines()]
+    @staticmethod
+    def update_entry_widths(widths, meta):
+        """Update *widths* with the ``entry_list`` lengths found in *meta*.
+
+        Arguments:
+            widths (dict): the maximum length of the ``entry_list`` of
+                each field seen so far, updated in place
+            meta (dict): the metadata of a single file
+        """
+        for key, value in six.iteritems(meta):
+            try:
+                width = len(value['entry_list'])
+            except (TypeError, KeyError, IndexError):
+                continue
+            if width > widths.get(key, -1):
+                widths[key] = width
+
+    def expand_assay_template(self, widths):
+        """Expand the repeated column groups of the assay template.
+
+        Arguments:
+            widths (dict): the number of repetitions of the column group
+                of each field; fields not in *widths* get a single, blank
+                column group
+
+        Returns:
+            list: the assay headers
+            list: the cell templates, aligned with the headers
+        """
+        headers, data = self.read_assay_template('a_nmrML.txt')
+        if self.statistics:
+            headers, data = self.insert_protocol_columns(headers, data, *self.read_assay_template('a_statistics.txt'))
+
+        new_headers, new_data = [], []
 
         i = 0
         while i < len(headers):
             header, datum = headers[i], data[i]
 
             if '{{' in datum and 'Term' not in header:
-                entry_list = metalist[0][self.unparameter(header)]['entry_list'] \
-                                if self.unparameter(header) in metalist[0].keys() \
-                                else [ None ]
-
-                hsec, dsec = (headers[i:i+3], data[i:i+3]) \
-                                if headers[i+1] == "Term Source REF" \
-                                else (headers[i:i+1], data[i:i+1])
-
-                headers[:] = headers[:i] + headers[i+len(hsec):] # Remove the sections we are
-                data[:] =    data[:i]    +    data[i+len(dsec):] # going to format and insert
+                size = 3 if headers[i+1:i+2] == ["Term Source REF"] else 1
+                hsec, dsec = headers[i:i+size], data[i:i+size]
+                for n in range(widths.get(self.entry_list_field(datum), 1)):
+                    new_headers.extend(hsec)
+                    new_data.extend(d.format(n) for d in dsec)
+                i += size
+
+            else:
+                new_headers.append(header)
+                new_data.append(datum)
+                i += 1
+
+        return new_headers, new_data
+
+    def read_assay_template(self, filename):
+        """Read the headers and cell templates of an assay template.
+
+        Templates missing from a custom template directory are read
+        from the default one.
+        """
+        template_a_path = os.path.join(self.isa_env['template_path'], filename)
+        if not os.path.exists(template_a_path):
+            template_a_path = os.path.join(self.isa_env['default_path'], filename)
 
-                for n in reversed(range(len(entry_list))):
-                    for (h,d) in zip(reversed(hsec),reversed(dsec)):
-                        headers.insert(i, h)
-                        data.insert(i, d.format(n))
-
-            i+= 1
+        with open(template_a_path, 'r') as a_in:
+            return [x.strip().replace('"', '').split('\t') for x in a_in.readlines()]
 
+    @staticmethod
+    def insert_protocol_columns(headers, data, extra_headers, extra_data):
+        """Insert optional columns after the protocols they belong to.
+
+        The optional columns are grouped by protocol, each group starting
+        with the ``Protocol REF`` column of the protocol the following
+        columns are inserted after in *headers*.
+
+        Returns:
+            list: the assay headers
+            list: the cell templates, aligned with the headers
+        """
+        headers, data = list(headers), list(data)
+        groups = []
+        for header, datum in zip(extra_headers, extra_data):
+            if header == 'Protocol REF':
+                groups.append((datum, [], []))
+            elif groups:
+                groups[-1][1].append(header)
+                groups[-1][2].append(datum)
+        for protocol, group_headers, group_data in groups:
+            try:
+                i = next(i for i, (h, d) in enumerate(zip(headers, data)) if h == 'Protocol REF' and d == protocol)
+            except StopIteration:
+                warnings.warn("No '{}' protocol in the assay template, its optional "
+                              "columns are not written.".format(protocol))
+                continue
+            headers[i+1:i+1] = group_headers
+            data[i+1:i+1] = group_data
         return headers, data
 
     def create_assay(self, metalist, headers, data):
         #template_a_path = os.path.join(self.isa_env['default_path'], 'a_imzML_parse.txt')
         new_a_path = os.path.join(self.isa_env['out_dir'], self.isa_env['Assay file name'])
 
-        fmt = PermissiveFormatter()
+        # parse the templates of every cell only once for all rows
+        renderers = [CompiledTemplate.compile(x).render for x in data]
 
         # extra line being added in windows files need to use custom 'open_csv' function from utils
         with open_csv(new_a_path, 'w') as a_out:
@@ -91,23 +260,24 @@ class ISA_Tab(object):
 
             writer.writerow(headers)
 
+            usermeta = self.usermeta
             for meta in metalist:
-                writer.writerow( [ fmt.vformat(x, None, ChainMap(meta, self.usermeta)) for x in data] )
+                writer.writerow( [ render(meta, usermeta) for render in renderers ] )
 
     def create_study(self, metalist):
 
         template_s_path = os.path.join(self.isa_env['template_path'], 's_nmrML.txt')
         new_s_path = os.path.join(self.isa_env['out_dir'], self.isa_env['Study file name'])
 
-        fmt = PermissiveFormatter()
-
         with open(template_s_path, 'r') as s_in:
             headers, data = s_in.readlines()
 
+        template = CompiledTemplate.compile(data)
+
         with open(new_s_path, 'w') as s_out:
             s_out.write(headers)
             for meta in metalist:
-                s_out.write(fmt.vformat(data, None, ChainMap(meta, self.usermeta)))
+                s_out.write(template.render(meta, self.usermeta))
 
     def create_investigation(self, metalist):
         investigation_file = os.path.join(self.isa_env['template_path'], 'i_nmrML.txt')
@@ -136,8 +306,30 @@ class ISA_Tab(object):
                     l = fmt.vformat(l, None, ChainMap(self.isa_env, meta, self.usermeta))
                     i_out.write(l)
 
+    def create_columnar(self, table):
+        """Write the metadata of the study as a columnar table.
+
+        Arguments:
+            table (ColumnarTable): the metadata of the files of the study
+
+        Returns:
+            str: the path to the written Parquet or NPZ file
+        """
+        path = os.path.join(self.isa_env['out_dir'], self.isa_env['Columnar file name'])
+        return table.write(path, None if self.columnar is True else self.columnar)
+
     @staticmethod
     def unparameter(string):
         return string.strip()[16:-1]
 
+    @staticmethod
+    def entry_list_field(datum):
+        """Get the name of the field a repeated cell template refers to.
+
+        Example:
+            >>> ISA_Tab.entry_list_field('{{Data Transformation Name[entry_list][{}][name]}}')
+            'Data Transformation Name'
+        """
+        return datum.lstrip('{').split('[', 1)[0]
+
 
@@ -8,29 +8,123 @@ from __future__ import (
 import os
 import json
 import six
+import warnings
+import contextlib
 import collections
-import pronto
 
 from . import __version__, __author__, __email__
-from .utils import etree
-
+from .utils import etree, file_size
+from .accessions import accession_url, urllize
+from .archive import ArchiveMember
+from .dispatch import DispatchTable, SNIFF_SIZE, probe_dialect, sniff_dialect
+from .ontology import OntologyIndex, load_index
+from .prefetch import PrefetchedFile
+from .profiling import NULL_PROFILER
+from .records import Record, json_default
+from .spectral import decode_array, fid_statistics, spectrum_statistics
+from .streaming import BINARY_TAGS, parse_metadata
+
+
+def _section_paths(dispatch_paths, first_only=False):
+    """Get the tag paths of the sections of *dispatch_paths*, relative to the root."""
+    sections = collections.OrderedDict()
+    for _, path, first, scope in dispatch_paths:
+        if scope is None:
+            sections[path] = sections.get(path, True) and first
+    return [tuple(path.split('/')) for path, first in sections.items() if first or not first_only]
+
+
+def _peek(source, size):
+    """Read the first *size* bytes of *source* without consuming them."""
+    try:
+        seekable = source.seekable()
+    except AttributeError:  # Python 2 files
+        seekable = hasattr(source, 'seek')
+    if seekable:
+        position = source.tell()
+        try:
+            return source.read(size)
+        finally:
+            source.seek(position)
+    elif hasattr(source, 'peek'):
+        return source.peek(size)[:size]
+    return b''
 
 
 class nmrMLmeta(object):
 
-    _namespaced_xpaths = {
-        'instruments':    '{root}/s:instrumentConfigurationList/s:instrumentConfiguration',
-        'software':       '{root}/s:softwareList/s:software',
-        'acquisition':    '{root}/s:acquisition/s:acquisition1D/s:acquisitionParameterSet',
-        'source_file':    '{root}/s:sourceFileList/s:sourceFile',
-        'contacts':       '{root}/s:contactList/s:contact',
-        'processing':     '{root}/s:dataProcessingList/s:dataProcessing/s:processingMethod',
-        'spectrum':       '{root}/s:spectrum/s:spectrum1D',
-        'probehead':      '{root}/s:instrumentConfigurationList/s:instrumentConfiguration/s:userParam',
-        'pulse_sequence': '{root}/s:acquisition/s:acquisition1D/s:acquisitionParameterSet/s:pulseSequence/s:userParam',
-    }
-
-    _raw_xpaths = {k:v.replace('s:', '') for k,v in six.iteritems(_namespaced_xpaths)}
+    # the terms read by `read_children`, relative to their section
+    # (a trailing ``*`` matches the first child of any tag)
+    _acquisition_terms = [
+        ('sampleAcquisitionTemperature', 'Temperature'),
+        ('sampleContainer', 'NMR tube type'),
+        ('spinningRate', 'Spinning Rate'),
+        ('relaxationDelay', 'Relaxation Delay'),
+        ('pulseSequence', 'Pulse sequence'),
+        ('DirectDimensionParameterSet/acquisitionNucleus', 'Acquisition Nucleus'),
+        ('DirectDimensionParameterSet/decouplingNucleus', 'Decoupling Nucleus'),
+        ('DirectDimensionParameterSet/effectiveExcitationField', 'Magnetic field strength'),
+        ('DirectDimensionParameterSet/sweepWidth', 'Sweep Width'),
+        ('DirectDimensionParameterSet/pulseWidth', 'Pulse Width'),
+        ('DirectDimensionParameterSet/irradiationFrequency', 'Irradiation Frequency'),
+        ('DirectDimensionParameterSet/samplingStrategy', 'Sampling Strategy'),
+    ]
+
+    _spectrum_terms = [
+        ('xAxis', 'X axis range'),
+        ('yAxisType', 'Y axis type'),
+        ('processingParameterSet/postAcquisitionSolventSuppressionMethod/*', 'Post Acquisition Solvent Supression Method'),
+        ('processingParameterSet/calibrationCompound/*', 'Calibration Compound'),
+        ('processingParameterSet/dataTransformationMethod/*', 'Spectrum transformation method'),
+        ('firstDimensionProcessingParameterSet/zeroOrderPhaseCorrection', 'Zero Value Phase Correction'),
+        ('firstDimensionProcessingParameterSet/firstOrderPhaseCorrection', 'First Order Phase Correction'),
+        ('firstDimensionProcessingParameterSet/calibrationReferenceShift', 'Calibration Reference Shift'),
+        ('firstDimensionProcessingParameterSet/spectralDenoisingMethod', 'Spectral Denoising Method'),
+        ('firstDimensionProcessingParameterSet/windowFunction/windowFunctionMethod', 'Window Function Method'),
+        ('firstDimensionProcessingParameterSet/windowFunction/windowFunctionMethodParameter', 'Window Function Parameter'),
+        ('firstDimensionProcessingParameterSet/baselineCorrectionMethod', 'Baseline Correction Method'),
+    ]
+
+    # the elements collected in a single walk of the document, as
+    # (key, path, first match only, scope) tuples (see `DispatchTable`)
+    _dispatch_paths = [
+        ('instruments', 'instrumentConfigurationList/instrumentConfiguration', True, None),
+        ('instrument_list', 'instrumentConfigurationList/instrumentConfiguration', False, None),
+        ('instrument_cvs', '{cvParam}', False, 'instruments'),
+        ('instrument_software', 'softwareRef', True, 'instruments'),
+        ('software', 'softwareList/software', False, None),
+        ('acquisition', 'acquisition/acquisition1D/acquisitionParameterSet', True, None),
+        ('source_file', 'sourceFileList/sourceFile', False, None),
+        ('source_file_cvs', '{cvParam}', False, 'source_file'),
+        ('contacts', 'contactList/contact', False, None),
+        ('processing', 'dataProcessingList/dataProcessing/processingMethod', True, None),
+        ('processing_cvs', '{cvParam}', False, 'processing'),
+        ('spectrum', 'spectrum/spectrum1D', True, None),
+        ('probehead', 'instrumentConfigurationList/instrumentConfiguration/userParam', True, None),
+        ('pulse_sequence', 'acquisition/acquisition1D/acquisitionParameterSet/pulseSequence/userParam', True, None),
+    ] + [
+        (name, path, True, 'acquisition') for path, name in _acquisition_terms
+    ] + [
+        (name, path, True, 'spectrum') for path, name in _spectrum_terms
+    ]
+
+    # the binary data arrays, only needed to extract statistics
+    _statistics_paths = [
+        ('fid', 'acquisition/acquisition1D/fidData', True, None),
+        ('spectrum_data', 'spectrumDataArray', True, 'spectrum'),
+    ]
+
+    # the tag paths (relative to the root) of the sections to extract,
+    # and of the ones of which only the first match is needed
+    _sections = _section_paths(_dispatch_paths)
+    _first_sections = _section_paths(_dispatch_paths, first_only=True)
+    _statistics_sections = _section_paths(_statistics_paths)
+
+    # the paths the matches of which are indexed by id, to resolve references
+    _dispatch_index = ['instrument_list', 'software', 'source_file', 'contacts']
+
+    # the dispatch tables compiled so far in this process, by dialect
+    _dispatch_tables = {}
 
     gyromagnetic_table = {
         'CHEBI_49637': 42.576, # 1H
@@ -42,32 +136,82 @@ class nmrMLmeta(object):
         'CHEBI_37971': 17.235, # 31P
     }
 
+    # the gyromagnetic table, by accession URL
+    _gyromagnetic_urls = {accession_url(k): v for k, v in six.iteritems(gyromagnetic_table)}
+
     nmrcv = None
 
-    def __init__(self, in_file, cached_onto=None):
+    def __init__(self, in_file, cached_onto=None, streaming=False, early_exit=False, profiler=NULL_PROFILER,
+                 statistics=False):
 
         # setup lxml parsing
         self.in_file = in_file
+        self.statistics = statistics
+
+        if isinstance(in_file, (ArchiveMember, PrefetchedFile)):
+            # archive members and prefetched files are only opened
+            # while they are parsed
+            with profiler.span('xml', 'file', file=in_file.name):
+                with contextlib.closing(in_file.open()) as handle:
+                    self.file_size = in_file.size
+                    self._parse(handle, streaming, early_exit)
+        elif isinstance(in_file, six.string_types):
+            self.file_size = file_size(in_file)
+            with profiler.span('xml', 'file', file=in_file):
+                with open(in_file, 'rb') as handle:
+                    self._parse(handle, streaming, early_exit)
+        else:
+            self.file_size = file_size(in_file)
+            with profiler.span('xml', 'file', file=getattr(in_file, 'name', in_file)):
+                self._parse(in_file, streaming, early_exit)
+
+        with profiler.span('extract', 'file', file=getattr(in_file, 'name', in_file)):
+            self._extract(cached_onto)
+
+        if statistics:
+            with profiler.span('statistics', 'file', file=getattr(in_file, 'name', in_file)):
+                self.data_statistics()
+
+    def _parse(self, source, streaming, early_exit):
+        """Parse the XML tree of the file"""
+        # sniff the dialect of the file, so that the paths to look for
+        # are known before parsing (or probe the tree later if unsure)
+        self.dialect = sniff_dialect(_peek(source, SNIFF_SIZE))
+        if streaming or early_exit:
+            # only build the metadata sections, dropping binary payloads
+            # unless statistics are extracted from them, and stop reading
+            # once they are all complete if requested
+            root = () if self.dialect is None else self.dialect.root
+            sections, first = self._sections, self._first_sections
+            if self.statistics:
+                sections, first = sections + self._statistics_sections, first + self._statistics_sections
+            self.tree, self.bytes_read = parse_metadata(
+                source, [root + s for s in sections], [root + s for s in first], early_exit,
+                skip=() if self.statistics else BINARY_TAGS)
+        else:
+            parser = etree.XMLParser()
+            self.tree = etree.parse(source, parser=parser)
+            self.bytes_read = self.file_size
 
-        parser = etree.XMLParser()
-        self.tree = etree.parse(in_file, parser=parser)
-
+    def _extract(self, cached_onto):
+        """Extract the metadata from the parsed tree"""
         self._build_env()
         self._load_ontology(cached_onto)
+        self.elements = self._dispatch_table().collect(self.tree.getroot())
 
         self.meta = collections.OrderedDict()
 
         try:
-            filename = os.path.basename(in_file.name)
+            filename = os.path.basename(self.in_file.name)
         except AttributeError:
-            filename = os.path.basename(in_file)
+            filename = os.path.basename(self.in_file)
         finally:
             self.sample = os.path.splitext(filename)[0]
-            self.meta['Derived Spectral Data File'] = {'value': self.in_file}
+            self.meta['Derived Spectral Data File'] = Record(value=getattr(self.in_file, 'name', self.in_file))
 
-        self.meta['Sample Name'] = {'value': self.sample}
-        self.meta['NMR Assay Name'] = {'value': self.sample}
-        self.meta['Free Induction Decay Data File'] = {'value': "{}.zip".format(self.sample)}
+        self.meta['Sample Name'] = Record(value=self.sample)
+        self.meta['NMR Assay Name'] = Record(value=self.sample)
+        self.meta['Free Induction Decay Data File'] = Record(value="{}.zip".format(self.sample))
 
         # Start parsing
         self.instrument()
@@ -79,68 +223,83 @@ class nmrMLmeta(object):
         self.probehead()
         self.pulse_sequence()
 
+        # accessions were converted to URLs when the records were built
         self._convert_magnetic_field()
 
-        self._urllize(self.meta)
-
         if 'contacts' in self.meta:
             self.meta['study_contacts'] = self.meta['contacts']['entry_list']
             del self.meta['contacts']
 
     def _load_ontology(self, cached_onto):
         if self.nmrcv is None:
-            if cached_onto is not None:
+            if isinstance(cached_onto, OntologyIndex):
                 self.nmrcv = cached_onto
+            elif cached_onto is not None:
+                self.nmrcv = OntologyIndex.from_ontology(cached_onto)
             else:
-                self.nmrcv = pronto.Ontology(
-                    os.path.join(os.path.dirname(os.path.abspath(__file__)),'nmrCV.owl'), False
-                )
+                self.nmrcv = load_index()
+
+    @classmethod
+    def _compile_dispatch_table(cls, dialect):
+        """Compile the paths of `_dispatch_paths` for a dialect."""
+        return DispatchTable(dialect.namespace, [
+            (key, (dialect.root if scope is None else ()) + tuple(path.format(cvParam=dialect.cvParam).split('/')),
+             first, scope)
+            for key, path, first, scope in cls._dispatch_paths + cls._statistics_paths
+        ], index=cls._dispatch_index)
+
+    def _dispatch_table(self):
+        """Get the dispatch table of the dialect of the document."""
+        table = self._dispatch_tables.get(self.dialect)
+        if table is None:
+            table = self._dispatch_tables[self.dialect] = self._compile_dispatch_table(self.dialect)
+        return table
 
     def instrument(self):
         """Parses the instrument model, manufacturer and software"""
-        instrument = self.tree.find(self.xpaths['instruments'].format(**self.env), self.ns)
-        cvs = instrument.iterfind('./{cvParam}'.format(**self.env), self.ns)
+        instrument = self.elements.first('instruments')
+        if instrument is None: return
 
-        for cv in cvs:
-            if cv.attrib['accession'] in self.nmrcv['NMR:1000031'].rchildren():
+        for cv in self.elements.all('instrument_cvs', instrument):
+            if self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1000031'):
 
-                self.meta['Instrument'] = {
-                    'name': cv.attrib['name'],
-                    'accession': cv.attrib['accession'],
-                    'ref': cv.attrib['cvRef'],
-                }
+                self.meta['Instrument'] = Record([
+                    ('name', cv.attrib['name']),
+                    ('accession', cv.attrib['accession']),
+                    ('ref', cv.attrib['cvRef']),
+                ])
 
-                manufacturer = next((x for x in self.nmrcv['NMR:1400255'].rchildren() if cv.attrib['name'].startswith(x.name)), None)
+                manufacturer = next((x for x in self.nmrcv.terms('NMR:1400255') if cv.attrib['name'].startswith(x.name)), None)
                 if manufacturer is not None:
-                    self.meta['Instrument manufacturer'] = {
-                        'name': manufacturer.name,
-                        'accession': manufacturer.id,
-                        'ref': 'NMRCV',
-                    }
+                    self.meta['Instrument manufacturer'] = Record([
+                        ('name', manufacturer.name),
+                        ('accession', manufacturer.id),
+                        ('ref', 'NMRCV'),
+                    ])
 
             # PROBE
-            elif cv.attrib['accession'] in self.nmrcv['NMR:1400014'].rchildren():
-                self.meta['NMR Probe'] = {
-                    'name': cv.attrib['name'],
-                    'accession': cv.attrib['accession'],
-                    'ref': cv.attrib['cvRef'],
-                }
+            elif self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1400014'):
+                self.meta['NMR Probe'] = Record([
+                    ('name', cv.attrib['name']),
+                    ('accession', cv.attrib['accession']),
+                    ('ref', cv.attrib['cvRef']),
+                ])
 
             # AUTOSAMPLER
-            elif cv.attrib['accession'] in self.nmrcv['NMR:1000234'].rchildren():
-                self.meta['Autosample'] = {
-                    'name': cv.attrib['name'],
-                    'accession': cv.attrib['accession'],
-                    'ref': cv.attrib['cvRef'],
-                }
-
-        soft_ref = instrument.find('s:softwareRef', self.ns)
+            elif self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1000234'):
+                self.meta['Autosample'] = Record([
+                    ('name', cv.attrib['name']),
+                    ('accession', cv.attrib['accession']),
+                    ('ref', cv.attrib['cvRef']),
+                ])
+
+        soft_ref = self.elements.first('instrument_software', instrument)
         if soft_ref is not None:
             soft, softv = self.software(soft_ref.attrib['ref'])
             if soft is not None:
                 self.meta['Instrument software'] = soft
             if softv is not None:
-                self.meta['Instrument software version'] = {'value': softv}
+                self.meta['Instrument software version'] = Record(value=softv)
 
     def software(self, soft_ref):
         """Parses software information
@@ -150,54 +309,40 @@ class nmrMLmeta(object):
             software version (str or None)
         """
 
-        for soft in self.tree.iterfind(self.xpaths['software'].format(**self.env), self.ns):
+        soft = self.elements.ref('software', soft_ref)
 
-            if soft.attrib['id'] == soft_ref:
+        if soft is not None:
 
-                soft_meta = { 'name': soft.attrib['name'],
-                              'ref':  soft.attrib['cvRef'],
-                              'accession': soft.attrib['accession'] }
+            soft_meta = Record([('name', soft.attrib['name']),
+                                ('ref', soft.attrib['cvRef']),
+                                ('accession', soft.attrib['accession'])])
 
-                if 'version' in soft.attrib:
-                    return soft_meta, soft.attrib['version']
-                else:
-                    return soft_meta, None
+            if 'version' in soft.attrib:
+                return soft_meta, soft.attrib['version']
+            else:
+                return soft_meta, None
 
         return None,None
 
     def acquisition(self):
-        acquisition = self.tree.find(self.xpaths['acquisition'].format(**self.env), self.ns)
+        acquisition = self.elements.first('acquisition')
         if acquisition is None: return
 
-        self.meta['Number of transients'] = {'value': int(acquisition.attrib['numberOfScans'])}
-        self.meta['Number of steady state scans'] = {'value': int(acquisition.attrib['numberOfSteadyStateScans'])}
-
-        terms = {'s:sampleAcquisitionTemperature': 'Temperature',
-                 's:sampleContainer': 'NMR tube type',
-                 's:spinningRate': 'Spinning Rate',
-                 's:relaxationDelay': 'Relaxation Delay',
-                 's:pulseSequence': 'Pulse sequence',
-                 's:DirectDimensionParameterSet/s:acquisitionNucleus': 'Acquisition Nucleus',
-                 's:DirectDimensionParameterSet/s:decouplingNucleus': 'Decoupling Nucleus',
-                 's:DirectDimensionParameterSet/s:effectiveExcitationField': 'Magnetic field strength',
-                 's:DirectDimensionParameterSet/s:sweepWidth': 'Sweep Width',
-                 's:DirectDimensionParameterSet/s:pulseWidth': 'Pulse Width',
-                 's:DirectDimensionParameterSet/s:irradiationFrequency': 'Irradiation Frequency',
-                 's:DirectDimensionParameterSet/s:samplingStrategy': 'Sampling Strategy',
-                 }
-
-        self.read_children(acquisition, terms)
+        self.meta['Number of transients'] = Record(value=int(acquisition.attrib['numberOfScans']))
+        self.meta['Number of steady state scans'] = Record(value=int(acquisition.attrib['numberOfSteadyStateScans']))
+
+        self.read_children(acquisition, self._acquisition_terms)
 
     def source_file(self):
-        source_files = self.tree.iterfind(self.xpaths['source_file'].format(**self.env), self.ns)
+        source_files = self.elements.all('source_file')
 
         hooked_terms = [
-            {'hook': lambda cv: cv.attrib['accession'] in self.nmrcv['NMR:1400285'].rchildren(), 'name':'Format'},
-            {'hook': lambda cv: cv.attrib['accession'] in self.nmrcv['NMR:1400119'].rchildren(), 'name':'Type'},
+            {'hook': lambda cv: self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1400285'), 'name':'Format'},
+            {'hook': lambda cv: self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1400119'), 'name':'Type'},
 
-            {'hook': lambda cv: cv.attrib['accession'] in self.nmrcv['NMR:1400122'].rchildren(), 'name':'Type'},
-            {'hook': lambda cv: cv.attrib['accession'] in self.nmrcv['NMR:1002006'].rchildren(), 'name':'Type'},
-            {'hook': lambda cv: cv.attrib['accession'] in self.nmrcv['NMR:1400123'].rchildren(), 'name':'Type'},
+            {'hook': lambda cv: self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1400122'), 'name':'Type'},
+            {'hook': lambda cv: self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1002006'), 'name':'Type'},
+            {'hook': lambda cv: self.nmrcv.is_a(cv.attrib['accession'], 'NMR:1400123'), 'name':'Type'},
             {'hook': lambda cv: cv.attrib['accession'] == 'NMR:1000319', 'name':'Type'},
         ]
 
@@ -214,14 +359,14 @@ class nmrMLmeta(object):
 
             if source.attrib['name'] in names:
                 name = names[source.attrib['name']]
-                self.meta[name+' File'] = {
-                    'value': self.sample + source.attrib['location'].split(self.sample)[-1]
-                }
+                self.meta[name+' File'] = Record(
+                    value=self.sample + source.attrib['location'].split(self.sample)[-1]
+                )
 
-                self._parse_cv(source, hooked_terms, name)
+                self._parse_cv(self.elements.all('source_file_cvs', source), hooked_terms, name)
 
     def contacts(self):
-        contacts = self.tree.iterfind(self.xpaths['contacts'].format(**self.env), self.ns)
+        contacts = self.elements.all('contacts')
         self.meta['contacts'] = {'entry_list': []}
         for contact in contacts:
             name = contact.attrib['fullname'].split(' ', 3)
@@ -240,51 +385,59 @@ class nmrMLmeta(object):
             } )
 
     def processing(self):
-        processing = self.tree.find(self.xpaths['processing'].format(**self.env), self.ns)
+        processing = self.elements.first('processing')
         if processing is None: return
 
         soft_ref = processing.attrib['softwareRef']
         soft, softv = self.software(soft_ref)
         self.meta['Data Transformation software'] = soft
         if softv is not None:
-            self.meta['Data Transformation software version'] = {'value': softv}
+            self.meta['Data Transformation software version'] = Record(value=softv)
 
         self.meta['Data Transformation Name'] = {'entry_list':[]}
-        for data_transformation in processing.iterfind(self.env['cvParam'], self.ns):
+        for data_transformation in self.elements.all('processing_cvs', processing):
             self.meta['Data Transformation Name']['entry_list'].append(
-                {
-                    'name': data_transformation.attrib['name'],
-                    'ref': data_transformation.attrib['cvRef'],
-                    'accession': data_transformation.attrib['accession'],
-                }
+                Record([
+                    ('name', data_transformation.attrib['name']),
+                    ('ref', data_transformation.attrib['cvRef']),
+                    ('accession', data_transformation.attrib['accession']),
+                ])
             )
 
     def spectrum(self):
-        spectrum = self.tree.find(self.xpaths['spectrum'].format(**self.env), self.ns)
+        spectrum = self.elements.first('spectrum')
         if spectrum is None: return
 
-        self.meta['Number of data points'] = {'value': int(spectrum.attrib['numberOfDataPoints'])}
+        self.meta['Number of data points'] = Record(value=int(spectrum.attrib['numberOfDataPoints']))
 
-        terms = {'s:xAxis': 'X axis range',
-                 's:yAxisType': 'Y axis type',
+        self.read_children(spectrum, self._spectrum_terms)
 
-                 's:processingParameterSet/s:postAcquisitionSolventSuppressionMethod/':'Post Acquisition Solvent Supression Method',
-                 's:processingParameterSet/s:calibrationCompound/':'Calibration Compound',
-                 's:processingParameterSet/s:dataTransformationMethod/':'Spectrum transformation method',
-                 's:firstDimensionProcessingParameterSet/s:zeroOrderPhaseCorrection': 'Zero Value Phase Correction',
-                 's:firstDimensionProcessingParameterSet/s:firstOrderPhaseCorrection': 'First Order Phase Correction',
-                 's:firstDimensionProcessingParameterSet/s:calibrationReferenceShift': 'Calibration Reference Shift',
-                 's:firstDimensionProcessingParameterSet/s:spectralDenoisingMethod': 'Spectral Denoising Method',
-                 's:firstDimensionProcessingParameterSet/s:windowFunction/s:windowFunctionMethod': 'Window Function Method',
-                 's:firstDimensionProcessingParameterSet/s:windowFunction/s:windowFunctionMethodParameter': 'Window Function Parameter',
-                 's:firstDimensionProcessingParameterSet/s:baselineCorrectionMethod': 'Baseline Correction Method',
-                 }
+    def data_statistics(self):
+        """Extracts summary statistics from the FID and spectrum data arrays.
 
-        self.read_children(spectrum, terms)
+        Arrays that cannot be decoded are skipped with a warning.
+        """
+        spectrum = self.elements.first('spectrum')
+        arrays = [
+            (self.elements.first('fid'), fid_statistics),
+            (None if spectrum is None else self.elements.first('spectrum_data', spectrum), spectrum_statistics),
+        ]
+        for array, statistics in arrays:
+            if array is None or not array.text:
+                continue
+            try:
+                data = decode_array(array.text, array.attrib['byteFormat'],
+                                    array.attrib.get('compressed', 'false').lower() == 'true')
+            except (KeyError, ValueError) as err:
+                warnings.warn("Could not decode {} of {}: {}".format(
+                    array.tag.rsplit('}', 1)[-1], self.sample, err))
+                continue
+            for name, value in six.iteritems(statistics(data)):
+                self.meta[name] = Record(value=value)
 
     def read_children(self, node, terms):
-        for childpath, name in terms.items():
-            child = node.find(childpath, self.ns)
+        for _, name in terms:
+            child = self.elements.first(name, node)
 
             if child is not None:
                 extract = self._children_extract(child)
@@ -304,21 +457,21 @@ class nmrMLmeta(object):
     def probehead(self):
         """Extracts the userParam ProbeHead if no CV term was found before."""
         if 'NMR Probe' not in self.meta:
-            probehead = self.tree.find(self.xpaths['probehead'].format(**self.env), self.ns)
+            probehead = self.elements.first('probehead')
             if probehead is not None:
-                self.meta['NMR Probe'] = {'name': probehead.attrib['value'], 'ref':'', 'accession':''}
+                self.meta['NMR Probe'] = Record([('name', probehead.attrib['value']), ('ref', ''), ('accession', '')])
 
     def pulse_sequence(self):
         """Extracts the userParam Pulse sequence if no CV term was found before."""
 
         if 'Pulse sequence' not in self.meta or not self.meta['Pulse sequence']:
-            pulse_sequence = self.tree.find(self.xpaths['pulse_sequence'].format(**self.env), self.ns)
+            pulse_sequence = self.elements.first('pulse_sequence')
             if pulse_sequence is not None:
-                self.meta['Pulse sequence'] = {'name': pulse_sequence.attrib['value'], 'ref':'', 'accession':''}
+                self.meta['Pulse sequence'] = Record([('name', pulse_sequence.attrib['value']), ('ref', ''), ('accession', '')])
 
     def _children_extract(self, child):
 
-        _dict = {}
+        _dict = Record()
 
         if 'value' in child.attrib:
             try:
@@ -334,9 +487,9 @@ class nmrMLmeta(object):
         if 'name' in child.attrib:
             _dict['name'] = child.attrib['name']
         if 'unitName' in child.attrib:
-            _dict['unit'] = { 'name': child.attrib['unitName'],
-                              'ref': child.attrib['unitCvRef'],
-                              'accession': child.attrib['unitAccession'] }
+            _dict['unit'] = Record([('name', child.attrib['unitName']),
+                                    ('ref', child.attrib['unitCvRef']),
+                                    ('accession', child.attrib['unitAccession'])])
         if 'cvRef' in child.attrib:
             _dict['ref'] = child.attrib['cvRef']
             _dict['accession'] = child.attrib['accession']
@@ -349,102 +502,52 @@ class nmrMLmeta(object):
         if not 'Magnetic field strength' in self.meta:
             return
 
-        if self.meta['Magnetic field strength']['unit']['accession'] != 'UO_0000325':
+        if self.meta['Magnetic field strength']['unit']['accession'] != accession_url('UO_0000325'):
             return
 
         if 'Acquisition Nucleus' in self.meta:
 
-            if self.meta['Acquisition Nucleus']['accession']  in self.gyromagnetic_table:
+            if self.meta['Acquisition Nucleus']['accession']  in self._gyromagnetic_urls:
 
                 mhz   =   float(self.meta['Magnetic field strength']['value'])
-                tesla = mhz / self.gyromagnetic_table[self.meta['Acquisition Nucleus']['accession']]
-
-                self.meta['Magnetic field strength'] = {
-                    'value': "{:.3f}".format(tesla),
-                    'unit': {'name':'tesla', 'ref':'UO', 'accession':'UO_0000228' }
-                }
-
-    @classmethod
-    def _urllize(cls, starting_point):
-        for k,v in starting_point.items():
+                tesla = mhz / self._gyromagnetic_urls[self.meta['Acquisition Nucleus']['accession']]
 
-            if isinstance(v, dict):
-                for key, param in v.items():
+                self.meta['Magnetic field strength'] = Record([
+                    ('value', "{:.3f}".format(tesla)),
+                    ('unit', Record([('name', 'tesla'), ('ref', 'UO'), ('accession', 'UO_0000228')])),
+                ])
 
-                    if isinstance(param, dict):
-                        cls._urllize(param)
-
-                    elif isinstance(param, list):
-                        for element in param:
-                            cls._urllize(element)
+    @staticmethod
+    def _urllize(starting_point):
+        urllize(starting_point)
 
-                    elif key=='accession':
-                        if 'http' not in param:
-                            starting_point[k][key] = cls._urllize_name(param)
+    _urllize_name = staticmethod(accession_url)
 
-            elif k == 'accession':
-                starting_point[k] = cls._urllize_name(v)
+    def _parse_cv(self, cvs, terms, name):
 
-    @staticmethod
-    def _urllize_name(accession):
-        if accession.startswith('NMR'):
-            return 'http://nmrML.org/nmrCV#{}'.format(accession)
-        elif accession.startswith('UO') or accession.startswith('CHEBI'):
-            return 'http://purl.obolibrary.org/obo/{}'.format(accession.replace(':', '_'))
-        elif accession.startswith('C'):
-            return 'http://ncicb.nci.nih.gov/xml/owl/EVS/Thesaurus.owl#{}'.format(accession.replace(':', '_'))
-        return accession
-
-    def _parse_cv(self, node, terms, name):
-
-        for cv in node.iterfind('./{cvParam}'.format(**self.env), self.ns):
+        for cv in cvs:
             for term in terms:
                 if term['hook'](cv):
-                        self.meta[' '.join([name, term['name']])] = {
-                            'name': cv.attrib['name'],
-                            'ref': cv.attrib['cvRef'],
-                            'accession': cv.attrib['accession']
-                        }
+                        self.meta[' '.join([name, term['name']])] = Record([
+                            ('name', cv.attrib['name']),
+                            ('ref', cv.attrib['cvRef']),
+                            ('accession', cv.attrib['accession']),
+                        ])
                         if 'unitName' in cv.attrib:
-                            self.meta[' '.join([name, term['name']])]['unit'] = {
-                                'name': cv.attrib['unitName'],
-                                'ref': cv.attrib['unitCvRef'],
-                                'accession': cv.attrib['unitAccession'],
-                            }
+                            self.meta[' '.join([name, term['name']])]['unit'] = Record([
+                                ('name', cv.attrib['unitName']),
+                                ('ref', cv.attrib['unitCvRef']),
+                                ('accession', cv.attrib['unitAccession']),
+                            ])
 
     def _build_env(self):
-
-        try:
-            # proper method to get namespace through nsmap (lxml)
-            self.ns = self.tree.getroot().nsmap
-            self.ns['s'] = self.ns.get(None, '')
-            self.ns.pop(None, None)
-        except AttributeError:
-            # 'hacked' method to get namespace through root tag (xml.etree)
-            if self.tree.getroot().tag.startswith('{'):
-                self.ns = {'s': self.tree.getroot().tag[1:].split('}')[0] }
-            else:
-                self.ns = {'s': ''}
-
-        if self.ns['s'] == '':
-            self.xpaths = self._raw_xpaths
-        else:
-            self.xpaths = self._namespaced_xpaths
-
-        self.env = {}
-
-        if self.tree.find('./s:nmrML', self.ns) is None:
-            self.env['root'] = '.'
-
-        if self.tree.find('{root}/s:instrumentConfigurationList'
-                          '/s:instrumentConfiguration/s:cvTerm'.format(**self.env), self.ns) is None:
-            self.env['cvParam'] = 's:cvParam'
-        else:
-            self.env['cvParam'] = 's:cvTerm'
+        """Probe the dialect of the parsed tree if it could not be sniffed"""
+        if self.dialect is None:
+            self.dialect = probe_dialect(self.tree)
 
     @property
     def meta_json(self):
-        return json.dumps(self.meta, indent=4, sort_keys=True)
+        return json.dumps(self.meta, indent=4, sort_keys=True, default=json_default)
 
     @property
     def meta_isa(self):
@@ -464,7 +567,7 @@ class nmrMLmeta(object):
 
     @property
     def isa_json(self):
-        return json.dumps(self.meta_isa, indent=4, sort_keys=True)
+        return json.dumps(self.meta_isa, indent=4, sort_keys=True, default=json_default)
 
 
 
@@ -0,0 +1,225 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **OntologyIndex**, a precomputed view of the nmrCV
+controlled vocabulary: the descendants of the handful of terms that
+nmrml2isa classifies cvParams against are computed only once, so that
+checking whether an accession falls under one of them is a set lookup.
+
+Indexes are saved as JSON snapshots in the user cache directory, keyed
+by the hash of the OWL file they were built from, so that the OWL file
+only needs to be parsed again when it (or the snapshot layout) changes.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+
+from . import __version__, __author__, __email__
+from .utils import NMR_CV_PATH, user_cache_dir
+
+
+#: bump this whenever the snapshot layout changes
+SNAPSHOT_VERSION = 1
+
+Term = collections.namedtuple('Term', ['id', 'name'])
+
+
+class OntologyIndex(object):
+    """Transitive-closure index of an ontology.
+
+    Arguments:
+        names (dict): a mapping of term ids to term names
+        children (dict): a mapping of term ids to the list of the ids
+            of their direct children (in ontology order)
+        roots (iterable, optional): the ids of the terms to precompute
+            descendants of [default: OntologyIndex.ROOTS]
+    """
+
+    ROOTS = (
+        'NMR:1000031', # NMR instrument model
+        'NMR:1400014', # NMR probe
+        'NMR:1000234', # autosampler
+        'NMR:1400255', # NMR instrument manufacturer
+        'NMR:1400285', # NMR software data format
+        'NMR:1400119', # FID file
+        'NMR:1400122', # pulse sequence file
+        'NMR:1002006', # acquisition parameter file
+        'NMR:1400123', # processing parameter file
+    )
+
+    def __init__(self, names, children, roots=ROOTS):
+        self.names = names
+        self.children = children
+        self.roots = tuple(roots)
+        self._ordered = {}
+        self._descendants = {}
+        for root in self.roots:
+            self._index(root)
+
+    @classmethod
+    def from_ontology(cls, ontology, roots=ROOTS):
+        """Build an index out of a `pronto.Ontology` instance."""
+        names, children = {}, {}
+        for term in ontology:
+            names[term.id] = term.name
+            children[term.id] = [child.id for child in term.children]
+        return cls(names, children, roots)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Restore an index saved with `OntologyIndex.to_snapshot`."""
+        index = cls.__new__(cls)
+        index.names = snapshot['names']
+        index.children = snapshot['children']
+        index.roots = tuple(snapshot['roots'])
+        index._ordered, index._descendants = {}, {}
+        for root in index.roots:
+            ids = snapshot['descendants'][root]
+            index._ordered[root] = tuple(Term(x, index.names.get(x, '')) for x in ids)
+            index._descendants[root] = frozenset(ids)
+        return index
+
+    def to_snapshot(self):
+        """Get a JSON-serializable snapshot of the index.
+
+        Returns:
+            dict: term names, *is_a* edges (as lists of children) and
+            the precomputed descendants of the index roots
+        """
+        return {
+            'version': SNAPSHOT_VERSION,
+            'names': self.names,
+            'children': {k: v for k, v in self.children.items() if v},
+            'roots': list(self.roots),
+            'descendants': {root: [t.id for t in self.terms(root)] for root in self.roots},
+        }
+
+    @property
+    def fingerprint(self):
+        """str: a hash of the indexed terms, names and relationships."""
+        if getattr(self, '_fingerprint', None) is None:
+            snapshot = json.dumps(self.to_snapshot(), sort_keys=True, separators=(',', ':'))
+            self._fingerprint = hashlib.sha1(snapshot.encode('utf-8')).hexdigest()
+        return self._fingerprint
+
+    def _index(self, root):
+        # same traversal order as pronto.Term.rchildren so that
+        # 'first match' lookups give the same results
+        self._ordered.setdefault(root, ())  # guard against cycles
+        ordered, seen = [], set()
+        direct = self.children.get(root, ())
+        for term_id in itertools.chain(direct, *(self._rchildren(x) for x in direct)):
+            if term_id not in seen:
+                seen.add(term_id)
+                ordered.append(term_id)
+        self._ordered[root] = tuple(Term(x, self.names.get(x, '')) for x in ordered)
+        self._descendants[root] = frozenset(ordered)
+
+    def _rchildren(self, term_id):
+        if term_id not in self._ordered:
+            self._index(term_id)
+        return (term.id for term in self._ordered[term_id])
+
+    def is_a(self, accession, root):
+        """Check if *accession* is a (recursive) child of *root*."""
+        try:
+            return accession in self._descendants[root]
+        except KeyError:
+            self._index(root)
+            return accession in self._descendants[root]
+
+    def descendants(self, root):
+        """Get the ids of all the (recursive) children of *root*.
+
+        Returns:
+            frozenset: the ids of the descendants of *root*
+        """
+        if root not in self._descendants:
+            self._index(root)
+        return self._descendants[root]
+
+    def terms(self, root):
+        """Get the (recursive) children of *root* in ontology order.
+
+        Returns:
+            tuple: a tuple of `Term` named tuples (with *id* and *name*)
+        """
+        if root not in self._ordered:
+            self._index(root)
+        return self._ordered[root]
+
+
+def load_index(path=NMR_CV_PATH, cache_dir=None, roots=OntologyIndex.ROOTS):
+    """Load the ontology at *path* and index it.
+
+    A snapshot of the index is looked up in *cache_dir* first, and the
+    OWL file is only parsed (and the snapshot written) on a cache miss.
+
+    Arguments:
+        path (str): the path to the OWL ontology [default: nmrCV.owl]
+        cache_dir (str, optional): the directory to store snapshots in,
+            ``None`` to use the user cache directory or ``False`` to
+            disable snapshots [default: None]
+        roots (iterable, optional): the ids of the terms to precompute
+            descendants of [default: OntologyIndex.ROOTS]
+
+    Returns:
+        OntologyIndex: the index of the loaded ontology
+    """
+    if cache_dir is False:
+        return _index_owl(path, roots)
+
+    with open(path, 'rb') as owl:
+        digest = hashlib.sha1(owl.read())
+    digest.update(json.dumps([SNAPSHOT_VERSION, list(roots)]).encode('utf-8'))
+    snapshot_path = os.path.join(cache_dir or user_cache_dir(),
+                                 'nmrCV-{}.json'.format(digest.hexdigest()))
+
+    try:
+        with open(snapshot_path, 'rb') as snapshot_file:
+            snapshot = json.loads(snapshot_file.read().decode('utf-8'))
+        if snapshot.get('version') == SNAPSHOT_VERSION:
+            return OntologyIndex.from_snapshot(snapshot)
+    except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    index = _index_owl(path, roots)
+    _write_snapshot(snapshot_path, index.to_snapshot())
+    return index
+
+
+def _index_owl(path, roots):
+    import pronto
+    return OntologyIndex.from_ontology(pronto.Ontology(path, False), roots)
+
+
+def _write_snapshot(snapshot_path, snapshot):
+    """Atomically write *snapshot*, silently giving up on I/O errors."""
+    dirname = os.path.dirname(snapshot_path)
+    tmp = None
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with tempfile.NamedTemporaryFile('wb', dir=dirname, delete=False) as tmp:
+            tmp.write(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'))
+        getattr(os, 'replace', os.rename)(tmp.name, snapshot_path)
+    except (IOError, OSError):
+        if tmp is not None:
+            try:
+                os.remove(tmp.name)
+            except OSError:
+                pass
@@ -4,7 +4,9 @@ Content
 -----------------------------------------------------------------------------
 This module exposes basic API of nmrl2isa, either being called from command
 line interface with arguments parsing via **main** function, or from another
-Python program via the **convert** function which works the same.
+Python program via the **convert** function which works the same, or
+via the **iter_metadata** function to get the metadata of each file
+without writing ISA-Tab files.
 
 About
 -----------------------------------------------------------------------------
@@ -27,56 +29,276 @@ import sys
 import six
 import glob
 import argparse
+import threading
 import textwrap
 import warnings
 import json
-import tarfile
-import zipfile
-import multiprocessing
-import multiprocessing.pool
-import pronto
 import functools
+import itertools
+import collections
 
-try:
-    import progressbar
-except ImportError:
-    progressbar = None
+# modules that are slow to import (such as progressbar, multiprocessing,
+# tarfile and zipfile) are only imported by the code paths using them, to
+# keep the command line interface quick to start
 
 from . import (
     __author__,
     __version__,
-    __name__,
     __license__,
 )
+# not imported as `__name__`, which would break pickling of the functions
+# of this module (needed to send them to worker processes)
+from . import __name__ as _program
+from .cache import MetadataCache
 from .isa   import ISA_Tab
 from .nmrml  import nmrMLmeta
+from .archive import ArchiveReader
+from .ontology import load_index
+from .prefetch import Prefetcher
+from .profiling import Profiler, NULL_PROFILER
 from .usermeta import UserMetaLoader
 from .utils import (
-    compr_extract,
     star_args,
     NMR_CV_PATH
 )
 
 
+#: a study to convert with `convert_many`
+Study = collections.namedtuple('Study', ['in_path', 'out_path', 'study_identifier', 'usermeta'])
+Study.__new__.__defaults__ = (None,)
+
+
+def _progressbar():
+    """Get the `progressbar` module, or `None` if it is not installed.
+    """
+    try:
+        import progressbar
+    except ImportError:
+        return None
+    return progressbar
+
 @star_args
-def _parse_file(filepath, ontology, pbar=None, verbose=False):
+def _parse_file(filepath, ontology, pbar=None, verbose=False, streaming=False, early_exit=False, profiler=NULL_PROFILER,
+                statistics=False):
     """Parse a single file using a cache ontology and a metadata extractor
 
     Arguments:
-        filepath (str): path to the nmrML file to parse
-        ontology (pronto.Ontology): the cached ontology to use (nmr CV)
+        filepath (str): path to the nmrML file to parse (or an
+            `ArchiveMember` or `PrefetchedFile`)
+        ontology (OntologyIndex): the cached ontology index to use (nmr CV)
         pbar (progressbar.ProgressBar, optional): a progressbar
             to display progresses onto [default: None]
+        verbose (bool, optional): print a message when done [default: False]
+        streaming (bool, optional): use the incremental parser that only
+            builds the metadata sections [default: False]
+        early_exit (bool, optional): stop reading the file once all the
+            metadata sections were parsed [default: False]
+        profiler (Profiler, optional): the profiler to record the time
+            spent parsing the file with [default: NULL_PROFILER]
+        statistics (bool, optional): also extract summary statistics from
+            the binary data arrays [default: False]
 
     Returns:
         dict: a dictionary containing the extracted metadata
     """
-    meta = nmrMLmeta(filepath, ontology).meta
+    name = getattr(filepath, 'name', filepath)
+    with profiler.span('parse', 'file', file=name):
+        parsed = nmrMLmeta(filepath, ontology, streaming=streaming, early_exit=early_exit, profiler=profiler,
+                           statistics=statistics)
     if pbar is not None:
         pbar.update(pbar.value + 1)
+    elif verbose and early_exit:
+        print("Finished parsing: {} (read {} of {} bytes)".format(
+            name, parsed.bytes_read, parsed.file_size or '?'))
     elif verbose:
-        print("Finished parsing: {}".format(filepath))
-    return meta
+        print("Finished parsing: {}".format(name))
+    return parsed.meta
+
+
+# state of a worker process, set once by `init_worker`
+_worker = {}
+
+def init_worker(ontology, options, profile=False):
+    """Initialize a worker process with the ontology index and parser options
+
+    This is the initializer of the pools of worker processes parsing
+    files, such as the ones given to `convert` with *pool*.
+    """
+    _worker['ontology'] = ontology
+    _worker['options'] = options
+    _worker['profiler'] = Profiler() if profile else NULL_PROFILER
+
+def _parse_in_worker(task):
+    """Parse a single ``(index, filepath)`` task within a worker process
+
+    Returns:
+        tuple: the index of the task, and both the extracted metadata and
+        the profiling events recorded while parsing the file
+    """
+    index, filepath = task
+    profiler = _worker['profiler']
+    meta = _parse_file(filepath, _worker['ontology'], None, profiler=profiler, **_worker['options'])
+    return index, (meta, profiler.drain())
+
+def _reorder(results):
+    """Yield the values of unordered ``(index, value)`` pairs in index order
+    """
+    pending, expected = {}, 0
+    for index, value in results:
+        pending[index] = value
+        while expected in pending:
+            yield pending.pop(expected)
+            expected += 1
+
+def _parse_task(task):
+    """Parse a single ``(index, filepath, ontology, options)`` task in a thread
+
+    Returns:
+        tuple: the index of the task, and the extracted metadata
+    """
+    index, filepath, ontology, options = task
+    return index, _parse_file(filepath, ontology, **options)
+
+def _throttled(tasks, slots, closed):
+    """Yield *tasks*, each once a slot of the *slots* semaphore is free
+
+    Pools consume their tasks in a separate thread, which this blocks
+    until the results of previous tasks were consumed; once the *closed*
+    event is set (and a slot released), the tasks stop.
+    """
+    for task in tasks:
+        slots.acquire()
+        if closed.is_set():
+            return
+        yield task
+
+def _parse_in_threads(filepaths, ontology, jobs, pbar=None, pool=None, **options):
+    """Parse files in a pool of threads, yielding metadata in input order
+
+    A *pool* of threads can be given to parse the files with, in which
+    case it is left open once the files are parsed.
+    """
+    owned = pool is None
+    if owned:
+        import multiprocessing.pool
+        pool = multiprocessing.pool.ThreadPool(jobs)
+    try:
+        parse = functools.partial(_parse_file, **options)
+        # tasks are generated lazily so that prefetched files are
+        # only scheduled when there are free prefetching slots
+        for meta in pool.imap(parse, ((f, ontology, pbar) for f in filepaths)):
+            yield meta
+        if owned:
+            pool.close()
+    finally:
+        if owned:
+            pool.terminate()
+            pool.join()
+
+def _parse_in_processes(filepaths, ontology, jobs, pbar=None, profiler=NULL_PROFILER, pool=None, **options):
+    """Parse files in a pool of processes, yielding metadata in input order
+
+    The ontology index is sent once to each worker when the pool starts
+    (or simply inherited by workers on platforms that fork), so tasks
+    only carry a file path. Results come back in chunks, in completion
+    order, and are reordered on the fly.
+
+    A *pool* of processes already initialized with `init_worker` can be
+    given to parse the files with, in which case *ontology* and *options*
+    are the ones the pool was initialized with, and the pool is left open
+    once the files are parsed.
+    """
+    owned = pool is None
+    if owned:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs, init_worker, (ontology, options, profiler.enabled))
+    try:
+        chunksize = max(1, min(64, len(filepaths) // (jobs * 4)))
+        results = pool.imap_unordered(_parse_in_worker, enumerate(filepaths), chunksize)
+        for meta, events in _reorder(results):
+            profiler.extend(events)
+            if pbar is not None:
+                pbar.update(pbar.value + 1)
+            yield meta
+        if owned:
+            pool.close()
+    finally:
+        if owned:
+            pool.terminate()
+            pool.join()
+
+def _parse_cached(filepaths, cache, parse, parse_one, pbar=None, verbose=False, profiler=NULL_PROFILER):
+    """Yield metadata in input order, only parsing files missing from *cache*
+
+    Arguments:
+        filepaths (list): the paths to the nmrML files
+        cache (MetadataCache): the cache to look up and update
+        parse (callable): a function parsing a list of files, yielding
+            their metadata in order
+        parse_one (callable): a function parsing a single file in the
+            calling thread, used for the records updated after they were
+            looked up (which must not start another pipeline while the
+            one of *parse* holds its jobs and prefetching slots)
+    """
+    with profiler.span('cache lookup'):
+        signatures = [cache.signature(f) for f in filepaths]
+        cached = [cache.has(f, s) for f, s in zip(filepaths, signatures)]
+    missing = [f for f, hit in zip(filepaths, cached) if not hit]
+    if verbose:
+        print("Metadata cache: {} hits, {} misses".format(
+            len(filepaths) - len(missing), len(missing)))
+
+    parsed = iter(parse(missing) if missing else ())
+    for filepath, signature, hit in zip(filepaths, signatures, cached):
+        meta = cache.get(filepath, signature) if hit else None
+        if meta is None and hit:
+            # the record was updated since it was looked up
+            meta = parse_one(filepath)
+            cache.put(filepath, meta)
+        elif meta is None:
+            meta = next(parsed)
+            cache.put(filepath, meta, signature)
+        elif pbar is not None:
+            pbar.update(pbar.value + 1)
+        yield meta
+
+def find_files(in_path, profiler=NULL_PROFILER):
+    """Find the nmrML files in a directory, an archive or matching a pattern
+
+    Arguments:
+        in_path (str): path to the directory or archive containing nmrML
+            files, or a glob pattern matching them
+        profiler (Profiler, optional): the profiler to record the time
+            spent finding files with [default: NULL_PROFILER]
+
+    Returns:
+        list: the nmrML files (or `ArchiveMember` references) found in
+            *in_path*, sorted
+        ArchiveReader: the reader of the archive at *in_path*, to close
+            once its members were read, or `None` for a directory or a
+            pattern
+    """
+    import tarfile
+    import zipfile
+
+    # get nmrML file in given folder (case unsensitive)
+    if os.path.isdir(in_path):
+        reader = None
+        with profiler.span('discovery', path=in_path):
+            nmrml_files = glob.glob(os.path.join(in_path, "*.[n|N][m|M][r|R][m|M][l|L]"))
+    elif os.path.isfile(in_path) and (tarfile.is_tarfile(in_path) or zipfile.is_zipfile(in_path)):
+        # members are only indexed, and opened by the jobs reading them
+        with profiler.span('archive indexing', path=in_path):
+            reader = ArchiveReader(in_path)
+        nmrml_files = reader.members
+    elif any(c in in_path for c in '*?['):
+        reader = None
+        with profiler.span('discovery', path=in_path):
+            nmrml_files = glob.glob(in_path)
+    else:
+        raise SystemError("Couldn't recognise format of "
+                          "{} as a source of nmrML files".format(in_path))
+    return sorted(nmrml_files), reader
 
 def convert(in_path, out_path, study_identifier, **kwargs):
     """ Parses a study from given *in_path* and then creates an ISA file.
@@ -85,7 +307,8 @@ def convert(in_path, out_path, study_identifier, **kwargs):
     the study identifier.
 
     Arguments:
-        in_path (str): path to the directory or archive containing nmrML files
+        in_path (str): path to the directory or archive containing nmrML
+            files, or a glob pattern matching them
         out_path (str): path to the output directory (new directories will be
             created here)
         study_identifier (str): study identifier (e.g. MTBLSxxx)
@@ -95,62 +318,338 @@ def convert(in_path, out_path, study_identifier, **kwargs):
             directly a json formatted string containing user-defined
             metadata [default: None]
         jobs (int, optional): the number of jobs to use [default: 1]
+        processes (bool, optional): run jobs in a process pool instead of
+            a thread pool [default: False]
         template_directory (str, optional): the path to a directory
             containing custom templates to use when importing ISA tab
             [default: None]
         verbose (bool): display more output [default: True]
         quiet (bool): do not display any output [default: False]
+        streaming (bool): parse files incrementally, without building the
+            binary data arrays in memory [default: False]
+        early_exit (bool): parse files incrementally, and stop reading them
+            once all metadata sections were seen; nmrML 1.0 files are still
+            read whole, since their last metadata section follows the
+            binary data arrays [default: False]
+        statistics (bool): also extract summary statistics (intensity
+            range, noise level, signal to noise ratio, non-finite points)
+            from the FID and spectrum data arrays; requires NumPy
+            [default: False]
+        cache (bool or str): keep the metadata extracted from the files of
+            a directory in a persistent cache, and only parse the files
+            added or modified since the last conversion; either `True` to
+            use the default cache location or the path to a cache database
+            [default: False]
+        cache_hash (bool): also compare file contents, and not only sizes
+            and modification times, to detect modified files [default: False]
+        prefetch (int): read up to this many files ahead of their parsing
+            in separate I/O threads, and parse them from memory; not used
+            with worker processes [default: 0]
+        io_jobs (int): the number of I/O threads used to prefetch files
+            [default: 2]
+        columnar (bool or str): also write the metadata of each study as a
+            typed columnar table, next to the ISA-Tab files; either `True`
+            to write a Parquet file if pyarrow is installed (or a NumPy NPZ
+            file otherwise), or the format to use (``parquet`` or ``npz``)
+            [default: False]
+        profile (str): record the wall-clock and CPU time spent in each
+            stage of the conversion and for each file, and save them to
+            ``{profile}.summary.json`` and ``{profile}.trace.json`` (in the
+            Chrome trace event format) [default: None]
+        ontology (OntologyIndex): an index of the nmrCV ontology already
+            loaded with `load_index`, to use instead of loading it again
+            [default: None]
+        pool (multiprocessing.pool.Pool): a pool of threads (or of worker
+            processes initialized with `init_worker`, if *processes* is
+            set) to parse files with instead of starting a new one; the
+            pool is left open [default: None]
+    """
+    study = Study(in_path, out_path, study_identifier, kwargs.pop('usermeta', None))
+    convert_many([study], **kwargs)
+
+def convert_many(studies, **kwargs):
+    """ Parses several studies and creates an ISA file for each of them.
+
+    The ontology is loaded once, and the files of all studies are parsed
+    by the same jobs, the ISA files of a study being written as soon as
+    all of its files were parsed.
+
+    Arguments:
+        studies (iterable): the studies to convert, as `Study` named tuples
+            (or any tuple of *in_path*, *out_path*, *study_identifier*
+            and *usermeta*)
+
+    Keyword Arguments:
+        The same as `convert`, except for *usermeta* which is given
+        with each study.
     """
     quiet = kwargs.get('quiet', False)
     verbose = kwargs.get('verbose', not quiet)
-    jobs = kwargs.get('jobs', 1)
-    template_directory = kwargs.get('template_directory', None)
-
+    profile = kwargs.get('profile', None)
+
+    profiler = Profiler() if profile else NULL_PROFILER
+    try:
+        with profiler.span('convert'):
+            _convert_studies(studies, profiler, **kwargs)
+    finally:
+        if profile:
+            paths = profiler.save(profile)
+            if verbose:
+                print("Profile saved to {} and {}".format(*paths))
 
-    # load the nmr controlled vocabulary
-    NMR_CV = pronto.Ontology(NMR_CV_PATH, False)
+def iter_metadata(in_path, jobs=1, ordered=True, **kwargs):
+    """ Iterate over the metadata of the nmrML files found in *in_path*.
 
-    # open user metadata file if any
-    meta_loader = UserMetaLoader(kwargs.get('usermeta', None))
+    Files are parsed lazily, at most *max_in_flight* at once, so that the
+    metadata of all the files is never held in memory together.
 
-    # get nmrML file in given folder (case unsensitive)
-    if os.path.isdir(in_path):
-        compr = False
-        nmrml_files = glob.glob(os.path.join(in_path, "*.[n|N][m|M][r|R][m|M][l|L]"))
-    elif tarfile.is_tarfile(in_path) or zipfile.is_zipfile(in_path):
-        compr = True
-        nmrml_files = compr_extract(in_path)
-    else:
-        raise SystemError("Couldn't recognise format of "
-                          "{} as a source of nmrML files".format(in_dir))
-
-    if nmrml_files:
-        if not (verbose or quiet) and progressbar is not None:
-            pbar = progressbar.ProgressBar(
-                min_value = 0, max_value = len(nmrml_files),
-                widgets=['Parsing {:8}: '.format(study_identifier),
-                           progressbar.SimpleProgress(),
-                           progressbar.Bar(marker=["#","█"][six.PY3], left=" |", right="| "),
-                           progressbar.ETA()]
-                )
-            pbar.start()
-        else:
-            pbar = None
+    Arguments:
+        in_path (str): path to the directory or archive containing nmrML
+            files, or a glob pattern matching them
+        jobs (int, optional): the number of jobs to use [default: 1]
+        ordered (bool, optional): yield files in sorted order; otherwise,
+            yield files as soon as they are parsed [default: True]
 
-        if jobs > 1:
-            pool = multiprocessing.pool.ThreadPool(jobs)
-            metalist = pool.map(_parse_file, [(nmrml_file, NMR_CV, pbar) for nmrml_file in sorted(nmrml_files)])
+    Keyword Arguments:
+        processes (bool, optional): run jobs in a process pool instead of
+            a thread pool [default: False]
+        max_in_flight (int): the maximum number of files being parsed or
+            parsed but not yet yielded [default: 4 * jobs]
+        streaming, early_exit, statistics, ontology, pool: see `convert`
+
+    Yields:
+        tuple: the source of each file (its path, or an `ArchiveMember`
+        reference) and a dictionary containing its metadata
+
+    Example:
+        >>> for source, meta in iter_metadata('study/*.nmrML', jobs=4):
+        ...     print(meta['Sample Name'].value)
+    """
+    NMR_CV = kwargs.get('ontology', None) or load_index(NMR_CV_PATH)
+    options = dict(streaming=kwargs.get('streaming', False), early_exit=kwargs.get('early_exit', False),
+                   statistics=kwargs.get('statistics', False))
+    pool = kwargs.get('pool', None)
+
+    nmrml_files, reader = find_files(in_path)
+    try:
+        if jobs <= 1 and pool is None:
+            for filepath in nmrml_files:
+                yield filepath, _parse_file(filepath, NMR_CV, **options)
+            return
+        for filepath, meta in _iter_in_pool(nmrml_files, NMR_CV, options, jobs, ordered, pool,
+                                            kwargs.get('processes', False),
+                                            kwargs.get('max_in_flight', 4 * jobs)):
+            yield filepath, meta
+    finally:
+        if reader is not None:
+            reader.close()
+
+def _iter_in_pool(filepaths, ontology, options, jobs, ordered, pool, processes, max_in_flight):
+    """Parse files in a pool, yielding ``(filepath, meta)`` as `iter_metadata` does
+    """
+    import multiprocessing.pool
+
+    owned = pool is None
+    if owned and processes:
+        pool = multiprocessing.Pool(jobs, init_worker, (ontology, options))
+    elif owned:
+        pool = multiprocessing.pool.ThreadPool(jobs)
+
+    slots, closed = threading.Semaphore(max(1, max_in_flight)), threading.Event()
+    try:
+        if processes:
+            tasks = _throttled(enumerate(filepaths), slots, closed)
+            results = ((index, meta) for index, (meta, _) in pool.imap_unordered(_parse_in_worker, tasks))
         else:
-            metalist = [_parse_file([nmrml_file, NMR_CV, pbar, verbose]) for nmrml_file in sorted(nmrml_files)]
-
-        if metalist:
+            tasks = _throttled(((i, f, ontology, options) for i, f in enumerate(filepaths)), slots, closed)
+            results = pool.imap_unordered(_parse_task, tasks)
+        if ordered:
+            results = _reorder((index, (index, meta)) for index, meta in results)
+        for index, meta in results:
+            slots.release()
+            yield filepaths[index], meta
+        if owned:
+            pool.close()
+    finally:
+        # unblock the task handler of the pool if it waits for a slot
+        closed.set()
+        slots.release()
+        if owned:
+            pool.terminate()
+            pool.join()
+
+def _convert_studies(studies, profiler=NULL_PROFILER, **kwargs):
+    """Convert several studies, recording stages with *profiler*
+    """
+    # load the nmr controlled vocabulary and index it once for all files
+    with profiler.span('ontology'):
+        NMR_CV = kwargs.get('ontology', None) or load_index(NMR_CV_PATH)
+
+    studies, study_files, readers = [Study(*study) for study in studies], [], []
+    try:
+        for study in studies:
+            nmrml_files, reader = find_files(study.in_path, profiler)
+            if not nmrml_files:
+                warnings.warn("No files were found in {}.".format(study.in_path))
+            study_files.append(nmrml_files)
+            if reader is not None:
+                readers.append(reader)
+        _write_studies(studies, study_files, NMR_CV, profiler, **kwargs)
+    finally:
+        for reader in readers:
+            reader.close()
+
+def _write_studies(studies, study_files, NMR_CV, profiler=NULL_PROFILER, **kwargs):
+    """Parse the files of several studies and write their ISA-Tab files
+    """
+    quiet = kwargs.get('quiet', False)
+    verbose = kwargs.get('verbose', not quiet)
+    jobs = kwargs.get('jobs', 1)
+    processes = kwargs.get('processes', False)
+    template_directory = kwargs.get('template_directory', None)
+    streaming = kwargs.get('streaming', False)
+    early_exit = kwargs.get('early_exit', False)
+    statistics = kwargs.get('statistics', False)
+    cache = kwargs.get('cache', False)
+    prefetch = kwargs.get('prefetch', 0)
+
+    nmrml_files = [f for files in study_files for f in files]
+    if not nmrml_files:
+        return
+
+    progressbar = None if verbose or quiet else _progressbar()
+    if progressbar is not None:
+        pbar = progressbar.ProgressBar(
+            min_value = 0, max_value = len(nmrml_files),
+            widgets=['Parsing {:8}: '.format(studies[0].study_identifier if len(studies) == 1 else 'batch'),
+                       progressbar.SimpleProgress(),
+                       progressbar.Bar(marker=["#","█"][six.PY3], left=" |", right="| "),
+                       progressbar.ETA()]
+            )
+        pbar.start()
+    else:
+        pbar = None
+
+    options = dict(verbose=verbose, streaming=streaming, early_exit=early_exit, profiler=profiler,
+                   statistics=statistics)
+    pool = kwargs.get('pool', None)
+    if processes and jobs > 1:
+        parse = functools.partial(_parse_in_processes, ontology=NMR_CV, jobs=jobs, pbar=pbar, pool=pool, **options)
+    elif jobs > 1:
+        parse = functools.partial(_parse_in_threads, ontology=NMR_CV, jobs=jobs, pbar=pbar, pool=pool, **options)
+    else:
+        parse = lambda files: (_parse_file(f, NMR_CV, pbar, **options) for f in files)
+
+    # worker processes already overlap their reads with extraction
+    if prefetch and processes and jobs > 1:
+        warnings.warn("Prefetching is not used with worker processes.")
+        prefetcher = None
+    elif prefetch:
+        prefetcher = Prefetcher(prefetch, kwargs.get('io_jobs', 2), profiler)
+        parse_files = parse
+        parse = lambda files: parse_files(prefetcher.iter(files))
+    else:
+        prefetcher = None
+
+    # archive members are never cached since they cannot be stat'ed
+    # (`MetadataCache.signature` returns None for anything but paths)
+    if cache:
+        metadata_cache = MetadataCache(
+            None if cache is True else cache,
+            fingerprint=NMR_CV.fingerprint,
+            hash_contents=kwargs.get('cache_hash', False),
+            options='statistics' if statistics else '',
+        )
+        parse_one = lambda f: _parse_file(f, NMR_CV, pbar, **options)
+        metas = _parse_cached(nmrml_files, metadata_cache, parse, parse_one, pbar, verbose, profiler)
+    else:
+        metadata_cache = None
+        metas = parse(nmrml_files)
+
+    # metadata is written as it is extracted instead of being stored, and
+    # since files are parsed in order, each study is written while the
+    # jobs are already parsing the files of the next ones
+    try:
+        for study, files in zip(studies, study_files):
+            if not files:
+                continue
             if verbose:
-                print("Dumping nmrML meta information into ISA-Tab structure")
-            isa_tab = ISA_Tab(out_path, study_identifier, usermeta=meta_loader.usermeta, template_directory=template_directory)
-            isa_tab.write(metalist)
+                print("Dumping nmrML meta information of {} into ISA-Tab structure".format(study.study_identifier))
+            with profiler.span('usermeta', study=study.study_identifier):
+                meta_loader = UserMetaLoader(study.usermeta)
+            isa_tab = ISA_Tab(study.out_path, study.study_identifier, usermeta=meta_loader.usermeta,
+                              template_directory=template_directory, profiler=profiler,
+                              columnar=kwargs.get('columnar', False), statistics=statistics)
+            with profiler.span('write', study=study.study_identifier):
+                isa_tab.write_stream(itertools.islice(metas, len(files)))
+    finally:
+        if metadata_cache is not None:
+            metadata_cache.close()
+
+    if prefetcher is not None and verbose:
+        print(prefetcher.report())
+
+def read_manifest(manifest):
+    """Read the studies to convert from a manifest file
+
+    The manifest is either a JSON list of objects, or a tab-separated
+    table with a header line, with *in_path*, *out_path*, *study_id*
+    and (optionally) *usermeta* fields.
+
+    Arguments:
+        manifest (str): the path to the manifest file
 
+    Returns:
+        list: a list of `Study` named tuples
+    """
+    with io.open(manifest, encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        records = json.loads(content)
     else:
-        warnings.warn("No files were found in {}.".format(in_path))
+        lines = [l for l in content.splitlines() if l.strip() and not l.startswith('#')]
+        header = lines[0].split('\t') if lines else []
+        records = [dict(zip(header, l.split('\t'))) for l in lines[1:]]
+    return [Study(r['in_path'], r['out_path'], r['study_id'], r.get('usermeta') or None)
+            for r in records]
+
+def add_convert_options(p):
+    """Add the conversion options shared by all commands to a parser
+
+    Arguments:
+        p (argparse.ArgumentParser): the parser to add the options to
+    """
+    p.add_argument('-j', dest='jobs', help='launch different processes for parsing', action='store', required=False, default=1, type=int)
+    p.add_argument('-P', dest='processes', help='run parsing jobs in separate processes instead of threads', action='store_true', default=False)
+    p.add_argument('-W', dest='wrng_ctrl', help='warning control (with python default behaviour)', action='store', default='once', required=False, choices=['ignore', 'always', 'error', 'default', 'module', 'once'])
+    p.add_argument('-t', dest='template_dir', help='directory containing default template files', action='store', default=None)
+    p.add_argument('--version', action='version', version='nmrml2isa {}'.format(__version__))
+    p.add_argument('-v', dest='verbose', help="show more output (default if progressbar2 is not installed)", action='store_true', default=False)
+    p.add_argument('-q', dest='quiet', help="do not show any output", action='store_true', default=False)
+    p.add_argument('--streaming', dest='streaming', help="parse files incrementally, skipping binary data arrays", action='store_true', default=False)
+    p.add_argument('--early-exit', dest='early_exit', help="stop reading files once their metadata was parsed (implies --streaming); only saves reading the data arrays of the pre-1.0 spectrumList layout", action='store_true', default=False)
+    p.add_argument('--statistics', dest='statistics', help="extract summary statistics from the FID and spectrum data arrays", action='store_true', default=False)
+    p.add_argument('--cache', dest='cache', help="only parse files modified since the last conversion, using a metadata cache (optionally at the given path)", nargs='?', const=True, default=False, metavar='PATH')
+    p.add_argument('--cache-hash', dest='cache_hash', help="compare file contents to detect modified files (with --cache)", action='store_true', default=False)
+    p.add_argument('--prefetch', dest='prefetch', help="read up to DEPTH files ahead of their parsing", type=int, default=0, metavar='DEPTH')
+    p.add_argument('--io-jobs', dest='io_jobs', help="the number of threads reading files ahead (with --prefetch)", type=int, default=2, metavar='N')
+    p.add_argument('--columnar', dest='columnar', help="also write the metadata as a Parquet (if pyarrow is installed) or NPZ file", nargs='?', const=True, default=False, choices=['parquet', 'npz'], metavar='FORMAT')
+    p.add_argument('--profile', dest='profile', help="save the time spent in each stage to PREFIX.summary.json and PREFIX.trace.json (Chrome trace format)", nargs='?', const='nmrml2isa-profile', default=None, metavar='PREFIX')
+
+def convert_options(args):
+    """Get the keyword arguments of `convert` from parsed arguments
+
+    Arguments:
+        args (argparse.Namespace): arguments parsed by a parser the
+            options were added to with `add_convert_options`
+    """
+    return dict(
+        verbose=args.verbose, jobs=args.jobs, processes=args.processes,
+        template_directory=args.template_dir, quiet=args.quiet,
+        streaming=args.streaming, early_exit=args.early_exit, statistics=args.statistics,
+        cache=args.cache, cache_hash=args.cache_hash, profile=args.profile,
+        prefetch=args.prefetch, io_jobs=args.io_jobs, columnar=args.columnar,
+    )
 
 def main(argv=None):
     """Run **nmrml2isa** from the command line
@@ -159,28 +658,32 @@ def main(argv=None):
         argv (list, optional): the list of arguments to run nmrml2isa
             with (if None, then sys.argv is used) [default: None]
     """
-    p = argparse.ArgumentParser(prog=__name__,
+    argv = argv or sys.argv[1:]
+    if argv and argv[0] == 'batch':
+        return batch(argv[1:])
+    elif argv and argv[0] in ('serve', 'submit'):
+        from . import server
+        return getattr(server, argv[0])(argv[1:])
+
+    p = argparse.ArgumentParser(prog=_program,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description='''Extract meta information from nmrML files and create ISA-tab structure''',
         usage='nmrml2isa -i IN_PATH -o OUT_PATH -s STUDY_ID [options]',
+        epilog='Use `nmrml2isa batch -h` to see how to convert several studies at once, and '
+               '`nmrml2isa serve -h` to run a conversion server.',
     )
 
     p.add_argument('-i', dest='in_path', help='input folder or archive containing nmrML files', required=True)
     p.add_argument('-o', dest='out_path', help='out folder (a new directory will be created here)', required=True)
     p.add_argument('-s', dest='study_id', help='study identifier (e.g. MTBLSxxx)', required=True)
     p.add_argument('-m', dest='usermeta', help='additional user provided metadata (JSON or XLSX format)', default=None, required=False)#, type=json.loads)
-    p.add_argument('-j', dest='jobs', help='launch different processes for parsing', action='store', required=False, default=1, type=int)
-    p.add_argument('-W', dest='wrng_ctrl', help='warning control (with python default behaviour)', action='store', default='once', required=False, choices=['ignore', 'always', 'error', 'default', 'module', 'once'])
-    p.add_argument('-t', dest='template_dir', help='directory containing default template files', action='store', default=None)
-    p.add_argument('--version', action='version', version='nmrml2isa {}'.format(__version__))
-    p.add_argument('-v', dest='verbose', help="show more output (default if progressbar2 is not installed)", action='store_true', default=False)
-    p.add_argument('-q', dest='quiet', help="do not show any output", action='store_true', default=False)
+    add_convert_options(p)
 
 
-    args = p.parse_args(argv or sys.argv[1:])
+    args = p.parse_args(argv)
 
 
-    if not progressbar:
+    if not args.quiet and _progressbar() is None:
         setattr(args, 'verbose', True)
 
     if args.verbose:
@@ -191,10 +694,41 @@ def main(argv=None):
     with warnings.catch_warnings():
         warnings.filterwarnings(args.wrng_ctrl)
         convert(args.in_path, args.out_path, args.study_id,
-           usermeta=args.usermeta, verbose=args.verbose,
-           jobs=args.jobs, template_directory=args.template_dir,
-           quiet=args.quiet,
-        )
+           usermeta=args.usermeta, **convert_options(args))
+
+def batch(argv=None):
+    """Run **nmrml2isa batch** from the command line
+
+    Arguments
+        argv (list, optional): the list of arguments to run the batch
+            command with (if None, then sys.argv is used) [default: None]
+    """
+    p = argparse.ArgumentParser(prog='{} batch'.format(_program),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent('''
+            Convert several studies at once, with a single set of parsing jobs.
+
+            The manifest is either a JSON list of objects or a tab-separated
+            table with a header line, with the in_path, out_path, study_id
+            and (optional) usermeta fields of each study.'''),
+        usage='nmrml2isa batch MANIFEST [options]',
+    )
+
+    p.add_argument('manifest', help='the manifest listing the studies to convert (JSON or TSV format)')
+    add_convert_options(p)
+
+    args = p.parse_args(argv if argv is not None else sys.argv[2:])
+
+    if not args.quiet and _progressbar() is None:
+        setattr(args, 'verbose', True)
+
+    studies = read_manifest(args.manifest)
+    if args.verbose:
+        print("{} converting {} studies from: {}{}".format(os.linesep, len(studies), args.manifest, os.linesep))
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings(args.wrng_ctrl)
+        convert_many(studies, **convert_options(args))
 
 
 
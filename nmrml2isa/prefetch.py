@@ -0,0 +1,194 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **Prefetcher**, a read-ahead pipeline reading the
+contents of upcoming nmrML files in a small pool of I/O threads, so that
+the jobs extracting metadata parse files from memory instead of
+alternating between waiting on the disk and using the CPU.
+
+The number of files read ahead is bounded: a file takes one of the
+*depth* slots of the prefetcher from the moment its read is scheduled
+until the parser is done with it, so at most *depth* files are held in
+memory at once.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import contextlib
+import io
+import threading
+import time
+
+import six
+
+from . import __version__, __author__, __email__
+from .profiling import NULL_PROFILER
+
+
+def read_source(source):
+    """Read the whole contents of a path or of an archive member."""
+    if isinstance(source, six.string_types):
+        with open(source, 'rb') as f:
+            return f.read()
+    with contextlib.closing(source.open()) as f:
+        return f.read()
+
+
+class _PrefetchedHandle(io.BytesIO):
+    """An in-memory file freeing its prefetcher slot once closed."""
+
+    def __init__(self, data, owner):
+        super(_PrefetchedHandle, self).__init__(data)
+        self._owner = owner
+
+    def close(self):
+        if self._owner is not None:
+            self._owner.release()
+            self._owner = None
+        super(_PrefetchedHandle, self).close()
+
+
+class PrefetchedFile(object):
+    """A file whose contents are being read ahead by a `Prefetcher`.
+
+    Attributes:
+        source (str or ArchiveMember): the file being read
+        name (str): the path of the file, or the name of the member
+    """
+
+    def __init__(self, prefetcher, source, result):
+        self.source = source
+        self.name = getattr(source, 'name', source)
+        self.size = None
+        self._prefetcher = prefetcher
+        self._result = result
+
+    def open(self):
+        """Wait for the contents of the file and open them in memory.
+
+        Returns:
+            file: a binary in-memory file, to be closed by the caller
+
+        Raises:
+            ValueError: when the file was already opened, or failed to be
+                read (its contents are freed once it was consumed)
+        """
+        if self._prefetcher is None:
+            raise ValueError("{} was already consumed".format(self.name))
+        with self._prefetcher.profiler.span('io wait', 'file', file=self.name):
+            start = time.time()
+            try:
+                data = self._result.get()
+            except BaseException:
+                self.release()
+                raise
+            finally:
+                if self._prefetcher is not None:
+                    self._prefetcher._add_wait(time.time() - start)
+        self.size, self._result = len(data), None
+        return _PrefetchedHandle(data, self)
+
+    def release(self):
+        """Free the slot of the file in the prefetcher.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher._slots.release()
+            self._prefetcher = None
+
+
+class Prefetcher(object):
+    """Read files ahead of their parsing in a pool of I/O threads.
+
+    Arguments:
+        depth (int): the maximum number of files read ahead and not yet
+            parsed [default: 4]
+        threads (int): the number of I/O threads [default: 2]
+        profiler (Profiler, optional): the profiler to record reads
+            and waits with [default: NULL_PROFILER]
+
+    Attributes:
+        wait (float): the total time (in seconds) spent waiting for the
+            contents of prefetched files once they were needed
+        read (float): the total time (in seconds) spent reading files
+            in the I/O threads
+        bytes_read (int): the total number of bytes read
+    """
+
+    def __init__(self, depth=4, threads=2, profiler=NULL_PROFILER):
+        self.depth = max(1, depth)
+        self.threads = max(1, threads)
+        self.profiler = profiler
+        self.wait = self.read = 0.0
+        self.bytes_read = 0
+        self._slots = threading.Semaphore(self.depth)
+        self._lock = threading.Lock()
+
+    def _add_wait(self, duration):
+        with self._lock:
+            self.wait += duration
+
+    def _read(self, source):
+        with self.profiler.span('io read', 'file', file=getattr(source, 'name', source)):
+            start = time.time()
+            data = read_source(source)
+        with self._lock:
+            self.read += time.time() - start
+            self.bytes_read += len(data)
+        return data
+
+    def iter(self, sources):
+        """Iterate over *sources*, reading them ahead.
+
+        Each yielded `PrefetchedFile` must be opened and closed (which
+        `nmrMLmeta` does) to free its slot for the next files.
+
+        Arguments:
+            sources (iterable): the paths or archive members to read
+
+        Yields:
+            PrefetchedFile: the files, in the order of *sources*
+        """
+        import multiprocessing.pool
+
+        sources, pending = iter(sources), collections.deque()
+        pool = multiprocessing.pool.ThreadPool(self.threads)
+        try:
+            exhausted = False
+            while True:
+                # schedule reads for as many files as there are free slots,
+                # and wait for one to be freed only if nothing is pending
+                blocking = not pending
+                while not exhausted and self._slots.acquire(blocking):
+                    blocking = False
+                    source = next(sources, None)
+                    if source is None:
+                        self._slots.release()
+                        exhausted = True
+                    else:
+                        result = pool.apply_async(self._read, (source,))
+                        pending.append(PrefetchedFile(self, source, result))
+                if not pending:
+                    break
+                yield pending.popleft()
+            # let the reads in progress complete
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def report(self):
+        """Get a human-readable summary of the I/O of the prefetcher.
+        """
+        return "Prefetched {} bytes in {:.3f}s of I/O, parsers waited {:.3f}s on I/O".format(
+            self.bytes_read, self.read, self.wait)
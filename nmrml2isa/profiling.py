@@ -0,0 +1,220 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **Profiler**, a lightweight instrumentation layer
+recording the wall-clock and CPU time spent in each stage of a conversion
+(ontology loading, file discovery, parsing of each file, ISA-Tab
+writing...), and exporting them either as a JSON summary or as a trace
+that can be opened in Chrome (``chrome://tracing``) or Perfetto.
+
+Stages are recorded as nested spans::
+
+    with profiler.span('parse', 'file', file=path):
+        ...
+
+When profiling is disabled, the shared **NULL_PROFILER** is used instead,
+the spans of which do not record anything.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import io
+import json
+import os
+import threading
+import time
+
+from . import __version__, __author__, __email__
+
+try:
+    _thread_time = time.thread_time
+except AttributeError:  # Python < 3.7
+    _thread_time = getattr(time, 'process_time', time.clock)
+
+
+class _Span(object):
+    """A context manager recording a single event into a profiler."""
+
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start', 'cpu')
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.cpu = _thread_time()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.time() - self.start
+        cpu = _thread_time() - self.cpu
+        self.profiler.record(self.name, self.category, self.start, wall, cpu, self.args)
+
+
+class _NullSpan(object):
+    """A context manager doing nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Profiler(object):
+    """Record the wall-clock and CPU time of the stages of a conversion.
+
+    Profilers are thread-safe. Events recorded in other processes can
+    be added to a profiler with `Profiler.extend`.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def span(self, name, category='stage', **args):
+        """Get a context manager recording the time spent in its block.
+
+        Arguments:
+            name (str): the name of the stage
+            category (str): the category of the stage, e.g. ``stage`` for
+                conversion-wide stages or ``file`` for per-file stages
+                [default: 'stage']
+
+        Keyword Arguments:
+            Any JSON-serializable annotation of the event (such as the
+            path of the file being processed).
+        """
+        return _Span(self, name, category, args)
+
+    def record(self, name, category, start, wall, cpu, args=None):
+        """Record a complete event.
+
+        Arguments:
+            name (str): the name of the stage
+            category (str): the category of the stage
+            start (float): the start timestamp, in seconds since the epoch
+            wall (float): the wall-clock duration, in seconds
+            cpu (float): the CPU time of the recording thread, in seconds
+            args (dict, optional): annotations of the event
+        """
+        event = {
+            'name': name, 'cat': category, 'start': start, 'wall': wall, 'cpu': cpu,
+            'pid': os.getpid(), 'tid': threading.current_thread().ident, 'args': args or {},
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """Remove and return the events recorded so far.
+        """
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def extend(self, events):
+        """Add events recorded by another profiler (e.g. in a worker process).
+        """
+        with self._lock:
+            self.events.extend(events)
+
+    def summary(self):
+        """Summarize the recorded events.
+
+        Note that stages may be nested (e.g. the parsing of each file
+        happens while writing the study file when metadata is streamed),
+        so their times do not add up.
+
+        Returns:
+            dict: the number of events and the total, mean and maximum wall
+            clock and CPU times of each stage, as well as the times of each
+            file-level event
+        """
+        stages = collections.OrderedDict()
+        files = []
+        for event in sorted(self.events, key=lambda e: e['start']):
+            stage = stages.setdefault(event['name'], {
+                'category': event['cat'], 'count': 0,
+                'wall': 0.0, 'cpu': 0.0, 'wall_max': 0.0,
+            })
+            stage['count'] += 1
+            stage['wall'] += event['wall']
+            stage['cpu'] += event['cpu']
+            stage['wall_max'] = max(stage['wall_max'], event['wall'])
+            if event['cat'] == 'file':
+                files.append(dict(event['args'], stage=event['name'],
+                                  wall=event['wall'], cpu=event['cpu']))
+        for stage in stages.values():
+            stage['wall_mean'] = stage['wall'] / stage['count']
+        return {'version': __version__, 'stages': stages, 'files': files}
+
+    def trace(self):
+        """Get the recorded events in the Chrome trace event format.
+
+        Returns:
+            dict: a trace object, with complete (``X``) events timed in
+            microseconds since the first recorded event
+        """
+        origin = min([e['start'] for e in self.events] or [0])
+        return {'traceEvents': [{
+            'name': e['name'], 'cat': e['cat'], 'ph': 'X',
+            'ts': (e['start'] - origin) * 1e6, 'dur': e['wall'] * 1e6,
+            'tdur': e['cpu'] * 1e6, 'pid': e['pid'], 'tid': e['tid'],
+            'args': e['args'],
+        } for e in self.events], 'displayTimeUnit': 'ms'}
+
+    def save(self, prefix):
+        """Save the summary and the trace of the recorded events.
+
+        Arguments:
+            prefix (str): the path prefix of the files to write, i.e.
+                ``{prefix}.summary.json`` and ``{prefix}.trace.json``
+
+        Returns:
+            tuple: the paths to the summary and trace files
+        """
+        paths = ('{}.summary.json'.format(prefix), '{}.trace.json'.format(prefix))
+        for path, data in zip(paths, (self.summary(), self.trace())):
+            with io.open(path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, indent=1, default=str, ensure_ascii=False))
+        return paths
+
+
+class NullProfiler(object):
+    """A profiler that does not record anything.
+    """
+
+    enabled = False
+    _span = _NullSpan()
+
+    def span(self, name, category='stage', **args):
+        return self._span
+
+    def record(self, *args, **kwargs):
+        pass
+
+    def drain(self):
+        return []
+
+    def extend(self, events):
+        pass
+
+
+#: the profiler used when profiling is disabled
+NULL_PROFILER = NullProfiler()
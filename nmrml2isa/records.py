@@ -0,0 +1,174 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **Record**, a compact mapping used for the small
+dictionaries nmrMLmeta extracts for each CV term, unit and value (such as
+``{'name': ..., 'ref': ..., 'accession': ..., 'unit': {...}}``). Records
+store their fields in `__slots__` instead of a per-instance dictionary,
+share the tuple listing their keys with all records of the same layout,
+and intern the names, references and accessions of the terms, which are
+repeated in every file of a study. Accessions are converted to URLs (see
+`nmrml2isa.accessions`) as soon as they are set.
+
+Records are mutable mappings, so they can be used wherever the metadata
+dictionaries were (in ISA-Tab templates in particular), but they are not
+`dict` instances: `json_default` must be given to `json.dumps` to
+serialize them.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import sys
+
+import six
+
+from . import __version__, __author__, __email__
+from .accessions import accession_url
+
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
+
+try:
+    _intern = sys.intern
+except AttributeError:  # Python 2 cannot intern unicode strings
+    _interned = {}
+
+    def _intern(string):
+        return _interned.setdefault(string, string)
+
+
+#: the keys a record can have
+FIELDS = ('value', 'name', 'unit', 'ref', 'accession')
+
+#: the fields of which string values are interned
+INTERNED_FIELDS = frozenset(['name', 'ref', 'accession'])
+
+_layouts = {}
+
+
+def _field(key, value):
+    """Get the value to store in the *key* field of a record."""
+    if key not in FIELDS:
+        raise KeyError('a record cannot have a {!r} key'.format(key))
+    if isinstance(value, six.string_types):
+        if key in INTERNED_FIELDS:
+            return _intern(accession_url(value) if key == 'accession' else value)
+    elif isinstance(value, Mapping) and not isinstance(value, Record):
+        return Record(value)
+    return value
+
+
+class Record(MutableMapping):
+    """A CV term, a unit or a value, stored compactly.
+
+    Arguments:
+        Same as `dict`, with keys from `FIELDS` only. Nested dictionaries
+        (such as the unit of a term) are converted to records as well.
+    """
+
+    __slots__ = ('_keys',) + FIELDS
+
+    def __init__(self, items=(), **kwargs):
+        # set all fields before sharing the layout, which is faster
+        # than going through `__setitem__` for each of them
+        keys = []
+        if isinstance(items, Mapping):
+            items = items.items()
+        for pairs in (items, kwargs.items()):
+            for key, value in pairs:
+                setattr(self, key, _field(key, value))
+                if key not in keys:
+                    keys.append(key)
+        keys = tuple(keys)
+        self._keys = _layouts.setdefault(keys, keys)
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, _field(key, value))
+        if key not in self._keys:
+            keys = self._keys + (key,)
+            self._keys = _layouts.setdefault(keys, keys)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        delattr(self, key)
+        keys = tuple(k for k in self._keys if k != key)
+        self._keys = _layouts.setdefault(keys, keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __repr__(self):
+        # the same as a dictionary, since records end up in ISA-Tab files
+        return repr(self.as_dict())
+
+    def __reduce__(self):
+        return Record, (list(self.items()),)
+
+    def copy(self):
+        """Get a shallow copy of the record.
+        """
+        return Record(self.items())
+
+    def as_dict(self):
+        """Get the record (and its nested records) as a dictionary.
+        """
+        return {k: v.as_dict() if isinstance(v, Record) else v for k, v in self.items()}
+
+
+def compact(value):
+    """Convert the CV term, unit and value dictionaries of *value* to records.
+
+    Arguments:
+        value (object): a metadata dictionary, or any of its values
+
+    Returns:
+        object: *value*, with the dictionaries that only have keys from
+        `FIELDS` (at any depth) replaced by records
+    """
+    if isinstance(value, Record):
+        return value
+    elif isinstance(value, Mapping):
+        if value and all(key in FIELDS for key in value):
+            return Record(value)
+        return type(value)((k, compact(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [compact(v) for v in value]
+    return value
+
+
+def json_default(obj):
+    """Serialize records (and other objects) with `json.dumps`.
+
+    Example:
+        >>> json.dumps({'Sample Name': Record(value='a')}, default=json_default)
+        '{"Sample Name": {"value": "a"}}'
+    """
+    if isinstance(obj, Record):
+        return obj.as_dict()
+    # NumPy scalars (such as data statistics), other than float64 which
+    # already is a float, are converted to the matching Python type
+    if type(obj).__module__ == 'numpy' and hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return six.text_type(obj)
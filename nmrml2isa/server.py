@@ -0,0 +1,560 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes **ConversionServer**, a long-running converter that
+loads the nmrCV ontology index once, keeps the compiled ISA-Tab templates
+and a pool of parsing jobs warm, and converts the studies submitted to its
+queue with a bounded number of conversions running at once, as well as an
+HTTP interface to it (see `make_server`, and ``nmrml2isa serve``) listening
+on localhost or on a Unix socket, and **Client**, which submits studies to
+a running server and waits for them to be converted (see ``nmrml2isa
+submit``).
+
+The HTTP interface exchanges JSON documents:
+
+* ``POST /jobs`` submits a study, given as an object with ``in_path``,
+  ``out_path``, ``study_id`` and (optionally) ``usermeta`` fields, and
+  returns the created job (or a ``503`` error if the queue is full);
+* ``GET /jobs`` lists the jobs, and ``GET /jobs/{id}`` returns a job,
+  waiting up to ``wait`` seconds for it to finish if given in the query
+  string (e.g. ``GET /jobs/3?wait=30``);
+* ``GET /status`` returns the state of the server.
+
+Jobs have an ``id``, a ``status`` (``queued``, ``running``, ``done`` or
+``failed``), the ``error`` that made them fail, the timestamps of their
+submission, start and end, and the time they spent queued and running.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+import warnings
+
+import six
+from six.moves import BaseHTTPServer, http_client, queue, socketserver
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from . import __version__, __author__, __email__
+from . import __name__ as _program
+from .ontology import load_index
+from .parsing import Study, add_convert_options, convert_many, convert_options, init_worker
+from .utils import NMR_CV_PATH
+
+
+#: the port the server listens on by default
+DEFAULT_PORT = 8413
+
+#: the number of finished jobs the server keeps track of
+KEEP_FINISHED = 1024
+
+#: the longest time a request waits for a job to finish, in seconds
+MAX_WAIT = 60
+
+
+class ServerError(Exception):
+    """An error returned by a conversion server.
+
+    Attributes:
+        status (int): the HTTP status of the response
+    """
+
+    def __init__(self, status, message):
+        super(ServerError, self).__init__(message)
+        self.status = status
+
+
+class Job(object):
+    """A study submitted to a `ConversionServer`.
+
+    Attributes:
+        id (int): the identifier of the job
+        study (Study): the study to convert
+        status (str): either ``queued``, ``running``, ``done`` or ``failed``
+        error (str): the error that made the job fail, or `None`
+        submitted (float): the time the job was submitted at
+        started (float): the time the job started at, or `None`
+        finished (float): the time the job finished at, or `None`
+    """
+
+    def __init__(self, id_, study):
+        self.id = id_
+        self.study = study
+        self.status = 'queued'
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish, and tell if it did.
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def as_dict(self):
+        """Get the job as a dictionary, as sent by the HTTP interface.
+        """
+        now = time.time()
+        return collections.OrderedDict([
+            ('id', self.id),
+            ('status', self.status),
+            ('in_path', self.study.in_path),
+            ('out_path', self.study.out_path),
+            ('study_id', self.study.study_identifier),
+            ('error', self.error),
+            ('submitted', self.submitted),
+            ('started', self.started),
+            ('finished', self.finished),
+            ('queued_time', (self.started or now) - self.submitted),
+            ('run_time', None if self.started is None else (self.finished or now) - self.started),
+        ])
+
+
+class ConversionServer(object):
+    """A converter processing the studies submitted to a queue.
+
+    The ontology index is loaded once, and the files of all studies are
+    parsed by the same pool of threads (or worker processes). Jobs running
+    at once can share a metadata cache (see the *cache* option), since
+    each record is committed as soon as it is stored.
+
+    Arguments:
+        max_jobs (int, optional): the number of studies converted at
+            once [default: 1]
+        max_queued (int, optional): the number of studies that can wait
+            in the queue, or 0 for no limit [default: 0]
+        **options: the options of `nmrml2isa.parsing.convert` used to
+            convert all studies (*usermeta* is given with each study, and
+            *profile* is not supported)
+    """
+
+    def __init__(self, max_jobs=1, max_queued=0, **options):
+        if options.pop('profile', None):
+            warnings.warn("Profiling is not supported by the conversion server.")
+        self.options = dict(options, quiet=True, verbose=False)
+        self.max_jobs = max_jobs
+        self.started = time.time()
+        self.ontology = load_index(NMR_CV_PATH)
+
+        jobs = self.options.get('jobs', 1)
+        if jobs > 1 and self.options.get('processes', False):
+            import multiprocessing
+            worker_options = dict(
+                verbose=False,
+                streaming=self.options.get('streaming', False),
+                early_exit=self.options.get('early_exit', False),
+                statistics=self.options.get('statistics', False),
+            )
+            self.pool = multiprocessing.Pool(jobs, init_worker, (self.ontology, worker_options))
+        elif jobs > 1:
+            import multiprocessing.pool
+            self.pool = multiprocessing.pool.ThreadPool(jobs)
+        else:
+            self.pool = None
+
+        self._ids = itertools.count(1)
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(max_queued)
+        self._threads = [threading.Thread(target=self._run) for _ in range(max_jobs)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, in_path, out_path, study_id, usermeta=None):
+        """Submit a study to convert.
+
+        Arguments:
+            in_path (str): the directory or archive containing nmrML files
+            out_path (str): the output directory
+            study_id (str): the study identifier (e.g. MTBLSxxx)
+            usermeta (str, optional): the path to a JSON or XLSX file, or
+                a JSON string, containing user-defined metadata
+                [default: None]
+
+        Returns:
+            Job: the submitted job
+
+        Raises:
+            queue.Full: when the queue is full
+        """
+        with self._lock:
+            job = Job(next(self._ids), Study(in_path, out_path, study_id, usermeta))
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._forget_finished()
+        return job
+
+    def _forget_finished(self):
+        finished = [i for i, job in six.iteritems(self._jobs) if job.finished is not None]
+        for i in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self._jobs[i]
+
+    def get(self, job_id):
+        """Get a job by identifier, or `None` if it is unknown.
+        """
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Get the jobs the server keeps track of, in submission order.
+        """
+        with self._lock:
+            return list(self._jobs.values())
+
+    def status(self):
+        """Get the state of the server, as sent by the HTTP interface.
+        """
+        counts = collections.Counter(job.status for job in self.jobs())
+        return collections.OrderedDict([
+            ('version', __version__),
+            ('uptime', time.time() - self.started),
+            ('max_jobs', self.max_jobs),
+            ('queued', counts['queued']),
+            ('running', counts['running']),
+            ('done', counts['done']),
+            ('failed', counts['failed']),
+        ])
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.started, job.status = time.time(), 'running'
+            try:
+                convert_many([job.study], ontology=self.ontology, pool=self.pool, **self.options)
+            except Exception as err:
+                job.error = '{}: {}'.format(type(err).__name__, err)
+                job.status = 'failed'
+            else:
+                job.status = 'done'
+            finally:
+                job.finished = time.time()
+                job._done.set()
+
+    def close(self, wait=True):
+        """Stop the server.
+
+        Arguments:
+            wait (bool, optional): convert the studies left in the queue
+                before stopping, or stop right away, abandoning the
+                conversions in progress [default: True]
+        """
+        if wait:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+        if self.pool is not None:
+            if wait:
+                self.pool.close()
+            else:
+                self.pool.terminate()
+            self.pool.join()
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """The HTTP interface of a `ConversionServer`."""
+
+    server_version = 'nmrml2isa/{}'.format(__version__)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        converter = self.server.converter
+        if parts == ['status']:
+            return self._reply(200, converter.status())
+        elif parts == ['jobs']:
+            return self._reply(200, [job.as_dict() for job in converter.jobs()])
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = converter.get(int(parts[1])) if parts[1].isdigit() else None
+            if job is None:
+                return self._error(404, "unknown job: {}".format(parts[1]))
+            try:
+                wait = float(parse_qs(url.query).get('wait', [0])[0])
+            except ValueError:
+                return self._error(400, "invalid wait time")
+            if wait > 0:
+                job.wait(min(wait, MAX_WAIT))
+            return self._reply(200, job.as_dict())
+        return self._error(404, "not found: {}".format(url.path))
+
+    def do_POST(self):
+        if urlparse(self.path).path.strip('/') != 'jobs':
+            return self._error(404, "not found: {}".format(self.path))
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            study = json.loads(self.rfile.read(length).decode('utf-8'))
+            usermeta = study.get('usermeta')
+            if usermeta is not None and not isinstance(usermeta, six.string_types):
+                usermeta = json.dumps(usermeta)
+            job = self.server.converter.submit(
+                study['in_path'], study['out_path'], study['study_id'], usermeta)
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            return self._error(400, "invalid study: {}".format(err))
+        except queue.Full:
+            return self._error(503, "the queue is full")
+        return self._reply(202, job.as_dict())
+
+    def _error(self, status, message):
+        return self._reply(status, {'error': message})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Unix socket clients have no address
+        if self.server.verbose:
+            sys.stderr.write("[{}] {}\n".format(self.log_date_time_string(), format % args))
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+if hasattr(socket, 'AF_UNIX'):
+
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def server_close(self):
+            socketserver.UnixStreamServer.server_close(self)
+            if os.path.exists(self.server_address):
+                os.remove(self.server_address)
+
+
+def _remove_stale_socket(socket_path):
+    """Remove the socket left at *socket_path* by a previous server.
+
+    Raises:
+        ValueError: when *socket_path* exists but is not a socket
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except OSError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError("{} exists and is not a socket".format(socket_path))
+    os.remove(socket_path)
+
+
+def make_server(converter, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, verbose=False):
+    """Create the HTTP interface of a conversion server.
+
+    Arguments:
+        converter (ConversionServer): the server to submit studies to
+        host (str, optional): the address to listen on [default: 127.0.0.1]
+        port (int, optional): the port to listen on, or 0 to pick a free
+            one [default: DEFAULT_PORT]
+        socket_path (str, optional): the path of a Unix socket to listen
+            on instead of a TCP port [default: None]
+        verbose (bool, optional): log requests to the standard error
+            [default: False]
+
+    Returns:
+        socketserver.BaseServer: the server, to run with `serve_forever`
+    """
+    if socket_path is not None:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError("Unix sockets are not supported on this platform")
+        _remove_stale_socket(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = _HTTPServer((host, port), _Handler)
+    server.converter = converter
+    server.verbose = verbose
+    return server
+
+
+class _UnixHTTPConnection(http_client.HTTPConnection):
+
+    def __init__(self, socket_path, timeout):
+        http_client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class Client(object):
+    """A client of a conversion server running on this machine.
+
+    Arguments:
+        host (str, optional): the address of the server [default: 127.0.0.1]
+        port (int, optional): the port of the server [default: DEFAULT_PORT]
+        socket_path (str, optional): the Unix socket of the server, to
+            use instead of *host* and *port* [default: None]
+        timeout (float, optional): the timeout of the requests, in
+            seconds [default: MAX_WAIT + 10]
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, timeout=MAX_WAIT + 10):
+        self.host, self.port, self.socket_path = host, port, socket_path
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        if self.socket_path is not None:
+            connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+        else:
+            connection = http_client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request(method, path, None if body is None else json.dumps(body),
+                               {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = json.loads(response.read().decode('utf-8'))
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise ServerError(response.status, data.get('error'))
+        return data
+
+    def submit(self, in_path, out_path, study_id, usermeta=None):
+        """Submit a study to convert.
+
+        Paths are made absolute, since the server may run from another
+        directory.
+
+        Returns:
+            dict: the submitted job
+        """
+        if usermeta is not None and os.path.exists(usermeta):
+            usermeta = os.path.abspath(usermeta)
+        return self._request('POST', '/jobs', {
+            'in_path': os.path.abspath(in_path),
+            'out_path': os.path.abspath(out_path),
+            'study_id': study_id,
+            'usermeta': usermeta,
+        })
+
+    def job(self, job_id, wait=0):
+        """Get a job, waiting up to *wait* seconds for it to finish.
+        """
+        return self._request('GET', '/jobs/{}?wait={}'.format(job_id, wait))
+
+    def jobs(self):
+        """Get the jobs the server keeps track of.
+        """
+        return self._request('GET', '/jobs')
+
+    def status(self):
+        """Get the state of the server.
+        """
+        return self._request('GET', '/status')
+
+    def wait(self, job_id, timeout=None):
+        """Wait for a job to finish.
+
+        Arguments:
+            job_id (int): the identifier of the job
+            timeout (float, optional): the time to wait for, in seconds,
+                or `None` to wait until the job finishes [default: None]
+
+        Returns:
+            dict: the job, which is still queued or running if the
+            timeout expired
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = MAX_WAIT if deadline is None else max(0, min(MAX_WAIT, deadline - time.time()))
+            job = self.job(job_id, wait)
+            if job['status'] in ('done', 'failed') or (deadline is not None and time.time() >= deadline):
+                return job
+
+
+def _add_address_options(p):
+    p.add_argument('--host', dest='host', help="the address of the server (default: %(default)s)", default='127.0.0.1')
+    p.add_argument('--port', dest='port', help="the port of the server (default: %(default)s)", type=int, default=DEFAULT_PORT)
+    p.add_argument('--socket', dest='socket_path', help="the Unix socket of the server, instead of a TCP port", default=None, metavar='PATH')
+
+
+def serve(argv=None):
+    """Run **nmrml2isa serve** from the command line
+
+    Arguments
+        argv (list, optional): the list of arguments to run the server
+            with (if None, then sys.argv is used) [default: None]
+    """
+    p = argparse.ArgumentParser(prog='{} serve'.format(_program),
+        description='Run a conversion server, keeping the ontology and the parsing jobs loaded between studies.',
+        usage='nmrml2isa serve [--port PORT | --socket PATH] [options]',
+    )
+    _add_address_options(p)
+    p.add_argument('--max-jobs', dest='max_jobs', help="the number of studies converted at once (default: %(default)s)", type=int, default=1, metavar='N')
+    p.add_argument('--max-queued', dest='max_queued', help="the number of studies that can wait in the queue (default: no limit)", type=int, default=0, metavar='N')
+    add_convert_options(p)
+
+    args = p.parse_args(argv if argv is not None else sys.argv[2:])
+
+    options = convert_options(args)
+    with warnings.catch_warnings():
+        warnings.filterwarnings(args.wrng_ctrl)
+        converter = ConversionServer(args.max_jobs, args.max_queued, **options)
+        server = make_server(converter, args.host, args.port, args.socket_path, args.verbose)
+        if not args.quiet:
+            print("Serving on {}".format(args.socket_path or 'http://{}:{}/'.format(*server.server_address[:2])))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            converter.close(wait=False)
+
+
+def submit(argv=None):
+    """Run **nmrml2isa submit** from the command line
+
+    Arguments
+        argv (list, optional): the list of arguments to submit a study
+            with (if None, then sys.argv is used) [default: None]
+    """
+    p = argparse.ArgumentParser(prog='{} submit'.format(_program),
+        description='Submit a study to a conversion server, and wait for its conversion.',
+        usage='nmrml2isa submit -i IN_PATH -o OUT_PATH -s STUDY_ID [options]',
+    )
+    p.add_argument('-i', dest='in_path', help='input folder or archive containing nmrML files', required=True)
+    p.add_argument('-o', dest='out_path', help='out folder (a new directory will be created here)', required=True)
+    p.add_argument('-s', dest='study_id', help='study identifier (e.g. MTBLSxxx)', required=True)
+    p.add_argument('-m', dest='usermeta', help='additional user provided metadata (JSON or XLSX format)', default=None)
+    p.add_argument('--no-wait', dest='wait', help="do not wait for the study to be converted", action='store_false', default=True)
+    _add_address_options(p)
+
+    args = p.parse_args(argv if argv is not None else sys.argv[2:])
+
+    client = Client(args.host, args.port, args.socket_path)
+    job = client.submit(args.in_path, args.out_path, args.study_id, args.usermeta)
+    if args.wait:
+        job = client.wait(job['id'])
+    print(json.dumps(job, indent=4))
+    if job['status'] == 'failed':
+        sys.exit(1)
@@ -0,0 +1,160 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module decodes the binary data arrays of nmrML files (the FID in
+``fidData`` and the spectrum in ``spectrumDataArray``) and computes summary
+statistics from them, used as quality control parameters in assay files.
+
+Arrays are base64-encoded and usually zlib-compressed: `decode_array`
+decodes and decompresses them by chunks of `CHUNK_SIZE` characters into a
+single byte buffer, which is then viewed as a NumPy array without copy, so
+that no intermediate Python list or full-size decoded string is built. The
+statistics are computed with vectorised NumPy operations.
+
+NumPy is only required when statistics are extracted.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import binascii
+import collections
+import zlib
+
+from . import __version__, __author__, __email__
+
+
+#: the number of base64 characters decoded at once
+CHUNK_SIZE = 64 * 1024
+
+#: the NumPy data types of the nmrML byte formats (always little-endian)
+BYTE_FORMATS = {
+    'integer32': '<i4',
+    'integer64': '<i8',
+    'float32': '<f4',
+    'float64': '<f8',
+    'complex64': '<c8',
+    'complex128': '<c16',
+}
+
+#: the factor converting the median absolute deviation of the differences
+#: between consecutive points to the standard deviation of gaussian noise
+MAD_TO_SIGMA = 1 / (0.6744897501960817 * 2 ** 0.5)
+
+#: the number of significant digits of the statistics
+DIGITS = 6
+
+
+def decode_array(text, byte_format, compressed=True, chunk_size=CHUNK_SIZE):
+    """Decode a base64-encoded binary data array.
+
+    Arguments:
+        text (str): the base64 text content of the data array element
+        byte_format (str): the ``byteFormat`` of the data array
+            (e.g. ``Complex128``), see `BYTE_FORMATS`
+        compressed (bool, optional): whether the array is zlib-compressed
+            [default: True]
+        chunk_size (int, optional): the number of characters decoded at
+            once [default: CHUNK_SIZE]
+
+    Returns:
+        numpy.ndarray: the decoded array, viewing the decoded bytes
+
+    Raises:
+        KeyError: when the byte format is not supported
+        ValueError: when the data is not valid base64 or zlib data
+    """
+    import numpy
+
+    dtype = numpy.dtype(BYTE_FORMATS[byte_format.lower()])
+    decompressor = zlib.decompressobj() if compressed else None
+    buffer, carry = bytearray(), ''
+
+    for start in range(0, len(text), chunk_size):
+        # base64 can only be decoded by groups of 4 characters, and
+        # the text may be wrapped on several lines
+        chunk = carry + ''.join(text[start:start + chunk_size].split())
+        end = len(chunk) - len(chunk) % 4
+        chunk, carry = chunk[:end], chunk[end:]
+        try:
+            data = binascii.a2b_base64(chunk.encode('ascii'))
+            buffer.extend(decompressor.decompress(data) if compressed else data)
+        except (binascii.Error, UnicodeEncodeError, zlib.error) as err:
+            raise ValueError("invalid binary data: {}".format(err))
+
+    if carry.strip('='):
+        raise ValueError("truncated base64 data")
+    if compressed:
+        buffer.extend(decompressor.flush())
+        if not getattr(decompressor, 'eof', True):  # Python 2 cannot tell
+            raise ValueError("truncated zlib data")
+
+    return numpy.frombuffer(buffer, dtype=dtype, count=len(buffer) // dtype.itemsize)
+
+
+def _round(value):
+    return float('{:.{}g}'.format(value, DIGITS))
+
+
+def spectrum_statistics(intensities):
+    """Compute summary statistics of the intensities of a spectrum.
+
+    The noise is estimated from the median absolute deviation of the
+    differences between consecutive points, which is barely affected by
+    peaks as long as they span a small part of the spectrum.
+
+    Arguments:
+        intensities (numpy.ndarray): the intensities of the spectrum
+            (only the real part of complex intensities is used)
+
+    Returns:
+        collections.OrderedDict: the statistics, by name; the ones that
+        cannot be computed (e.g. without any finite point) are missing
+    """
+    import numpy
+
+    intensities = numpy.real(intensities)
+    finite = numpy.isfinite(intensities)
+    stats = collections.OrderedDict()
+    stats['Spectrum non-finite points'] = int(intensities.size - numpy.count_nonzero(finite))
+    if stats['Spectrum non-finite points']:
+        intensities = intensities[finite]
+    if not intensities.size:
+        return stats
+
+    stats['Spectrum minimum intensity'] = _round(intensities.min())
+    stats['Spectrum maximum intensity'] = _round(intensities.max())
+    if intensities.size > 2:
+        noise = numpy.median(numpy.abs(numpy.diff(intensities))) * MAD_TO_SIGMA
+        stats['Spectrum noise level'] = _round(noise)
+        if noise > 0:
+            stats['Spectrum signal to noise ratio'] = _round(intensities.max() / noise)
+    return stats
+
+
+def fid_statistics(fid):
+    """Compute summary statistics of a free induction decay.
+
+    Arguments:
+        fid (numpy.ndarray): the points of the FID
+
+    Returns:
+        collections.OrderedDict: the statistics, by name
+    """
+    import numpy
+
+    finite = numpy.isfinite(fid)
+    stats = collections.OrderedDict()
+    stats['FID non-finite points'] = int(fid.size - numpy.count_nonzero(finite))
+    if stats['FID non-finite points']:
+        fid = fid[finite]
+    if fid.size:
+        stats['FID maximum magnitude'] = _round(numpy.abs(fid).max())
+    return stats
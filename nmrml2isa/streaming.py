@@ -0,0 +1,207 @@
+# coding: utf-8
+"""
+Content
+-----------------------------------------------------------------------------
+This module exposes an incremental parser for nmrML files that only builds
+the parts of the document nmrml2isa extracts metadata from: the file is fed
+to the XML parser in chunks, and elements outside of the metadata sections
+(as well as the base64 binary payloads of FIDs and spectra) are dropped as
+soon as the parser emits them, without ever being stored.
+
+The parser can also keep track of the metadata sections it has completed,
+and stop reading the file as soon as none of them can appear anymore.
+
+License
+-----------------------------------------------------------------------------
+GNU General Public License version 3.0 (GPLv3)
+"""
+from __future__ import (
+    print_function,
+    absolute_import,
+    unicode_literals,
+)
+
+import six
+
+from . import __version__, __author__, __email__
+from .utils import etree
+
+
+#: the elements holding base64-encoded binary data arrays
+BINARY_TAGS = frozenset(['fidData', 'spectrumDataArray'])
+
+#: the order of the children of the root element in the nmrML schema
+#: (`spectrum` is the pre-1.0 name of `spectrumList`)
+ROOT_ORDER = {tag: rank for rank, tags in enumerate([
+    ['cvList'],
+    ['fileDescription'],
+    ['contactList'],
+    ['referenceableParamGroupList'],
+    ['sourceFileList'],
+    ['softwareList'],
+    ['instrumentConfigurationList'],
+    ['dataProcessingList'],
+    ['sampleList'],
+    ['acquisition'],
+    ['spectrumList', 'spectrum'],
+]) for tag in tags}
+
+#: the size of the chunks fed to the parser
+CHUNK_SIZE = 64 * 1024
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class MetadataTreeBuilder(object):
+    """A parser target building a tree pruned to the metadata sections.
+
+    A section is completed once the element of the root it is located
+    under is closed, once a root child coming after it in the schema is
+    opened, or, for sections listed in *first*, as soon as a first
+    matching element is closed.
+
+    Arguments:
+        sections (iterable): the paths to the metadata sections, as
+            tuples of tag local names relative to the root element
+        first (iterable, optional): the paths to the sections of which
+            only the first match is needed [default: ()]
+        skip (iterable, optional): the local names of elements to drop
+            even inside metadata sections [default: BINARY_TAGS]
+    """
+
+    def __init__(self, sections, first=(), skip=BINARY_TAGS):
+        self.sections = [tuple(section) for section in sections]
+        self.first = frozenset(tuple(section) for section in first)
+        self.skip = frozenset(skip)
+        self.pending = set(self.sections)
+        self._builder = etree.TreeBuilder()
+        self._path = []
+        self._tags = []
+        self._skipped = 0
+
+    @property
+    def done(self):
+        """bool: whether all the metadata sections were completed."""
+        return not self.pending
+
+    def _wanted(self, path):
+        """Check if the element at *path* (without the root) is needed."""
+        if self.skip.intersection(path):
+            return False
+        for section in self.sections:
+            depth = min(len(section), len(path))
+            if section[:depth] == path[:depth]:
+                return True
+        return False
+
+    def _complete(self, path):
+        """Mark the sections that cannot match after *path* ends."""
+        if not path:
+            self.pending.clear()
+        elif path in self.first:
+            self.pending.discard(path)
+        if len(path) == 1:
+            self.pending.difference_update([s for s in self.pending if s[0] == path[0]])
+
+    def _opened_toplevel(self, tag):
+        """Mark the sections located before *tag* in the schema."""
+        rank = ROOT_ORDER.get(tag)
+        if rank is not None:
+            self.pending.difference_update([
+                s for s in self.pending
+                if s[0] != tag and ROOT_ORDER.get(s[0], rank + 1) <= rank
+            ])
+
+    def start(self, tag, attrib, nsmap=None):
+        if self._skipped:
+            self._skipped += 1
+            return
+        local = _localname(tag)
+        if len(self._path) == 1:
+            self._opened_toplevel(local)
+        path = tuple(self._path[1:]) + (local,)
+        if self._path and not self._wanted(path):
+            self._skipped = 1
+            return
+        self._path.append(local)
+        self._tags.append(tag)
+        if nsmap is None:
+            self._builder.start(tag, attrib)
+        else:
+            # lxml reports the default namespace with an empty prefix
+            # but expects it as `None` when building elements
+            nsmap = {prefix or None: uri for prefix, uri in six.iteritems(nsmap)}
+            self._builder.start(tag, attrib, nsmap)
+
+    def end(self, tag):
+        if self._skipped:
+            self._skipped -= 1
+            return
+        self._complete(tuple(self._path[1:]))
+        self._path.pop()
+        self._tags.pop()
+        return self._builder.end(tag)
+
+    def data(self, data):
+        if not self._skipped:
+            self._builder.data(data)
+
+    def close(self):
+        return self._builder.close()
+
+    def finish(self):
+        """Close the elements still open and return the root element."""
+        while self._tags:
+            self._path.pop()
+            self._builder.end(self._tags.pop())
+        return self._builder.close()
+
+
+def parse_metadata(in_file, sections, first=(), early_exit=False, chunk_size=CHUNK_SIZE, skip=BINARY_TAGS):
+    """Incrementally parse the metadata sections of an nmrML file.
+
+    Arguments:
+        in_file (str or file): the path to an nmrML file, or a file-like
+            object opened in binary mode
+        sections (iterable): the paths to the metadata sections, as
+            tuples of tag local names relative to the root element
+        first (iterable, optional): the paths to the sections of which
+            only the first match is needed [default: ()]
+        early_exit (bool, optional): stop reading the file as soon as all
+            metadata sections were completed; this only saves reading
+            data when the last metadata section comes before the binary
+            payloads, as in the pre-1.0 ``spectrumList`` layout (in the
+            nmrML 1.0 layout, the metadata of ``spectrum1D`` follows the
+            FID and starts with its data array, so the whole file is
+            read) [default: False]
+        chunk_size (int, optional): the number of bytes to read at once
+            [default: CHUNK_SIZE]
+        skip (iterable, optional): the local names of elements to drop
+            even inside metadata sections [default: BINARY_TAGS]
+
+    Returns:
+        ElementTree: a tree containing only the metadata sections
+        int: the number of bytes read from *in_file*
+    """
+    builder = MetadataTreeBuilder(sections, first, skip)
+    parser = etree.XMLParser(target=builder)
+    bytes_read = 0
+
+    handle = open(in_file, 'rb') if isinstance(in_file, six.string_types) else in_file
+    try:
+        while not (early_exit and builder.done):
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            parser.feed(chunk)
+    finally:
+        if handle is not in_file:
+            handle.close()
+
+    if early_exit and builder.done:
+        # the parser is left unclosed since the document may be incomplete
+        return etree.ElementTree(builder.finish()), bytes_read
+    return etree.ElementTree(parser.close()), bytes_read
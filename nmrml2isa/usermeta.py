@@ -6,7 +6,6 @@ from __future__ import (
 )
 
 import json
-import openpyxl
 import six
 import os
 import sys
@@ -375,6 +374,8 @@ class UserMetaLoader(object):
     def _parse_xlsx_file(self, usermeta_token):
         """
         """
+        import openpyxl
+
         self.usermeta = {}
         sheet = openpyxl.load_workbook(usermeta_token).worksheets[0]
 
@@ -435,6 +436,7 @@ class UserMetaLoader(object):
 
     @classmethod
     def dump_template_xlsx(cls, output_directory, name='usermeta.xlsx'):
+        import openpyxl
 
         wb = openpyxl.Workbook()
         x, y = 65,1
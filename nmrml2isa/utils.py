@@ -8,8 +8,8 @@ from __future__ import (
 import six
 import string
 import os
+import sys
 import functools
-import tarfile
 import collections
 
 try:
@@ -21,6 +21,24 @@ from . import __version__, __author__, __email__
 
 NMR_CV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nmrCV.owl')
 
+
+def user_cache_dir():
+    """Get the directory where nmrml2isa keeps data between runs.
+
+    The ``NMRML2ISA_CACHE_DIR`` environment variable takes precedence
+    over the platform default.
+    """
+    path = os.environ.get('NMRML2ISA_CACHE_DIR')
+    if path:
+        return path
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'nmrml2isa')
+
 # GET BEST AVAILABLE XML PARSER
 try:
     from lxml import etree
@@ -57,18 +75,103 @@ class PermissiveFormatter(string.Formatter):
             else:
                 raise
 
-class _TarFile(tarfile.TarFile):
-    """A TarFile proxy with a setable name
+try:
+    from _string import formatter_field_name_split
+except ImportError:
+    def formatter_field_name_split(field_name):
+        return field_name._formatter_field_name_split()
+
+
+class CompiledTemplate(object):
+    """A format string parsed once into literals and field accessors.
+
+    Rendering the template against some mappings gives the same result
+    as formatting it with a `PermissiveFormatter` against a `ChainMap`
+    of these mappings, without parsing the format string each time.
     """
 
-    def __init__(self, name, buffered_reader):
-        self.name = name
-        self.BufferedReader = buffered_reader
+    _FIELD_ERRORS = (KeyError, AttributeError, IndexError, TypeError)
+
+    # the templates compiled by `compile`, kept for the whole process
+    _compiled = {}
+
+    @classmethod
+    def compile(cls, template):
+        """Get the compiled *template*, compiling it only once per process.
+
+        Templates are the same for every study (unless a custom template
+        directory is used), so long-running processes such as the
+        conversion server only compile them once.
+        """
+        compiled = cls._compiled.get(template)
+        if compiled is None:
+            compiled = cls._compiled[template] = cls(template)
+        return compiled
+
+    def __init__(self, template, missing='', bad_fmt=''):
+        self.template = template
+        self.formatter = PermissiveFormatter(missing, bad_fmt)
+        self.parts = []
+        for literal, field_name, spec, conversion in self.formatter.parse(template):
+            if literal:
+                self.parts.append(literal)
+            if field_name is None:
+                continue
+            if not field_name or '{' in spec:
+                # auto-numbered fields and nested specs are left to the formatter
+                self.parts.append(functools.partial(self._fallback, '{{{}}}'.format(
+                    field_name + ('!' + conversion if conversion else '') + (':' + spec if spec else ''))))
+                continue
+            first, rest = formatter_field_name_split(field_name)
+            self.parts.append(functools.partial(self._field, first, tuple(rest), spec, conversion))
+        if all(isinstance(part, six.string_types) for part in self.parts):
+            self.parts = [''.join(self.parts)]
+
+        # most cells are a single literal or a single field: skip the join
+        if len(self.parts) == 1:
+            part = self.parts[0]
+            if isinstance(part, six.string_types):
+                self.render = lambda *maps: part
+            else:
+                self.render = lambda *maps: part(maps)
+
+    def _fallback(self, template, maps):
+        return self.formatter.vformat(template, None, ChainMap(*maps))
+
+    def _field(self, first, rest, spec, conversion, maps):
+        value = None
+        if not isinstance(first, int):
+            for mapping in maps:
+                try:
+                    value = mapping[first]
+                    break
+                except KeyError:
+                    pass
+        try:
+            for is_attr, key in rest:
+                value = getattr(value, key) if is_attr else value[key]
+        except self._FIELD_ERRORS:
+            value = None
+        if conversion:
+            value = self.formatter.convert_field(value, conversion)
+        elif value is None:
+            return self.formatter.missing
+        elif not spec and isinstance(value, six.string_types):
+            return value
+        return self.formatter.format_field(value, spec)
+
+    def render(self, *maps):
+        """Render the template using values from the given mappings.
+
+        Arguments:
+            *maps (Mapping): the mappings to look field values up in,
+                in order of precedence
+        """
+        return ''.join([
+            part if isinstance(part, six.string_types) else part(maps)
+            for part in self.parts
+        ])
 
-    def __getattr__(self, attr):
-        if attr=="name":
-            return self.name
-        return getattr(self.BufferedReader, attr)
 
 class ChainMap(Mapping):
     """A quick backport of collections.ChainMap
@@ -96,16 +199,33 @@ class ChainMap(Mapping):
         return sum(len(x) for x in self.mappings)
 
 
+class _TarFile(object):
+    """A tar member proxy with a setable name
+    """
+
+    def __init__(self, name, buffered_reader):
+        self.name = name
+        self.BufferedReader = buffered_reader
+
+    def __getattr__(self, attr):
+        return getattr(self.BufferedReader, attr)
+
+
 def compr_extract(compr_pth):
     """Extract tar.gz or .zip files into Python objects
 
+    This opens every nmrML member at once: `nmrml2isa.archive.ArchiveReader`
+    lists them without opening them instead.
+
     Arguments:
         compr_path (str): the path to the compressed file
 
     Returns:
-        tarfile.TarFile: if the file is a gzipped tar file
-        zipfile.ZipFile: if the file is a zipped file
+        list: the open nmrML members of the archive, each with a
+        ``filelist`` attribute listing all the members of the archive
     """
+    import tarfile
+    import zipfile
 
     filend = ('.nmrml')
     if zipfile.is_zipfile(compr_pth):
@@ -124,15 +244,30 @@ def compr_extract(compr_pth):
     return cfiles
 
 
+def file_size(in_file):
+    """Get the size of a file from its path or from an open file object.
+
+    Returns:
+        int: the size of the file in bytes, or None if it cannot be
+        known without reading the file
+    """
+    try:
+        if isinstance(in_file, six.string_types):
+            return os.path.getsize(in_file)
+        return os.fstat(in_file.fileno()).st_size
+    except (AttributeError, IOError, OSError, ValueError):
+        return getattr(in_file, 'size', None)
+
+
 def star_args(func):
     """Unpack arguments if they come packed
     """
     @functools.wraps(func)
-    def new_func(*args):
+    def new_func(*args, **kwargs):
         if len(args)==1:
-            return func(*args[0])
+            return func(*args[0], **kwargs)
         else:
-            return func(*args)
+            return func(*args, **kwargs)
     return new_func
 
 def open_csv(filename, mode='r'):
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""Benchmark nmrml2isa on corpora of synthetic nmrML files.
+
+Times the loading of the ontology, the extraction of metadata with
+`nmrMLmeta`, the creation of ISA-Tab files with `ISA_Tab.write` and the
+end-to-end `convert` for corpora of increasing sizes, measures the memory
+used by the extracted metadata (compared to the same metadata stored as
+plain dictionaries), and stores the results in a JSON file so that runs
+can be compared::
+
+    python scripts/benchmark.py -o before.json
+    python scripts/benchmark.py -o after.json --compare before.json
+"""
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import collections
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, MAINDIR)
+
+import nmrml2isa
+from nmrml2isa.isa import ISA_Tab
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+from nmrml2isa.parsing import convert
+from nmrml2isa.records import Record, json_default
+from tests.synthetic import DIALECTS, write_corpus
+
+
+def timed(function, *args, **kwargs):
+    """Call *function* and return its result and its wall-clock duration."""
+    gc.collect()
+    start = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - start
+
+
+def deep_size(obj, seen=None):
+    """Get the size of *obj* and of the objects it references, counting
+    objects shared between several containers (e.g. interned strings) once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(x, seen) for x in obj)
+    elif isinstance(obj, Record):
+        size += deep_size(obj._keys, seen) + sum(deep_size(v, seen) for v in obj.values())
+    return size
+
+
+def bench_memory(metas):
+    """Measure the memory used by *metas*, and by the same metadata as dicts."""
+    dicts = [json.loads(json.dumps(meta, default=json_default), object_pairs_hook=collections.OrderedDict)
+             for meta in metas]
+    for meta in dicts:
+        # only the top-level mapping was ordered in extracted metadata
+        for key, value in meta.items():
+            if isinstance(value, collections.OrderedDict):
+                meta[key] = json.loads(json.dumps(value))
+    return {'name': 'meta_memory', 'files': len(metas), 'seconds': 0.0,
+            'bytes': deep_size(metas), 'bytes_dicts': deep_size(dicts)}
+
+
+def bench_ontology(repeat):
+    """Time the loading of the ontology from OWL and from a snapshot."""
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cold = min(timed(load_index, cache_dir=False)[1] for _ in range(repeat))
+        load_index(cache_dir=cache_dir)
+        warm = min(timed(load_index, cache_dir=cache_dir)[1] for _ in range(repeat))
+    finally:
+        shutil.rmtree(cache_dir)
+    return [
+        {'name': 'ontology_load_owl', 'files': 0, 'seconds': cold},
+        {'name': 'ontology_load_snapshot', 'files': 0, 'seconds': warm},
+    ]
+
+
+def bench_corpus(directory, count, options, jobs):
+    """Time extraction, ISA-Tab writing and conversion of *count* files."""
+    corpus = os.path.join(directory, 'corpus')
+    paths = write_corpus(corpus, count, **options)
+    ontology = load_index()
+
+    metas, extraction = timed(lambda: [nmrMLmeta(path, ontology).meta for path in paths])
+    _, isa_write = timed(ISA_Tab(os.path.join(directory, 'write'), 'BENCH').write, metas)
+    results = [
+        {'name': 'extraction', 'files': count, 'seconds': extraction},
+        {'name': 'isa_write', 'files': count, 'seconds': isa_write},
+        bench_memory(metas),
+    ]
+    del metas
+    _, duration = timed(convert, corpus, os.path.join(directory, 'convert'), 'BENCH', quiet=True)
+    results.append({'name': 'convert', 'files': count, 'seconds': duration})
+    if jobs > 1:
+        for processes in (False, True):
+            _, duration = timed(convert, corpus, os.path.join(directory, 'convert'), 'BENCH',
+                                quiet=True, jobs=jobs, processes=processes)
+            results.append({'name': 'convert_{}{}'.format('processes' if processes else 'threads', jobs),
+                            'files': count, 'seconds': duration})
+    return results
+
+
+def compare(results, baseline):
+    """Print the speedup of *results* relative to *baseline*."""
+    previous = {(r['name'], r['files']): r['seconds'] for r in baseline['results']}
+    print('\n{:<24} {:>7} {:>10} {:>10} {:>8}'.format('benchmark', 'files', 'before', 'after', 'speedup'))
+    for r in results['results']:
+        before = previous.get((r['name'], r['files']))
+        if before is not None and 'bytes' not in r:
+            print('{:<24} {:>7} {:>10.3f} {:>10.3f} {:>7.2f}x'.format(
+                r['name'], r['files'], before, r['seconds'], before / r['seconds'] if r['seconds'] else float('inf')))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Benchmark nmrml2isa on synthetic nmrML files')
+    p.add_argument('-o', dest='output', help='the JSON file to write results to', default='benchmark.json')
+    p.add_argument('-n', dest='sizes', help='the corpus sizes [default: 10,1000,10000]', default='10,1000,10000',
+                   type=lambda s: [int(x) for x in s.split(',')])
+    p.add_argument('-j', dest='jobs', help='also time conversions with this many jobs', type=int, default=1)
+    p.add_argument('-r', dest='repeat', help='the number of ontology loads to time [default: 3]', type=int, default=3)
+    p.add_argument('--dialect', dest='dialects', action='append', choices=DIALECTS,
+                   help='a dialect to use in corpora (may be repeated) [default: all]')
+    p.add_argument('--points', type=int, default=4096, help='the number of spectrum points [default: 4096]')
+    p.add_argument('--contacts', type=int, default=2, help='the number of contacts [default: 2]')
+    p.add_argument('--processing-methods', type=int, default=3, help='the number of processing methods [default: 3]')
+    p.add_argument('--source-files', type=int, default=5, help='the number of source files [default: 5]')
+    p.add_argument('--compare', help='a previous JSON result file to compare against', default=None)
+    args = p.parse_args(argv)
+
+    options = dict(
+        dialects=args.dialects or DIALECTS, points=args.points, contacts=args.contacts,
+        processing_methods=args.processing_methods, source_files=args.source_files,
+    )
+    results = {
+        'version': nmrml2isa.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now().isoformat(),
+        'options': dict(options, jobs=args.jobs),
+        'results': bench_ontology(args.repeat),
+    }
+
+    warnings.simplefilter('ignore')
+    for count in args.sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            results['results'].extend(bench_corpus(directory, count, options, args.jobs))
+        finally:
+            shutil.rmtree(directory)
+
+    for r in results['results']:
+        r['per_file'] = r['seconds'] / r['files'] if r['files'] else None
+        if 'bytes' in r:
+            print('{:<24} {:>7} {:>10.1f}MiB (as dicts: {:.1f}MiB)'.format(
+                r['name'], r['files'], r['bytes'] / 2.0**20, r['bytes_dicts'] / 2.0**20))
+        else:
+            print('{:<24} {:>7} {:>10.3f}s'.format(r['name'], r['files'], r['seconds']))
+
+    with io.open(args.output, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        with io.open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,8 @@ setup(
 
     url='http://github.com/althonos/nmrml2isa',
 
+    # the nmrml2isa.aio module uses async/await and requires Python 3.5,
+    # the rest of the package also supports Python 2.7
     classifiers=[
     "Programming Language :: Python :: 2",
     "Programming Language :: Python :: 2.7",
@@ -0,0 +1,265 @@
+# coding: utf-8
+"""Synthetic nmrML files, to test and benchmark nmrml2isa offline.
+
+The generated files follow the layout of the nmrML files deposited in
+MetaboLights, in any of the dialects nmrml2isa supports: namespaced or
+raw (without the nmrML namespace), with `cvParam` or `cvTerm` elements,
+and with a `spectrumList` or a pre-1.0 `spectrum` element.
+
+Run ``python -m tests.synthetic OUT_DIR -n COUNT`` to write a corpus.
+"""
+from __future__ import (
+    absolute_import,
+    print_function,
+    unicode_literals,
+)
+
+import argparse
+import base64
+import io
+import itertools
+import math
+import os
+import random
+import struct
+import zlib
+
+
+DIALECTS = ('namespaced', 'raw', 'cvterm', 'spectrumlist')
+
+MANUFACTURERS = [
+    (('NMR:1000122', 'Bruker instrument model'), 'TopSpin', 'NMR:1400215'),
+    (('NMR:1000489', 'Varian/Agilent instrument model'), 'VnmrJ', 'NMR:1000277'),
+    (('NMR:1000156', 'JEOL instrument model'), 'Delta', 'NMR:1400230'),
+]
+
+PROBES = [
+    ('NMR:1400231', 'Bruker NMR probe'),
+    ('NMR:1000324', 'cryoprobe'),
+    ('NMR:1000235', 'Varian probe'),
+    ('NMR:1400242', 'liquid NMR probe'),
+]
+
+PROCESSING_METHODS = [
+    ('NMR:1000067', 'FID zero filling'),
+    ('NMR:1000021', 'apodization'),
+    ('NMR:1400063', 'data transformation'),
+    ('NMR:1000075', 'spectral referencing'),
+    ('NMR:1000106', 'baseline correction using spline function'),
+    ('NMR:1000043', 'post-acquisition solvent suppression'),
+]
+
+SOURCE_FILES = [
+    ('fid', 'fid', [('NMR:1000264', 'Bruker FID file'), ('NMR:1400320', 'Bruker UXNMR/XWIN-NMR format')]),
+    ('acqus', 'acqus', [('NMR:1000230', 'Bruker acquisition parameter file'), ('NMR:1400320', 'Bruker UXNMR/XWIN-NMR format')]),
+    ('procs', 'pdata/{n}/procs', [('NMR:1000250', 'Bruker processing parameter file')]),
+    ('pulseprogram', 'pulseprogram', [('NMR:1400122', 'pulse sequence file')]),
+    ('1r', 'pdata/{n}/1r', [('NMR:1000319', '1R file')]),
+]
+
+FIRST_NAMES = ['Jane', 'John', 'Ada', 'Alan', 'Grace', 'Linus', 'Rosalind', 'Niels']
+LAST_NAMES = ['Doe', 'Smith', 'Lovelace', 'Turing', 'Hopper', 'Pauling', 'Franklin', 'Bohr']
+
+
+def _encode(values, fmt):
+    raw = struct.pack('<{}{}'.format(len(values), fmt), *values)
+    return base64.b64encode(zlib.compress(raw)).decode('ascii')
+
+
+def _cv(tag, accession, name, ref='NMRCV'):
+    return '<{} cvRef="{}" accession="{}" name="{}"/>'.format(tag, ref, accession, name)
+
+
+def make_nmrml(sample='sample', dialect='namespaced', points=256, contacts=2,
+               processing_methods=2, source_files=4, seed=None):
+    """Generate the contents of a synthetic nmrML file.
+
+    Arguments:
+        sample (str): the sample name, used in identifiers and locations
+        dialect (str): one of `DIALECTS` [default: 'namespaced']
+        points (int): the number of points of the spectrum (the FID has
+            as many complex points) [default: 256]
+        contacts (int): the number of contacts [default: 2]
+        processing_methods (int): the number of processing methods, as
+            cvParams of the data processing [default: 2]
+        source_files (int): the number of source files [default: 4]
+        seed (int, optional): the seed of the random values [default: None]
+
+    Returns:
+        str: the XML document
+    """
+    rng = random.Random(seed)
+    param = 'cvTerm' if dialect == 'cvterm' else 'cvParam'
+    (model, software, software_acc) = rng.choice(MANUFACTURERS)
+    probe = rng.choice(PROBES)
+    field = rng.choice([400.13, 500.13, 600.13, 700.13, 800.23])
+
+    peak = rng.uniform(0.2, 0.8) * points
+    spectrum = [math.exp(-((i - peak) / 5.0) ** 2) * 1000 + rng.gauss(0, 3) for i in range(points)]
+    fid = []
+    for i in range(points):
+        decay = math.exp(-i / 60.0) * 500
+        fid.extend((math.cos(i / 3.0) * decay, math.sin(i / 3.0) * decay))
+    spectrum_data, fid_data = _encode(spectrum, 'd'), _encode(fid, 'd')
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<nmrML{} xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" version="1.0.rc1" accession="{}">'.format(
+            '' if dialect == 'raw' else ' xmlns="http://nmrml.org/schema"', sample),
+        '  <cvList>',
+        '    <cv id="NMRCV" fullName="nmrCV" version="1.1.0" URI="http://nmrML.org/nmrCV"/>',
+        '    <cv id="UO" fullName="Unit Ontology" version="3.2.0" URI="http://purl.obolibrary.org/obo/uo.owl"/>',
+        '    <cv id="CHEBI" fullName="CHEBI" version="1.0" URI="http://purl.obolibrary.org/obo/chebi.owl"/>',
+        '  </cvList>',
+        '  <fileDescription>',
+        '    <fileContent>',
+        '      ' + _cv(param, 'NMR:1400203', '1D 1H NMR spectrum'),
+        '    </fileContent>',
+        '  </fileDescription>',
+        '  <contactList>',
+    ]
+    for i in range(contacts):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        lines.append('    <contact id="CONTACT_{}" fullname="{} {}" email="{}.{}@example.org"/>'.format(
+            i, first, last, first.lower(), last.lower()))
+    lines += ['  </contactList>', '  <sourceFileList>']
+    for i in range(source_files):
+        name, location, terms = SOURCE_FILES[i % len(SOURCE_FILES)]
+        pdata = i // len(SOURCE_FILES) + 1
+        lines.append('    <sourceFile id="SOURCE_{}" name="{}" location="file:///data/{}/10/{}">'.format(
+            i, name, sample, location.format(n=pdata)))
+        lines.extend('      ' + _cv(param, accession, term) for accession, term in terms)
+        lines.append('    </sourceFile>')
+    lines += [
+        '  </sourceFileList>',
+        '  <softwareList>',
+        '    <software id="SOFTWARE" cvRef="NMRCV" accession="{}" name="{}" version="{}.{}"/>'.format(
+            software_acc, software, rng.randint(1, 4), rng.randint(0, 9)),
+        '  </softwareList>',
+        '  <instrumentConfigurationList>',
+        '    <instrumentConfiguration id="INSTRUMENT">',
+        '      ' + _cv(param, *model),
+        '      ' + _cv(param, *probe),
+        '      <softwareRef ref="SOFTWARE"/>',
+        '      <userParam name="ProbeHead" value="5 mm probe {}"/>'.format(rng.randint(1000, 9999)),
+        '    </instrumentConfiguration>',
+        '  </instrumentConfigurationList>',
+        '  <dataProcessingList>',
+        '    <dataProcessing id="DATA_PROCESSING">',
+    ]
+    lines.append('      <processingMethod order="1" softwareRef="SOFTWARE">')
+    methods = itertools.islice(itertools.cycle(PROCESSING_METHODS), processing_methods)
+    lines.extend('        ' + _cv(param, *method) for method in methods)
+    lines += [
+        '      </processingMethod>',
+        '    </dataProcessing>',
+        '  </dataProcessingList>',
+        '  <acquisition>',
+        '    <acquisition1D>',
+        '      <acquisitionParameterSet numberOfSteadyStateScans="{}" numberOfScans="{}">'.format(
+            rng.choice([2, 4, 8]), rng.choice([16, 32, 64, 128, 256])),
+        '        <softwareRef ref="SOFTWARE"/>',
+        '        ' + _cv('sampleContainer', 'NMR:1000316', 'tube'),
+        '        <sampleAcquisitionTemperature value="{:.1f}" unitAccession="UO_0000012" unitName="kelvin" unitCvRef="UO"/>'.format(
+            rng.uniform(290, 310)),
+        '        <spinningRate value="0" unitAccession="UO_0000106" unitName="hertz" unitCvRef="UO"/>',
+        '        <relaxationDelay value="{:.1f}" unitAccession="UO_0000010" unitName="second" unitCvRef="UO"/>'.format(
+            rng.uniform(1, 5)),
+        '        <pulseSequence>',
+        '          <userParam name="Pulse Program" value="{}"/>'.format(rng.choice(['noesygppr1d', 'cpmgpr1d', 'zg30'])),
+        '        </pulseSequence>',
+        '        <DirectDimensionParameterSet decoupled="false" numberOfDataPoints="{}">'.format(points),
+        '          <acquisitionNucleus cvRef="CHEBI" accession="CHEBI_49637" name="hydrogen atom"/>',
+        '          <effectiveExcitationField value="{}" unitAccession="UO_0000325" unitName="megaHertz" unitCvRef="UO"/>'.format(field),
+        '          <sweepWidth value="{:.2f}" unitAccession="UO_0000106" unitName="hertz" unitCvRef="UO"/>'.format(field * 20),
+        '          <pulseWidth value="{:.1f}" unitAccession="UO_0000029" unitName="microsecond" unitCvRef="UO"/>'.format(
+            rng.uniform(8, 14)),
+        '          <irradiationFrequency value="{}" unitAccession="UO_0000325" unitName="megaHertz" unitCvRef="UO"/>'.format(field),
+        '          ' + _cv('samplingStrategy', 'NMR:1000348', 'uniform sampling'),
+        '        </DirectDimensionParameterSet>',
+        '      </acquisitionParameterSet>',
+        '      <fidData compressed="true" byteFormat="Complex128" encodedLength="{}">{}</fidData>'.format(
+            len(fid_data), fid_data),
+        '    </acquisition1D>',
+        '  </acquisition>',
+    ]
+    spectrum_list = 'spectrumList' if dialect == 'spectrumlist' else 'spectrum'
+    lines += [
+        '  <{}>'.format(spectrum_list),
+        '    <spectrum1D numberOfDataPoints="{}" id="SPECTRUM">'.format(points),
+        '      <spectrumDataArray compressed="true" byteFormat="float64" encodedLength="{}">{}</spectrumDataArray>'.format(
+            len(spectrum_data), spectrum_data),
+        '      <xAxis unitAccession="UO_0000169" unitName="parts per million" unitCvRef="UO" startValue="12.0" endValue="-0.5"/>',
+        '      ' + _cv('yAxisType', 'NMR:1400017', 'intensity'),
+        '      <processingParameterSet>',
+        '        ' + _cv('postAcquisitionSolventSuppressionMethod', 'NMR:1000434', 'presaturation'),
+        '        ' + _cv('calibrationCompound', 'CHEBI_16113', 'TSP', 'CHEBI'),
+        '      </processingParameterSet>',
+        '      <firstDimensionProcessingParameterSet>',
+        '        <zeroOrderPhaseCorrection value="{:.1f}" unitAccession="UO_0000185" unitName="degree" unitCvRef="UO"/>'.format(
+            rng.uniform(-180, 180)),
+        '        <firstOrderPhaseCorrection value="{:.1f}" unitAccession="UO_0000185" unitName="degree" unitCvRef="UO"/>'.format(
+            rng.uniform(-30, 30)),
+        '        <calibrationReferenceShift value="0.0" unitAccession="UO_0000169" unitName="parts per million" unitCvRef="UO"/>',
+        '        <windowFunction>',
+        '          ' + _cv('windowFunctionMethod', 'NMR:1400068', 'exponential decay'),
+        '          <windowFunctionMethodParameter value="0.3" unitAccession="UO_0000106" unitName="hertz" unitCvRef="UO"/>',
+        '        </windowFunction>',
+        '        ' + _cv('baselineCorrectionMethod', 'NMR:1000459', 'polynomial'),
+        '      </firstDimensionProcessingParameterSet>',
+        '    </spectrum1D>',
+        '  </{}>'.format(spectrum_list),
+        '</nmrML>',
+        '',
+    ]
+    return '\n'.join(lines)
+
+
+def write_corpus(directory, count, dialects=DIALECTS, seed=0, **options):
+    """Write *count* synthetic nmrML files to *directory*.
+
+    Arguments:
+        directory (str): the directory to write files to (created if needed)
+        count (int): the number of files to write
+        dialects (iterable): the dialects to cycle through [default: DIALECTS]
+        seed (int): the seed of the corpus, so that corpora written with
+            the same arguments are identical [default: 0]
+
+    Keyword Arguments:
+        Any argument of `make_nmrml` (except *sample* and *dialect*).
+
+    Returns:
+        list: the paths to the written files
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    paths = []
+    width = len(str(max(count - 1, 0)))
+    for i, dialect in zip(range(count), itertools.cycle(dialects)):
+        sample = 'SYN{:0{}d}'.format(i, width)
+        path = os.path.join(directory, '{}.nmrML'.format(sample))
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(make_nmrml(sample, dialect, seed=seed * 1000003 + i, **options))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Write a corpus of synthetic nmrML files')
+    p.add_argument('directory', help='the directory to write files to')
+    p.add_argument('-n', dest='count', type=int, default=10, help='the number of files [default: 10]')
+    p.add_argument('--dialect', dest='dialects', action='append', choices=DIALECTS,
+                   help='a dialect to use (may be repeated) [default: all]')
+    p.add_argument('--points', type=int, default=256, help='the number of spectrum points [default: 256]')
+    p.add_argument('--contacts', type=int, default=2, help='the number of contacts [default: 2]')
+    p.add_argument('--processing-methods', type=int, default=2, help='the number of processing methods [default: 2]')
+    p.add_argument('--source-files', type=int, default=4, help='the number of source files [default: 4]')
+    p.add_argument('--seed', type=int, default=0, help='the seed of the corpus [default: 0]')
+    args = p.parse_args(argv)
+    write_corpus(args.directory, args.count, args.dialects or DIALECTS, args.seed,
+                 points=args.points, contacts=args.contacts,
+                 processing_methods=args.processing_methods, source_files=args.source_files)
+
+
+if __name__ == '__main__':
+    main()
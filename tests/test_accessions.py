@@ -0,0 +1,40 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import unittest
+
+import nmrml2isa.accessions
+from nmrml2isa.accessions import accession_url, urllize
+
+
+class TestAccessions(unittest.TestCase):
+
+    def test_accession_url(self):
+        self.assertEqual(accession_url('NMR:1000031'), 'http://nmrML.org/nmrCV#NMR:1000031')
+        self.assertEqual(accession_url('UO:0000325'), 'http://purl.obolibrary.org/obo/UO_0000325')
+        self.assertEqual(accession_url('CHEBI_49637'), 'http://purl.obolibrary.org/obo/CHEBI_49637')
+        self.assertEqual(accession_url('C:12345'), 'http://ncicb.nci.nih.gov/xml/owl/EVS/Thesaurus.owl#C_12345')
+        self.assertEqual(accession_url('MS:1000031'), 'MS:1000031')
+        self.assertEqual(accession_url(''), '')
+        url = accession_url('NMR:1000031')
+        self.assertEqual(accession_url(url), url)
+        self.assertIs(accession_url('NMR:1000031'), url)
+
+    def test_memo_bounded(self):
+        for i in range(nmrml2isa.accessions.MEMO_SIZE + 10):
+            accession_url('NMR:{}'.format(i))
+        self.assertLessEqual(len(nmrml2isa.accessions._urls), nmrml2isa.accessions.MEMO_SIZE)
+
+    def test_urllize(self):
+        meta = {
+            'Sample Name': {'value': 'a'},
+            'Temperature': {'value': 300.0, 'unit': {'name': 'kelvin', 'accession': 'UO:0000012'}},
+            'Data Transformation Name': {'entry_list': [{'name': 'b', 'accession': 'NMR:1400104'}]},
+        }
+        urllize(meta)
+        self.assertEqual(meta['Temperature']['unit']['accession'], 'http://purl.obolibrary.org/obo/UO_0000012')
+        self.assertEqual(meta['Data Transformation Name']['entry_list'][0]['accession'],
+                         'http://nmrML.org/nmrCV#NMR:1400104')
+        self.assertEqual(meta['Sample Name'], {'value': 'a'})
@@ -0,0 +1,186 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+
+from . import utils
+import nmrml2isa.parsing
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    import concurrent.futures
+    from nmrml2isa import aio
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+def collect(loop, metadata):
+    """Consume an asynchronous iterator without the `async for` syntax."""
+    results = []
+    while True:
+        try:
+            results.append(loop.run_until_complete(metadata.__anext__()))
+        except StopAsyncIteration:
+            return results
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio requires Python 3.5")
+class TestAio(unittest.TestCase):
+
+    study_id = 'TEST'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.in_dir = tempfile.mkdtemp()
+        cls.files = []
+        for i in range(6):
+            cls.files.append(os.path.join(cls.in_dir, 'sample{}.nmrML'.format(i)))
+            shutil.copy(EXAMPLE, cls.files[-1])
+        cls.out_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+        nmrml2isa.parsing.convert(cls.in_dir, os.path.join(cls.out_dir, 'expected'), cls.study_id, quiet=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.in_dir)
+        shutil.rmtree(cls.out_dir)
+        warnings.simplefilter(warnings.defaultaction)
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def assertSameIsa(self, expected, actual):
+        files = sorted(os.listdir(expected))
+        self.assertEqual(files, sorted(os.listdir(actual)))
+        _, mismatch, errors = filecmp.cmpfiles(expected, actual, files, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+    def test_iter_metadata(self):
+        for ordered in (True, False):
+            metadata = aio.iter_metadata(self.in_dir, max_in_flight=2, ordered=ordered)
+            results = collect(self.loop, metadata)
+            sources = [source for source, _ in results]
+            if ordered:
+                self.assertEqual(sources, self.files)
+            else:
+                self.assertEqual(sorted(sources), self.files)
+            for source, meta in results:
+                self.assertEqual(meta['Derived Spectral Data File'].value, source)
+                self.assertEqual(meta['Sample Name'].value, os.path.splitext(os.path.basename(source))[0])
+
+    def test_iter_metadata_processes(self):
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            metadata = aio.iter_metadata(self.in_dir, executor=executor)
+            results = collect(self.loop, metadata)
+        expected = nmrml2isa.nmrml.nmrMLmeta(EXAMPLE).meta
+        self.assertEqual(len(results), len(self.files))
+        self.assertEqual(results[0][1]['Acquisition Nucleus'], expected['Acquisition Nucleus'])
+
+    def test_iter_metadata_glob(self):
+        metadata = aio.iter_metadata(os.path.join(self.in_dir, 'sample[0-2].nmrML'))
+        self.assertEqual([source for source, _ in collect(self.loop, metadata)], self.files[:3])
+
+    def test_iter_metadata_errors(self):
+        in_dir = tempfile.mkdtemp()
+        try:
+            shutil.copy(EXAMPLE, in_dir)
+            with open(os.path.join(in_dir, 'invalid.nmrML'), 'w') as f:
+                f.write('not xml')
+            metadata = aio.iter_metadata(in_dir)
+            with self.assertRaises(Exception):
+                collect(self.loop, metadata)
+            with self.assertRaises(asyncio.CancelledError):
+                self.loop.run_until_complete(metadata.__anext__())
+        finally:
+            shutil.rmtree(in_dir)
+
+    def test_aclose(self):
+        metadata = aio.iter_metadata(self.in_dir, max_in_flight=2)
+        self.loop.run_until_complete(metadata.__anext__())
+        self.loop.run_until_complete(metadata.aclose())
+        self.assertEqual(metadata._pending, set())
+
+    def test_convert(self):
+        out_dir = os.path.join(self.out_dir, 'aio')
+        self.loop.run_until_complete(aio.convert(self.in_dir, out_dir, self.study_id, max_in_flight=2))
+        self.assertEqual(os.listdir(out_dir), [self.study_id])
+        self.assertSameIsa(os.path.join(self.out_dir, 'expected', self.study_id),
+                           os.path.join(out_dir, self.study_id))
+
+    def test_convert_existing(self):
+        study_dir = os.path.join(self.out_dir, 'replaced', self.study_id)
+        os.makedirs(study_dir)
+        for name in ('notes.txt', 's_{}.txt'.format(self.study_id)):
+            with open(os.path.join(study_dir, name), 'w') as f:
+                f.write('old')
+        self.loop.run_until_complete(aio.convert(self.in_dir, os.path.dirname(study_dir), self.study_id))
+        with open(os.path.join(study_dir, 'notes.txt')) as f:
+            self.assertEqual(f.read(), 'old')
+        os.remove(os.path.join(study_dir, 'notes.txt'))
+        self.assertSameIsa(os.path.join(self.out_dir, 'expected', self.study_id), study_dir)
+
+    def test_convert_no_files(self):
+        out_dir = os.path.join(self.out_dir, 'empty')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.loop.run_until_complete(aio.convert(self.out_dir + '/*.nmrML', out_dir, self.study_id))
+        self.assertIn("No files were found", str(caught[-1].message))
+        self.assertFalse(os.path.exists(out_dir))
+
+    def cancel_convert(self, out_dir):
+        """Cancel a conversion to *out_dir* once its first file was written."""
+        started, resume = threading.Event(), threading.Event()
+        calls = []
+
+        def extract(*args):
+            calls.append(args)
+            if len(calls) > 1:
+                started.set()
+                resume.wait()
+            return aio._extract(*args)
+
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            submit = executor.submit
+            executor.submit = lambda fn, *args: submit(extract, *args)
+            task = self.loop.create_task(aio.convert(
+                self.in_dir, out_dir, self.study_id, executor=executor, max_in_flight=2))
+            self.loop.run_until_complete(self.loop.run_in_executor(None, started.wait))
+            task.cancel()
+            try:
+                with self.assertRaises(asyncio.CancelledError):
+                    self.loop.run_until_complete(task)
+            finally:
+                resume.set()
+
+    def test_convert_cancelled(self):
+        out_dir = os.path.join(self.out_dir, 'cancelled')
+        self.cancel_convert(out_dir)
+        self.assertFalse(os.path.exists(out_dir))
+
+    def test_convert_cancelled_existing(self):
+        study_dir = os.path.join(self.out_dir, 'existing', self.study_id)
+        os.makedirs(study_dir)
+        for name in ('notes.txt', 's_{}.txt'.format(self.study_id)):
+            with open(os.path.join(study_dir, name), 'w') as f:
+                f.write('old')
+        self.cancel_convert(os.path.dirname(study_dir))
+        self.assertEqual(os.listdir(os.path.dirname(study_dir)), [self.study_id])
+        self.assertEqual(sorted(os.listdir(study_dir)), ['notes.txt', 's_{}.txt'.format(self.study_id)])
+        for name in os.listdir(study_dir):
+            with open(os.path.join(study_dir, name)) as f:
+                self.assertEqual(f.read(), 'old')
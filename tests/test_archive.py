@@ -0,0 +1,119 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import os
+import pickle
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from . import utils
+import nmrml2isa.archive
+import nmrml2isa.utils
+from nmrml2isa.archive import ArchiveReader
+from nmrml2isa.nmrml import nmrMLmeta
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestArchiveReader(unittest.TestCase):
+
+    names = ['study/sample1.nmrML', 'study/sample2.NMRML', 'study/readme.txt']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        with open(EXAMPLE, 'rb') as f:
+            cls.data = f.read()
+        cls.archives = {}
+        for name in cls.names:
+            path = os.path.join(cls.tmpdir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(cls.data)
+        cls.archives['zip'] = os.path.join(cls.tmpdir, 'study.zip')
+        with zipfile.ZipFile(cls.archives['zip'], 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in cls.names:
+                archive.write(os.path.join(cls.tmpdir, name), name)
+        for kind, mode in [('tar', 'w'), ('tar.gz', 'w:gz')]:
+            cls.archives[kind] = os.path.join(cls.tmpdir, 'study.' + kind)
+            with tarfile.open(cls.archives[kind], mode) as archive:
+                for name in cls.names:
+                    archive.add(os.path.join(cls.tmpdir, name), name)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_members(self):
+        for kind, path in self.archives.items():
+            with ArchiveReader(path) as reader:
+                self.assertEqual(sorted(m.name for m in reader), self.names[:2], kind)
+                self.assertEqual(sorted(reader.names), sorted(self.names), kind)
+                for member in reader:
+                    self.assertEqual(member.size, len(self.data))
+                    with member.open() as handle:
+                        self.assertEqual(handle.read(), self.data, kind)
+
+    def test_members_are_picklable(self):
+        for kind, path in self.archives.items():
+            with ArchiveReader(path) as reader:
+                member = pickle.loads(pickle.dumps(reader.members[0]))
+                self.assertEqual(member, reader.members[0])
+                with member.open() as handle:
+                    self.assertEqual(handle.read(), self.data, kind)
+
+    def test_compressed_tar_copy_removed(self):
+        reader = ArchiveReader(self.archives['tar.gz'])
+        copy = reader.members[0].archive
+        self.assertNotEqual(copy, self.archives['tar.gz'])
+        self.assertTrue(os.path.exists(copy))
+        reader.close()
+        self.assertFalse(os.path.exists(copy))
+
+    def test_compressed_tar_copy_removed_on_error(self):
+        truncated = os.path.join(self.tmpdir, 'truncated.tar.gz')
+        with open(self.archives['tar.gz'], 'rb') as src, open(truncated, 'wb') as dst:
+            dst.write(src.read()[:os.path.getsize(self.archives['tar.gz']) // 2])
+        tempdir, tempfile.tempdir = tempfile.tempdir, tempfile.mkdtemp()
+        try:
+            with self.assertRaises(Exception):
+                ArchiveReader(truncated)
+            self.assertEqual(os.listdir(tempfile.tempdir), [])
+        finally:
+            shutil.rmtree(tempfile.tempdir)
+            tempfile.tempdir = tempdir
+
+    def test_compr_extract(self):
+        for kind in ('zip', 'tar.gz'):
+            cfiles = nmrml2isa.utils.compr_extract(self.archives[kind])
+            self.assertEqual(sorted(cf.name for cf in cfiles), self.names[:2], kind)
+            for cf in cfiles:
+                self.assertEqual(sorted(cf.filelist), sorted(self.names), kind)
+                self.assertEqual(cf.read(), self.data, kind)
+
+    def test_open_archives_bounded(self):
+        paths = []
+        for i in range(nmrml2isa.archive.MAX_OPEN_ARCHIVES + 3):
+            paths.append(os.path.join(self.tmpdir, 'copy{}.zip'.format(i)))
+            shutil.copy(self.archives['zip'], paths[-1])
+        for path in paths:
+            with ArchiveReader(path).members[0].open() as handle:
+                handle.read(10)
+        self.assertLessEqual(len(nmrml2isa.archive._open_archives),
+                             nmrml2isa.archive.MAX_OPEN_ARCHIVES)
+
+    def test_nmrmlmeta(self):
+        expected = nmrMLmeta(os.path.join(self.tmpdir, self.names[0])).meta
+        del expected['Derived Spectral Data File']
+        with ArchiveReader(self.archives['zip']) as reader:
+            for streaming in (False, True):
+                meta = nmrMLmeta(reader.members[0], streaming=streaming).meta
+                self.assertEqual(meta.pop('Derived Spectral Data File'), {'value': self.names[0]})
+                self.assertEqual(meta, expected)
@@ -0,0 +1,103 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import warnings
+
+from . import utils
+import nmrml2isa.cache
+from nmrml2isa.cache import MetadataCache
+from nmrml2isa.nmrml import nmrMLmeta
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.meta = nmrMLmeta(EXAMPLE).meta
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.nmrml = os.path.join(self.tmpdir, 'sample.nmrML')
+        shutil.copy(EXAMPLE, self.nmrml)
+        self.cache = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        self.assertFalse(self.cache.has(self.nmrml))
+        self.assertIsNone(self.cache.get(self.nmrml))
+        self.cache.put(self.nmrml, self.meta)
+        self.assertTrue(self.cache.has(self.nmrml))
+        self.assertEqual(self.cache.get(self.nmrml), self.meta)
+        self.assertEqual(list(self.cache.get(self.nmrml)), list(self.meta))
+
+    def test_persistent(self):
+        self.cache.put(self.nmrml, self.meta)
+        self.cache.close()
+        self.cache = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'))
+        self.assertEqual(self.cache.get(self.nmrml), self.meta)
+
+    def test_modified_file(self):
+        self.cache.put(self.nmrml, self.meta)
+        with open(self.nmrml, 'ab') as f:
+            f.write(b'\n')
+        self.assertFalse(self.cache.has(self.nmrml))
+
+    def test_content_hash(self):
+        self.cache.hash_contents = True
+        self.cache.put(self.nmrml, self.meta)
+        stat = os.stat(self.nmrml)
+        with open(self.nmrml, 'r+b') as f:
+            f.write(b' ')
+        os.utime(self.nmrml, (stat.st_atime, stat.st_mtime))
+        self.assertFalse(self.cache.has(self.nmrml))
+
+    def test_fingerprint(self):
+        self.cache.put(self.nmrml, self.meta)
+        self.cache.fingerprint = 'other'
+        self.assertFalse(self.cache.has(self.nmrml))
+
+    def test_file_objects_not_cached(self):
+        with open(self.nmrml, 'rb') as f:
+            self.assertIsNone(self.cache.signature(f))
+            self.cache.put(f, self.meta)
+            self.assertFalse(self.cache.has(f))
+
+    def test_shared(self):
+        other = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'))
+        try:
+            self.cache.put(self.nmrml, self.meta)
+            other.put(self.nmrml, self.meta)
+            self.assertEqual(other.get(self.nmrml), self.meta)
+        finally:
+            other.close()
+
+    def test_busy(self):
+        timeout, nmrml2isa.cache.TIMEOUT = nmrml2isa.cache.TIMEOUT, 0.1
+        lock = sqlite3.connect(os.path.join(self.tmpdir, 'cache.sqlite'))
+        try:
+            busy = MetadataCache(os.path.join(self.tmpdir, 'cache.sqlite'))
+            lock.execute('BEGIN EXCLUSIVE')
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                busy.put(self.nmrml, self.meta)
+                busy.put(self.nmrml, self.meta)
+            self.assertEqual(len(caught), 1)
+            lock.rollback()
+            self.assertFalse(busy.has(self.nmrml))
+            busy.close()
+        finally:
+            lock.close()
+            nmrml2isa.cache.TIMEOUT = timeout
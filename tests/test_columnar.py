@@ -0,0 +1,138 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from . import utils
+from nmrml2isa.columnar import ColumnarTable, CATEGORIES_SUFFIX, column_kind, flatten, read_npz
+from nmrml2isa.isa import ISA_Tab
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestFlatten(unittest.TestCase):
+
+    def test_terms(self):
+        row = flatten({
+            'Sample Name': {'value': 'a'},
+            'Temperature': {'value': 298.0, 'unit': {'name': 'kelvin', 'ref': 'UO'}},
+            'Study Person': [{'name': 'x'}],
+        })
+        self.assertEqual(list(row), ['Sample Name[value]', 'Temperature[value]',
+                                     'Temperature[unit][name]', 'Temperature[unit][ref]'])
+        self.assertEqual(row['Temperature[value]'], 298.0)
+
+    def test_entry_list(self):
+        row = flatten({'Data Transformation Name': {'entry_list': [{'name': 'a'}, {'name': 'b'}]}})
+        self.assertEqual(row, {'Data Transformation Name[entry_list][name]': 'a; b'})
+
+    def test_column_kind(self):
+        self.assertEqual(column_kind([1, None, 2]), 'int')
+        self.assertEqual(column_kind([1, 2.5]), 'float')
+        self.assertEqual(column_kind([1, '2']), 'category')
+        self.assertEqual(column_kind([True]), 'category')
+        self.assertEqual(column_kind([None]), 'category')
+
+
+class TestColumnarTable(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.table = ColumnarTable()
+        self.table.add({'Sample Name': {'value': 'a'}, 'Number of scans': {'value': 16}})
+        self.table.add({'Sample Name': {'value': 'b'}, 'Temperature': {'value': 298.0}})
+        self.table.add({'Sample Name': {'value': 'a'}, 'Number of scans': {'value': 32}})
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_columns(self):
+        self.assertEqual(self.table.rows, 3)
+        self.assertEqual(self.table.columns['Temperature[value]'], [None, 298.0, None])
+        self.assertEqual(self.table.kinds(), {
+            'Sample Name[value]': 'category',
+            'Number of scans[value]': 'int',
+            'Temperature[value]': 'float',
+        })
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_npz(self):
+        path = self.table.write(os.path.join(self.out_dir, 'table'), 'npz')
+        self.assertTrue(path.endswith('.npz'))
+        with numpy.load(path) as data:
+            self.assertEqual(data['Sample Name[value]'].tolist(), [0, 1, 0])
+            self.assertEqual(data['Sample Name[value]' + CATEGORIES_SUFFIX].tolist(), ['a', 'b'])
+        table = read_npz(path)
+        self.assertEqual(list(table), list(self.table.columns))
+        self.assertEqual(table['Sample Name[value]'].tolist(), ['a', 'b', 'a'])
+        self.assertEqual(table['Number of scans[value]'].dtype, numpy.float64)
+        self.assertTrue(numpy.isnan(table['Number of scans[value]'][1]))
+        self.assertEqual(read_npz(path, ['Temperature[value]'])['Temperature[value]'][1], 298.0)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet(self):
+        path = self.table.write(os.path.join(self.out_dir, 'table'), 'parquet')
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column_names, list(self.table.columns))
+        self.assertEqual(table.column('Number of scans[value]').to_pylist(), [16, None, 32])
+        self.assertEqual(table.column('Sample Name[value]').to_pylist(), ['a', 'b', 'a'])
+        self.assertEqual(table.column('Temperature[value]').to_pylist(), [None, 298.0, None])
+        self.assertEqual(table.schema.field('Number of scans[value]').type, pyarrow.int64())
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('Sample Name[value]').type))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_preferred(self):
+        path = self.table.write(os.path.join(self.out_dir, 'table'))
+        self.assertTrue(path.endswith('.parquet'))
+        self.assertEqual(pyarrow.parquet.read_table(path).num_rows, 3)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestIsaTabColumnar(unittest.TestCase):
+
+    study_id = 'TEST'
+
+    @classmethod
+    def setUpClass(cls):
+        ontology = load_index(cache_dir=False)
+        cls.metalist = []
+        for i in range(3):
+            meta = nmrMLmeta(EXAMPLE, ontology).meta
+            meta['Sample Name'] = {'value': 'sample{}'.format(i)}
+            cls.metalist.append(meta)
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_write_stream(self):
+        ISA_Tab(os.path.join(self.out_dir, 'list'), self.study_id, columnar='npz').write(self.metalist)
+        ISA_Tab(os.path.join(self.out_dir, 'stream'), self.study_id, columnar='npz').write_stream(iter(self.metalist))
+        name = '{}_metadata.npz'.format(self.study_id)
+        expected = read_npz(os.path.join(self.out_dir, 'list', self.study_id, name))
+        actual = read_npz(os.path.join(self.out_dir, 'stream', self.study_id, name))
+        self.assertEqual(list(expected), list(actual))
+        for column in expected:
+            self.assertEqual(expected[column].tolist(), actual[column].tolist())
+        self.assertEqual(expected['Sample Name[value]'].tolist(), ['sample0', 'sample1', 'sample2'])
+        self.assertEqual(expected['Number of transients[value]'].dtype, numpy.int64)
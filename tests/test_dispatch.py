@@ -0,0 +1,95 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import unittest
+
+from nmrml2isa.dispatch import Dialect, DispatchTable, probe_dialect, sniff_dialect
+from nmrml2isa.utils import etree
+
+
+DOCUMENT = b"""<?xml version="1.0"?>
+<root xmlns="urn:test">
+  <list>
+    <!-- a comment -->
+    <item id="a"><param n="1"/><param n="2"/><other/></item>
+    <item id="b"><param n="3"/></item>
+  </list>
+  <method><!-- first --><first/><second/></method>
+  <ignored><list><item id="c"/></list></ignored>
+</root>
+"""
+
+
+class TestDispatchTable(unittest.TestCase):
+
+    paths = [
+        ('items', ('list', 'item'), False, None),
+        ('first_item', ('list', 'item'), True, None),
+        ('params', ('param',), False, 'items'),
+        ('first_param', ('param',), True, 'items'),
+        ('method', ('method', '*'), True, None),
+    ]
+
+    def setUp(self):
+        self.root = etree.fromstring(DOCUMENT)
+
+    def test_collect(self):
+        matches = DispatchTable('urn:test', self.paths).collect(self.root)
+        items = matches.all('items')
+        self.assertEqual([item.get('id') for item in items], ['a', 'b'])
+        self.assertIs(matches.first('first_item'), items[0])
+        self.assertEqual([p.get('n') for p in matches.all('params', items[0])], ['1', '2'])
+        self.assertEqual([p.get('n') for p in matches.all('params', items[1])], ['3'])
+        self.assertEqual(matches.first('first_param', items[1]).get('n'), '3')
+        self.assertEqual(matches.first('method').tag, '{urn:test}first')
+
+    def test_index(self):
+        table = DispatchTable('urn:test', self.paths + [('all_items', ('*', 'list', 'item'), False, None)],
+                              index=['items', 'all_items'])
+        matches = table.collect(self.root)
+        self.assertIs(matches.ref('items', 'b'), matches.all('items')[1])
+        self.assertIsNone(matches.ref('items', 'c'))
+        self.assertEqual(matches.ref('all_items', 'c').get('id'), 'c')
+        self.assertIsNone(matches.ref('first_item', 'a'))
+
+    def test_namespace(self):
+        matches = DispatchTable('', self.paths).collect(self.root)
+        self.assertEqual(matches.all('items'), [])
+        self.assertIsNone(matches.first('method'))
+
+    def test_same_as_find(self):
+        ns = {'s': 'urn:test'}
+        matches = DispatchTable('urn:test', self.paths).collect(self.root)
+        self.assertEqual(matches.all('items'), self.root.findall('s:list/s:item', ns))
+        self.assertIs(matches.first('method'), self.root.find('s:method/', ns))
+
+
+class TestDialect(unittest.TestCase):
+
+    head = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<!-- <cvTerm> in a comment -->\n'
+            b'<nmrML xmlns="http://nmrml.org/schema" version="1.0.rc1">\n'
+            b'<cvList><cv id="NMRCV"/></cvList>\n'
+            b'<fileDescription><fileContent><cvParam accession="NMR:1400203"/>')
+
+    def test_sniff(self):
+        self.assertEqual(sniff_dialect(self.head),
+                         Dialect('http://nmrml.org/schema', 'cvParam', ()))
+        self.assertEqual(sniff_dialect(self.head.replace(b'cvParam', b'cvTerm')).cvParam, 'cvTerm')
+        self.assertEqual(sniff_dialect(self.head.replace(b' xmlns="http://nmrml.org/schema"', b'')).namespace, '')
+        prefixed = self.head.replace(b'xmlns=', b'xmlns:n=').replace(b'<nmrML', b'<n:nmrML')
+        self.assertEqual(sniff_dialect(prefixed).namespace, 'http://nmrml.org/schema')
+        wrapped = self.head.replace(b'<nmrML', b'<document><nmrML')
+        self.assertEqual(sniff_dialect(wrapped).root, ('nmrML',))
+
+    def test_sniff_unsure(self):
+        self.assertIsNone(sniff_dialect(self.head[:self.head.index(b'<fileDescription')]))
+        self.assertIsNone(sniff_dialect(self.head.replace(b'<nmrML', b'<a><b><nmrML')))
+        self.assertIsNone(sniff_dialect(self.head.decode('utf-8').encode('utf-16')))
+
+    def test_probe(self):
+        xml = self.head + b'</fileContent></fileDescription></nmrML>'
+        tree = etree.ElementTree(etree.fromstring(xml))
+        self.assertEqual(probe_dialect(tree), sniff_dialect(self.head))
@@ -0,0 +1,88 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+
+from . import utils
+from nmrml2isa.isa import ISA_Tab
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestIsaTab(unittest.TestCase):
+
+    study_id = 'TEST'
+
+    @classmethod
+    def setUpClass(cls):
+        ontology = load_index(cache_dir=False)
+        cls.metalist = []
+        for i in range(5):
+            meta = nmrMLmeta(EXAMPLE, ontology).meta
+            meta['Sample Name'] = {'value': 'sample{}'.format(i)}
+            cls.metalist.append(meta)
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def assertSameIsa(self, expected, actual):
+        files = sorted(os.listdir(expected))
+        self.assertEqual(files, sorted(os.listdir(actual)))
+        _, mismatch, errors = filecmp.cmpfiles(expected, actual, files, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+    def test_write_stream(self):
+        ISA_Tab(os.path.join(self.out_dir, 'list'), self.study_id).write(self.metalist)
+        ISA_Tab(os.path.join(self.out_dir, 'stream'), self.study_id).write_stream(iter(self.metalist))
+        self.assertSameIsa(
+            os.path.join(self.out_dir, 'list', self.study_id),
+            os.path.join(self.out_dir, 'stream', self.study_id),
+        )
+
+    def test_write_stream_empty(self):
+        ISA_Tab(self.out_dir, self.study_id).write_stream(iter([]))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, self.study_id)))
+
+    def test_entry_list_widths(self):
+        metalist = [dict(meta) for meta in self.metalist[:3]]
+        transformation = self.metalist[0]['Data Transformation Name']['entry_list'][0]
+        metalist[0]['Data Transformation Name'] = {'entry_list': [transformation]}
+        metalist[1]['Data Transformation Name'] = {'entry_list': [transformation] * 3}
+        del metalist[2]['Data Transformation Name']
+        headers, data = ISA_Tab(self.out_dir, self.study_id).make_assay_template(metalist)
+        self.assertEqual(headers.count('Data Transformation Name'), 3)
+        self.assertEqual(len(headers), len(data))
+        self.assertIn('{Data Transformation Name[entry_list][2][accession]}', data)
+        self.assertNotIn('{{', ''.join(data))
+
+    def test_entry_list_missing(self):
+        metalist = [dict(meta) for meta in self.metalist[:2]]
+        for meta in metalist:
+            del meta['Data Transformation Name']
+        headers, data = ISA_Tab(self.out_dir, self.study_id).make_assay_template(metalist)
+        self.assertEqual(headers.count('Data Transformation Name'), 1)
+
+    def test_statistics_columns(self):
+        headers, data = ISA_Tab(self.out_dir, self.study_id).make_assay_template(self.metalist)
+        self.assertNotIn('Parameter Value[Spectrum noise level]', headers)
+        self.assertNotIn('{X axis range[value]}', data)
+        headers, data = ISA_Tab(self.out_dir, self.study_id, statistics=True).make_assay_template(self.metalist)
+        self.assertEqual(len(headers), len(data))
+        assay = data.index('NMR assay')
+        self.assertEqual(headers[assay+1:assay+3], [
+            'Parameter Value[FID non-finite points]', 'Parameter Value[FID maximum magnitude]'])
+        transformation = data.index('Data transformation')
+        self.assertEqual(data[transformation+1], '{X axis range[value]}')
+        self.assertIn('Parameter Value[Spectrum noise level]', headers)
@@ -0,0 +1,99 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from . import utils
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+from nmrml2isa.streaming import parse_metadata
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestNmrmlMeta(unittest.TestCase):
+
+    dialects = {
+        'namespaced': lambda xml: xml,
+        'raw': lambda xml: xml.replace(' xmlns="http://nmrml.org/schema"', ''),
+        'cvterm': lambda xml: xml.replace('cvParam', 'cvTerm'),
+        'spectrumlist': lambda xml: xml.replace('<spectrum>', '<spectrumList>')
+                                       .replace('</spectrum>', '</spectrumList>'),
+        'wrapped': lambda xml: xml.replace('<nmrML ', '<document><nmrML ')
+                                  .replace('</nmrML>', '</nmrML></document>'),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ontology = load_index(cache_dir=False)
+        cls.tmp_dir = tempfile.mkdtemp()
+        with io.open(EXAMPLE, encoding='utf-8') as example:
+            xml = example.read()
+        cls.files = {}
+        for dialect, transform in cls.dialects.items():
+            cls.files[dialect] = os.path.join(cls.tmp_dir, '{}.nmrML'.format(dialect))
+            with io.open(cls.files[dialect], 'w', encoding='utf-8') as f:
+                f.write(transform(xml))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_extraction(self):
+        meta = nmrMLmeta(EXAMPLE, self.ontology).meta
+        self.assertEqual(meta['Sample Name'], {'value': 'example'})
+        self.assertEqual(meta['Number of transients'], {'value': 128})
+        self.assertEqual(meta['Instrument manufacturer']['name'], 'Bruker')
+        self.assertEqual(meta['NMR Probe']['name'], 'Bruker CryoProbe')
+        self.assertEqual(meta['Instrument software version'], {'value': '3.2'})
+        self.assertEqual(meta['Magnetic field strength']['value'], '14.095')
+        self.assertEqual(len(meta['Data Transformation Name']['entry_list']), 2)
+        self.assertEqual(len(meta['study_contacts']), 2)
+
+    def test_dialects(self):
+        expected = nmrMLmeta(self.files['namespaced'], self.ontology)
+        for dialect in ('raw', 'cvterm', 'wrapped'):
+            parsed = nmrMLmeta(self.files[dialect], self.ontology)
+            self.assertEqual(list(parsed.meta), list(expected.meta), dialect)
+            # the file name of each dialect is its sample name
+            actual = parsed.meta_json.replace(dialect, 'namespaced')
+            self.assertEqual(actual, expected.meta_json, dialect)
+        self.assertEqual(parsed.dialect.root, ('nmrML',))
+
+    def test_streaming_same_meta(self):
+        for dialect, path in self.files.items():
+            expected = nmrMLmeta(path, self.ontology).meta
+            actual = nmrMLmeta(path, self.ontology, streaming=True).meta
+            self.assertEqual(list(actual.items()), list(expected.items()), dialect)
+
+    def test_streaming_drops_binary_data(self):
+        tree = nmrMLmeta(EXAMPLE, self.ontology, streaming=True).tree
+        tags = {element.tag.rsplit('}', 1)[-1] for element in tree.iter()}
+        self.assertNotIn('fidData', tags)
+        self.assertNotIn('spectrumDataArray', tags)
+        self.assertNotIn('cvList', tags)
+        self.assertIn('spectrum1D', tags)
+
+    def test_early_exit_same_meta(self):
+        for dialect, path in self.files.items():
+            expected = nmrMLmeta(path, self.ontology).meta
+            actual = nmrMLmeta(path, self.ontology, early_exit=True)
+            self.assertEqual(list(actual.meta.items()), list(expected.items()), dialect)
+            self.assertEqual(actual.file_size, os.path.getsize(path))
+
+    def test_early_exit_stops_reading(self):
+        path = self.files['spectrumlist']
+        tree, bytes_read = parse_metadata(path, nmrMLmeta._sections, nmrMLmeta._first_sections,
+                                          early_exit=True, chunk_size=256)
+        self.assertLess(bytes_read, os.path.getsize(path))
+        tags = {element.tag.rsplit('}', 1)[-1] for element in tree.iter()}
+        self.assertIn('acquisitionParameterSet', tags)
+        _, bytes_read = parse_metadata(path, nmrMLmeta._sections, chunk_size=256)
+        self.assertEqual(bytes_read, os.path.getsize(path))
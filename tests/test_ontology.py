@@ -0,0 +1,80 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pronto
+
+from nmrml2isa.ontology import OntologyIndex, load_index
+from nmrml2isa.utils import NMR_CV_PATH
+
+
+
+class TestOntologyIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ontology = pronto.Ontology(NMR_CV_PATH, False)
+        cls.index = OntologyIndex.from_ontology(cls.ontology)
+
+    def test_roots_match_rchildren(self):
+        for root in OntologyIndex.ROOTS:
+            expected = [term.id for term in self.ontology[root].rchildren()]
+            self.assertEqual([term.id for term in self.index.terms(root)], expected)
+            self.assertEqual(self.index.descendants(root), frozenset(expected))
+
+    def test_is_a(self):
+        self.assertTrue(self.index.is_a('NMR:1000122', 'NMR:1000031'))
+        self.assertFalse(self.index.is_a('NMR:1000031', 'NMR:1000031'))
+        self.assertFalse(self.index.is_a('NMR:1400191', 'NMR:1000031'))
+
+    def test_unindexed_root(self):
+        term = next(t for t in self.ontology if t.children)
+        expected = frozenset(t.id for t in term.rchildren())
+        self.assertEqual(self.index.descendants(term.id), expected)
+
+
+class TestOntologySnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_snapshot_roundtrip(self):
+        built = load_index(cache_dir=self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        cached = load_index(cache_dir=self.cache_dir)
+        for root in OntologyIndex.ROOTS:
+            self.assertEqual(cached.terms(root), built.terms(root))
+            self.assertEqual(cached.descendants(root), built.descendants(root))
+
+    def test_snapshot_keyed_by_roots(self):
+        load_index(cache_dir=self.cache_dir)
+        index = load_index(cache_dir=self.cache_dir, roots=['NMR:1400014'])
+        self.assertEqual(index.roots, ('NMR:1400014',))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_corrupted_snapshot_is_rebuilt(self):
+        load_index(cache_dir=self.cache_dir)
+        snapshot = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(snapshot, 'w') as f:
+            f.write('{')
+        index = load_index(cache_dir=self.cache_dir)
+        self.assertTrue(index.is_a('NMR:1000122', 'NMR:1000031'))
+
+    def test_failed_snapshot_is_removed(self):
+        load_index(cache_dir=self.cache_dir)
+        name = os.listdir(self.cache_dir)[0]
+        # a directory in the way of the snapshot makes renaming it fail
+        os.remove(os.path.join(self.cache_dir, name))
+        os.makedirs(os.path.join(self.cache_dir, name, 'blocked'))
+        index = load_index(cache_dir=self.cache_dir)
+        self.assertTrue(index.is_a('NMR:1000122', 'NMR:1000031'))
+        self.assertEqual(os.listdir(self.cache_dir), [name])
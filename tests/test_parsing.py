@@ -0,0 +1,279 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import filecmp
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+
+from . import utils
+import nmrml2isa.cache
+import nmrml2isa.nmrml
+import nmrml2isa.parsing
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestConvert(unittest.TestCase):
+
+    study_id = 'TEST'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.in_dir = tempfile.mkdtemp()
+        for i in range(8):
+            shutil.copy(EXAMPLE, os.path.join(cls.in_dir, 'sample{}.nmrML'.format(i)))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.in_dir)
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+        warnings.simplefilter(warnings.defaultaction)
+
+    def convert(self, name, study_id=study_id, in_dir=None, **kwargs):
+        out_dir = os.path.join(self.out_dir, name)
+        nmrml2isa.parsing.convert(in_dir or self.in_dir, out_dir, study_id, quiet=True, **kwargs)
+        return os.path.join(out_dir, study_id)
+
+    def assertSameIsa(self, expected, actual):
+        files = sorted(os.listdir(expected))
+        self.assertEqual(files, sorted(os.listdir(actual)))
+        _, mismatch, errors = filecmp.cmpfiles(expected, actual, files, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+    def test_processes(self):
+        expected = self.convert('serial')
+        self.assertSameIsa(expected, self.convert('processes', jobs=3, processes=True))
+
+    def test_threads(self):
+        expected = self.convert('serial')
+        self.assertSameIsa(expected, self.convert('threads', jobs=3))
+
+    def test_archive_processes(self):
+        archive = shutil.make_archive(os.path.join(self.out_dir, 'study'), 'zip', self.in_dir)
+        nmrml2isa.parsing.convert(archive, os.path.join(self.out_dir, 'serial'), self.study_id, quiet=True)
+        nmrml2isa.parsing.convert(archive, os.path.join(self.out_dir, 'processes'), self.study_id,
+                                  quiet=True, jobs=3, processes=True)
+        self.assertSameIsa(os.path.join(self.out_dir, 'serial', self.study_id),
+                           os.path.join(self.out_dir, 'processes', self.study_id))
+
+    def test_prefetch(self):
+        expected = self.convert('serial')
+        self.assertSameIsa(expected, self.convert('prefetch', prefetch=2))
+        self.assertSameIsa(expected, self.convert('prefetch_threads', prefetch=3, jobs=3, io_jobs=1))
+
+    def test_cache(self):
+        expected = self.convert('serial')
+        cache = os.path.join(self.out_dir, 'cache.sqlite')
+        self.assertSameIsa(expected, self.convert('cold', cache=cache))
+        self.assertSameIsa(expected, self.convert('warm', cache=cache, jobs=3))
+
+    def test_cache_concurrent(self):
+        expected = self.convert('serial')
+        cache = os.path.join(self.out_dir, 'cache.sqlite')
+        errors = []
+        def convert(name):
+            try:
+                self.convert(name, cache=cache, jobs=2)
+            except Exception as err:
+                errors.append(err)
+        # a conversion in progress, which already stored some metadata
+        with nmrml2isa.cache.MetadataCache(cache) as running:
+            running.put(EXAMPLE, nmrml2isa.nmrml.nmrMLmeta(EXAMPLE).meta)
+            threads = [threading.Thread(target=convert, args=('concurrent{}'.format(i),)) for i in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        for i in range(2):
+            self.assertSameIsa(expected, os.path.join(self.out_dir, 'concurrent{}'.format(i), self.study_id))
+
+    def test_cache_updated(self):
+        # records updated between their lookup and their retrieval are
+        # parsed again, without starting a second parsing pipeline (the
+        # inputs are modified, so this works on a copy of them)
+        in_dir = os.path.join(self.out_dir, 'input')
+        shutil.copytree(self.in_dir, in_dir)
+        expected = self.convert('serial', in_dir=in_dir)
+        cache = os.path.join(self.out_dir, 'cache.sqlite')
+        self.convert('cold', in_dir=in_dir, cache=cache)
+        stale = os.path.join(in_dir, 'sample3.nmrML')
+        os.utime(stale, (0, 0))
+
+        class StaleCache(nmrml2isa.parsing.MetadataCache):
+            def get(self, filepath, signature=None):
+                return None
+
+        pipelines = []
+        parse_in_threads = nmrml2isa.parsing._parse_in_threads
+        def counting(*args, **kwargs):
+            pipelines.append(args[0])
+            return parse_in_threads(*args, **kwargs)
+
+        nmrml2isa.parsing.MetadataCache, cache_class = StaleCache, nmrml2isa.parsing.MetadataCache
+        nmrml2isa.parsing._parse_in_threads = counting
+        try:
+            actual = self.convert('stale', in_dir=in_dir, cache=cache, jobs=3, prefetch=1)
+        finally:
+            nmrml2isa.parsing.MetadataCache = cache_class
+            nmrml2isa.parsing._parse_in_threads = parse_in_threads
+        self.assertSameIsa(expected, actual)
+        self.assertEqual(len(pipelines), 1)
+
+    def test_statistics_cache(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        cache = os.path.join(self.out_dir, 'cache.sqlite')
+        expected = self.convert('serial', statistics=True)
+        self.convert('plain', cache=cache)
+        self.assertSameIsa(expected, self.convert('statistics', cache=cache, statistics=True))
+
+    def test_profile(self):
+        prefix = os.path.join(self.out_dir, 'profile')
+        self.assertSameIsa(self.convert('serial'), self.convert('profiled', profile=prefix, jobs=3, processes=True))
+        with open('{}.summary.json'.format(prefix)) as f:
+            summary = json.load(f)
+        for stage in ('ontology', 'discovery', 'parse', 'xml', 'extract', 'study', 'assay'):
+            self.assertIn(stage, summary['stages'])
+        self.assertEqual(summary['stages']['parse']['count'], 8)
+        with open('{}.trace.json'.format(prefix)) as f:
+            self.assertTrue(json.load(f)['traceEvents'])
+
+    def test_columnar(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        from nmrml2isa.columnar import read_npz
+        expected = self.convert('serial')
+        actual = self.convert('columnar', columnar='npz')
+        npz = os.path.join(actual, '{}_metadata.npz'.format(self.study_id))
+        os.remove(npz)
+        self.assertSameIsa(expected, actual)
+        streamed = self.convert('threads', columnar='npz', jobs=3)
+        table = read_npz(os.path.join(streamed, '{}_metadata.npz'.format(self.study_id)))
+        self.assertEqual(sorted(table['Sample Name[value]']), ['sample{}'.format(i) for i in range(8)])
+
+    def test_convert_many(self):
+        studies = [
+            nmrml2isa.parsing.Study(self.in_dir, os.path.join(self.out_dir, 'many'), 'A'),
+            nmrml2isa.parsing.Study(self.in_dir, os.path.join(self.out_dir, 'many'), 'B'),
+        ]
+        nmrml2isa.parsing.convert_many(studies, quiet=True, jobs=3)
+        for study in studies:
+            expected = self.convert('single', study.study_identifier)
+            self.assertSameIsa(expected, os.path.join(study.out_path, study.study_identifier))
+
+    def test_batch_manifest(self):
+        manifest = os.path.join(self.out_dir, 'manifest.tsv')
+        out_path = os.path.join(self.out_dir, 'batch')
+        with open(manifest, 'w') as f:
+            f.write('study_id\tin_path\tout_path\n')
+            f.write('{}\t{}\t{}\n'.format(self.study_id, self.in_dir, out_path))
+        nmrml2isa.parsing.main(['batch', manifest, '-q', '-W', 'ignore'])
+        self.assertSameIsa(self.convert('serial'), os.path.join(out_path, self.study_id))
+
+
+class TestIterMetadata(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.in_dir = tempfile.mkdtemp()
+        cls.files = [os.path.join(cls.in_dir, 'sample{}.nmrML'.format(i)) for i in range(8)]
+        for filepath in cls.files:
+            shutil.copy(EXAMPLE, filepath)
+        cls.expected = nmrml2isa.nmrml.nmrMLmeta(EXAMPLE).meta
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.in_dir)
+
+    def assertMetadata(self, results, files):
+        self.assertEqual([source for source, _ in results], files)
+        for source, meta in results:
+            self.assertEqual(meta['Sample Name'].value, os.path.splitext(os.path.basename(source))[0])
+            self.assertEqual(meta['Acquisition Nucleus'], self.expected['Acquisition Nucleus'])
+
+    def test_serial(self):
+        self.assertMetadata(list(nmrml2isa.parsing.iter_metadata(self.in_dir)), self.files)
+
+    def test_threads(self):
+        results = nmrml2isa.parsing.iter_metadata(self.in_dir, jobs=3, max_in_flight=2)
+        self.assertMetadata(list(results), self.files)
+        results = nmrml2isa.parsing.iter_metadata(self.in_dir, jobs=3, ordered=False)
+        self.assertMetadata(sorted(results, key=lambda r: r[0]), self.files)
+
+    def test_processes(self):
+        results = nmrml2isa.parsing.iter_metadata(self.in_dir, jobs=3, processes=True)
+        self.assertMetadata(list(results), self.files)
+        results = nmrml2isa.parsing.iter_metadata(self.in_dir, jobs=3, processes=True, ordered=False)
+        self.assertMetadata(sorted(results, key=lambda r: r[0]), self.files)
+
+    def test_glob(self):
+        pattern = os.path.join(self.in_dir, 'sample[0-2].nmrML')
+        self.assertMetadata(list(nmrml2isa.parsing.iter_metadata(pattern, jobs=2)), self.files[:3])
+
+    def test_archive(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            archive = shutil.make_archive(os.path.join(tmpdir, 'study'), 'zip', self.in_dir)
+            results = list(nmrml2isa.parsing.iter_metadata(archive, jobs=2))
+            self.assertEqual([source.name for source, _ in results], [os.path.basename(f) for f in self.files])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_close(self):
+        results = nmrml2isa.parsing.iter_metadata(self.in_dir, jobs=2, max_in_flight=1, ordered=False)
+        next(results)
+        results.close()
+
+
+class TestReadManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.tmpdir, 'manifest')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_json(self):
+        with open(self.manifest, 'w') as f:
+            f.write('[{"in_path": "a", "out_path": "b", "study_id": "C", "usermeta": "d.json"},'
+                    ' {"in_path": "e", "out_path": "f", "study_id": "G"}]')
+        self.assertEqual(nmrml2isa.parsing.read_manifest(self.manifest), [
+            ('a', 'b', 'C', 'd.json'), ('e', 'f', 'G', None),
+        ])
+
+    def test_tsv(self):
+        with open(self.manifest, 'w') as f:
+            f.write('in_path\tout_path\tstudy_id\tusermeta\n')
+            f.write('# a comment\n')
+            f.write('a\tb\tC\td.json\n')
+            f.write('e\tf\tG\t\n')
+        self.assertEqual(nmrml2isa.parsing.read_manifest(self.manifest), [
+            ('a', 'b', 'C', 'd.json'), ('e', 'f', 'G', None),
+        ])
+
+
+class TestReorder(unittest.TestCase):
+
+    def test_reorder(self):
+        results = [(2, 'c'), (0, 'a'), (3, 'd'), (1, 'b')]
+        self.assertEqual(list(nmrml2isa.parsing._reorder(results)), ['a', 'b', 'c', 'd'])
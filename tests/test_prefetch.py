@@ -0,0 +1,84 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nmrml2isa.prefetch import Prefetcher
+
+
+class CountingPrefetcher(Prefetcher):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingPrefetcher, self).__init__(*args, **kwargs)
+        self.started = 0
+        self.count_lock = threading.Lock()
+
+    def _read(self, source):
+        with self.count_lock:
+            self.started += 1
+        return super(CountingPrefetcher, self)._read(source)
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(20):
+            self.paths.append(os.path.join(self.tmpdir, '{:02}.nmrML'.format(i)))
+            with open(self.paths[-1], 'wb') as f:
+                f.write(b'x' * i)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_order_and_contents(self):
+        prefetcher = Prefetcher(depth=3, threads=2)
+        for path, prefetched in zip(self.paths, prefetcher.iter(self.paths)):
+            self.assertEqual(prefetched.name, path)
+            with contextlib.closing(prefetched.open()) as handle:
+                with open(path, 'rb') as f:
+                    self.assertEqual(handle.read(), f.read())
+            self.assertEqual(prefetched.size, os.path.getsize(path))
+        self.assertEqual(prefetcher.bytes_read, sum(range(20)))
+        self.assertGreaterEqual(prefetcher.wait, 0)
+
+    def test_bounded(self):
+        prefetcher = CountingPrefetcher(depth=3, threads=2)
+        closed = 0
+        for prefetched in prefetcher.iter(self.paths):
+            self.assertLessEqual(prefetcher.started - closed, 3)
+            prefetched.open().close()
+            closed += 1
+        self.assertEqual(closed, len(self.paths))
+
+    def test_read_error(self):
+        prefetcher = Prefetcher(depth=1, threads=1)
+        paths = [os.path.join(self.tmpdir, 'missing.nmrML')] + self.paths[:2]
+        files = prefetcher.iter(paths)
+        self.assertRaises(IOError, next(files).open)
+        # the slot of the failed file was freed
+        prefetched = next(files)
+        prefetched.open().close()
+        self.assertEqual(prefetched.name, paths[1])
+
+    def test_consumed(self):
+        prefetcher = Prefetcher(depth=1, threads=1)
+        files = prefetcher.iter(self.paths)
+        prefetched = next(files)
+        prefetched.open().close()
+        self.assertRaises(ValueError, prefetched.open)
+        files.close()
+
+    def test_threads_joined(self):
+        threads = threading.active_count()
+        for prefetched in Prefetcher(depth=3, threads=2).iter(self.paths):
+            prefetched.open().close()
+        self.assertEqual(threading.active_count(), threads)
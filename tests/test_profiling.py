@@ -0,0 +1,74 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nmrml2isa.profiling import Profiler, NULL_PROFILER
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_spans(self):
+        profiler = Profiler()
+        with profiler.span('convert'):
+            for name in ('a.nmrML', 'b.nmrML'):
+                with profiler.span('parse', 'file', file=name):
+                    sum(range(1000))
+        self.assertEqual([e['name'] for e in profiler.events], ['parse', 'parse', 'convert'])
+        outer = profiler.events[-1]
+        for event in profiler.events[:-1]:
+            self.assertGreaterEqual(event['start'], outer['start'])
+            self.assertLessEqual(event['wall'], outer['wall'])
+
+    def test_summary(self):
+        profiler = Profiler()
+        profiler.record('parse', 'file', 10.0, 2.0, 1.0, {'file': 'a.nmrML'})
+        profiler.record('parse', 'file', 12.0, 4.0, 3.0, {'file': 'b.nmrML'})
+        profiler.record('ontology', 'stage', 9.0, 1.0, 1.0)
+        summary = profiler.summary()
+        self.assertEqual(list(summary['stages']), ['ontology', 'parse'])
+        parse = summary['stages']['parse']
+        self.assertEqual((parse['count'], parse['wall'], parse['cpu']), (2, 6.0, 4.0))
+        self.assertEqual((parse['wall_mean'], parse['wall_max']), (3.0, 4.0))
+        self.assertEqual([f['file'] for f in summary['files']], ['a.nmrML', 'b.nmrML'])
+
+    def test_trace(self):
+        profiler = Profiler()
+        profiler.record('ontology', 'stage', 9.0, 1.0, 0.5)
+        profiler.record('parse', 'file', 10.0, 2.0, 1.0, {'file': 'a.nmrML'})
+        events = profiler.trace()['traceEvents']
+        self.assertEqual([(e['ph'], e['ts'], e['dur']) for e in events],
+                         [('X', 0.0, 1e6), ('X', 1e6, 2e6)])
+        self.assertEqual(events[1]['args'], {'file': 'a.nmrML'})
+
+    def test_save(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        profiler = Profiler()
+        with profiler.span('convert'):
+            pass
+        summary, trace = profiler.save(os.path.join(tmpdir, 'profile'))
+        with open(summary) as f:
+            self.assertIn('convert', json.load(f)['stages'])
+        with open(trace) as f:
+            self.assertEqual(len(json.load(f)['traceEvents']), 1)
+
+    def test_drain_and_extend(self):
+        worker, main = Profiler(), Profiler()
+        with worker.span('parse', 'file'):
+            pass
+        main.extend(worker.drain())
+        self.assertEqual(worker.events, [])
+        self.assertEqual(len(main.events), 1)
+
+    def test_null_profiler(self):
+        with NULL_PROFILER.span('convert', file='a.nmrML'):
+            pass
+        self.assertFalse(NULL_PROFILER.enabled)
+        self.assertEqual(NULL_PROFILER.drain(), [])
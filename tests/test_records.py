@@ -0,0 +1,90 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import collections
+import json
+import pickle
+import unittest
+
+from nmrml2isa.records import Record, compact, json_default
+from nmrml2isa.utils import CompiledTemplate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.term = Record([
+            ('value', 1.5),
+            ('name', 'pulse width'),
+            ('unit', {'name': 'microsecond', 'ref': 'UO', 'accession': 'UO_0000029'}),
+        ])
+
+    def test_mapping(self):
+        self.assertEqual(list(self.term), ['value', 'name', 'unit'])
+        self.assertEqual(self.term['unit']['ref'], 'UO')
+        self.assertIsInstance(self.term['unit'], Record)
+        self.assertNotIn('ref', self.term)
+        self.assertRaises(KeyError, self.term.__getitem__, 'ref')
+        self.assertRaises(KeyError, self.term.__getitem__, 'entry_list')
+        self.assertEqual(self.term, {'value': 1.5, 'name': 'pulse width',
+                                     'unit': {'name': 'microsecond', 'ref': 'UO',
+                                              'accession': 'http://purl.obolibrary.org/obo/UO_0000029'}})
+
+    def test_mutable(self):
+        self.term['ref'] = 'NMRCV'
+        self.assertEqual(list(self.term)[-1], 'ref')
+        del self.term['value']
+        self.assertEqual(len(self.term), 3)
+        self.assertRaises(KeyError, self.term.__setitem__, 'entry_list', [])
+        copy = self.term.copy()
+        copy['name'] = 'other'
+        self.assertEqual(self.term['name'], 'pulse width')
+
+    def test_compact(self):
+        other = Record(name=''.join(['pulse', ' width']))
+        self.assertIs(other['name'], self.term['name'])
+        self.assertIs(other._keys, Record(name='x')._keys)
+        self.assertFalse(hasattr(self.term, '__dict__'))
+
+    def test_repr(self):
+        self.assertEqual(repr(self.term), repr(self.term.as_dict()))
+        template = CompiledTemplate('{Term[unit][name]} {Term[name]} {Term[ref]}')
+        self.assertEqual(template.render({'Term': self.term}), 'microsecond pulse width ')
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.term)), self.term)
+
+    def test_json(self):
+        meta = collections.OrderedDict([
+            ('Sample Name', Record(value='a')),
+            ('Pulse Width', self.term),
+            ('Data Transformation Name', {'entry_list': [Record(name='b')]}),
+            ('study_contacts', [{'first_name': 'c'}]),
+        ])
+        dumped = json.dumps(meta, default=json_default)
+        loaded = json.loads(dumped, object_pairs_hook=collections.OrderedDict)
+        self.assertEqual(loaded, meta)
+        restored = compact(loaded)
+        self.assertIsInstance(restored['Pulse Width'], Record)
+        self.assertIsInstance(restored['Data Transformation Name']['entry_list'][0], Record)
+        self.assertNotIsInstance(restored['study_contacts'][0], Record)
+        self.assertEqual(json.dumps(restored, default=json_default), dumped)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_json_numpy(self):
+        meta = {'Number of points': Record(value=numpy.int64(16)),
+                'Non-finite points': Record(value=numpy.bool_(False)),
+                'Noise level': Record(value=numpy.float32(0.5))}
+        loaded = compact(json.loads(json.dumps(meta, default=json_default)))
+        self.assertEqual(loaded, {'Number of points': Record(value=16),
+                                  'Non-finite points': Record(value=False),
+                                  'Noise level': Record(value=0.5)})
+        self.assertIsInstance(loaded['Number of points'].value, int)
+        self.assertIsInstance(loaded['Non-finite points'].value, bool)
@@ -0,0 +1,136 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import filecmp
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import warnings
+
+from . import utils
+import nmrml2isa.parsing
+from nmrml2isa.cache import MetadataCache
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.server import Client, ConversionServer, ServerError, make_server
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+class TestServer(unittest.TestCase):
+
+    study_id = 'TEST'
+    options = dict(jobs=2)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.in_dir = tempfile.mkdtemp()
+        for i in range(4):
+            shutil.copy(EXAMPLE, os.path.join(cls.in_dir, 'sample{}.nmrML'.format(i)))
+        cls.out_dir = tempfile.mkdtemp()
+        warnings.simplefilter('ignore')
+        nmrml2isa.parsing.convert(cls.in_dir, os.path.join(cls.out_dir, 'expected'), cls.study_id, quiet=True)
+        cls.converter = ConversionServer(max_jobs=2, **cls.options)
+        cls.server = make_server(cls.converter, port=0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+        cls.client = Client(port=cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        cls.converter.close()
+        shutil.rmtree(cls.in_dir)
+        shutil.rmtree(cls.out_dir)
+        warnings.simplefilter(warnings.defaultaction)
+
+    def assertSameIsa(self, expected, actual):
+        files = sorted(os.listdir(expected))
+        self.assertEqual(files, sorted(os.listdir(actual)))
+        _, mismatch, errors = filecmp.cmpfiles(expected, actual, files, shallow=False)
+        self.assertEqual(mismatch + errors, [])
+
+    def test_submit(self):
+        names = ['a', 'b', 'c']
+        jobs = [self.client.submit(self.in_dir, os.path.join(self.out_dir, name), self.study_id) for name in names]
+        for name, job in zip(names, jobs):
+            job = self.client.wait(job['id'])
+            self.assertEqual(job['status'], 'done', job['error'])
+            self.assertGreaterEqual(job['run_time'], 0)
+            self.assertSameIsa(os.path.join(self.out_dir, 'expected', self.study_id),
+                               os.path.join(self.out_dir, name, self.study_id))
+        self.assertGreaterEqual(self.client.status()['done'], 3)
+        self.assertLessEqual(set(job['id'] for job in jobs), set(job['id'] for job in self.client.jobs()))
+
+    def test_failed(self):
+        job = self.client.submit(os.path.join(self.out_dir, 'missing'), self.out_dir, self.study_id)
+        job = self.client.wait(job['id'], timeout=30)
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['error'])
+
+    def test_errors(self):
+        with self.assertRaises(ServerError) as ctx:
+            self.client.job(12345)
+        self.assertEqual(ctx.exception.status, 404)
+        with self.assertRaises(ServerError) as ctx:
+            self.client._request('POST', '/jobs', {'in_path': self.in_dir})
+        self.assertEqual(ctx.exception.status, 400)
+
+
+class TestServerProcesses(TestServer):
+
+    options = dict(jobs=2, processes=True)
+
+
+class TestServerCache(TestServer):
+
+    options = dict(jobs=2, cache=True)
+
+    def test_cache_in_use(self):
+        # a conversion in progress, which already stored some metadata
+        with MetadataCache() as running:
+            running.put(EXAMPLE, nmrMLmeta(EXAMPLE).meta)
+            self.test_submit()
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets are not supported")
+class TestUnixServer(unittest.TestCase):
+
+    def test_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        socket_path = os.path.join(tmpdir, 'server.sock')
+        converter = ConversionServer()
+        server = make_server(converter, socket_path=socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            shutil.copy(EXAMPLE, tmpdir)
+            client = Client(socket_path=socket_path)
+            job = client.wait(client.submit(tmpdir, tmpdir, 'TEST')['id'])
+            self.assertEqual(job['status'], 'done', job['error'])
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, 'TEST', 'i_Investigation.txt')))
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            converter.close()
+        self.assertFalse(os.path.exists(socket_path))
+        shutil.rmtree(tmpdir)
+
+    def test_socket_path_not_a_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'data.txt')
+            with open(path, 'w') as f:
+                f.write('not a socket')
+            self.assertRaises(ValueError, make_server, None, socket_path=path)
+            self.assertTrue(os.path.exists(path))
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,116 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import base64
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+import zlib
+
+from . import utils
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+
+try:
+    import numpy
+    from nmrml2isa.spectral import decode_array, fid_statistics, spectrum_statistics
+except ImportError:
+    numpy = None
+
+
+EXAMPLE = os.path.join(utils.TESTDIR, "data", "example.nmrML")
+
+
+def encode(array, compressed=True, width=None):
+    data = array.tobytes()
+    text = base64.b64encode(zlib.compress(data) if compressed else data).decode('ascii')
+    if width:
+        text = '\n'.join(text[i:i + width] for i in range(0, len(text), width))
+    return text
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestDecodeArray(unittest.TestCase):
+
+    def test_roundtrip(self):
+        array = numpy.linspace(-1, 1, 256 * 1024)
+        for compressed in (True, False):
+            decoded = decode_array(encode(array, compressed), 'float64', compressed, chunk_size=4093)
+            self.assertTrue(numpy.array_equal(decoded, array))
+
+    def test_wrapped(self):
+        array = numpy.arange(1000, dtype='<c16') * (1 + 2j)
+        decoded = decode_array(encode(array, width=76), 'Complex128', chunk_size=50)
+        self.assertTrue(numpy.array_equal(decoded, array))
+
+    def test_invalid(self):
+        array = numpy.arange(10, dtype='<f8')
+        self.assertRaises(KeyError, decode_array, encode(array), 'float16')
+        self.assertRaises(ValueError, decode_array, encode(array, compressed=False), 'float64')
+        self.assertRaises(ValueError, decode_array, encode(array)[:-1], 'float64')
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestStatistics(unittest.TestCase):
+
+    def test_spectrum(self):
+        intensities = numpy.random.RandomState(0).normal(0, 2.0, 65536)
+        intensities[1000] = 500.0
+        intensities[2000] = numpy.nan
+        stats = spectrum_statistics(intensities)
+        self.assertEqual(stats['Spectrum non-finite points'], 1)
+        self.assertEqual(stats['Spectrum maximum intensity'], 500.0)
+        self.assertAlmostEqual(stats['Spectrum noise level'], 2.0, delta=0.1)
+        self.assertAlmostEqual(stats['Spectrum signal to noise ratio'], 250, delta=15)
+
+    def test_spectrum_empty(self):
+        stats = spectrum_statistics(numpy.array([numpy.inf, numpy.nan]))
+        self.assertEqual(list(stats.items()), [('Spectrum non-finite points', 2)])
+
+    def test_fid(self):
+        stats = fid_statistics(numpy.array([3 + 4j, 1j, numpy.nan]))
+        self.assertEqual(stats['FID non-finite points'], 1)
+        self.assertEqual(stats['FID maximum magnitude'], 5.0)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestNmrMLStatistics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ontology = load_index(cache_dir=False)
+
+    def test_statistics(self):
+        meta = nmrMLmeta(EXAMPLE, self.ontology, statistics=True).meta
+        self.assertEqual(meta['FID non-finite points']['value'], 0)
+        self.assertEqual(meta['FID maximum magnitude']['value'], 500.0)
+        self.assertEqual(meta['Spectrum maximum intensity']['value'], 1005.69)
+        self.assertGreater(meta['Spectrum signal to noise ratio']['value'], 100)
+        self.assertNotIn('FID non-finite points', nmrMLmeta(EXAMPLE, self.ontology).meta)
+
+    def test_streaming(self):
+        expected = nmrMLmeta(EXAMPLE, self.ontology, statistics=True).meta
+        for options in (dict(streaming=True), dict(early_exit=True)):
+            meta = nmrMLmeta(EXAMPLE, self.ontology, statistics=True, **options).meta
+            self.assertEqual(meta, expected)
+
+    def test_invalid(self):
+        with open(EXAMPLE, 'rb') as f:
+            contents = f.read().replace(b'byteFormat="float64"', b'byteFormat="float16"')
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'invalid.nmrML')
+            with open(path, 'wb') as f:
+                f.write(contents)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                meta = nmrMLmeta(path, self.ontology, statistics=True).meta
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertIn('FID maximum magnitude', meta)
+        self.assertNotIn('Spectrum maximum intensity', meta)
+        self.assertEqual(len(caught), 1)
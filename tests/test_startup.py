@@ -0,0 +1,65 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import os
+import subprocess
+import sys
+import unittest
+
+from . import utils
+
+
+#: the cold-start budget of the command line interface, in milliseconds
+#: (the time taken to import `nmrml2isa.parsing`, best of `RUNS`)
+IMPORT_TIME_BUDGET = float(os.environ.get('NMRML2ISA_IMPORT_BUDGET', 250))
+
+#: the number of interpreters started to measure the import time
+RUNS = 3
+
+#: the modules that must only be imported by the code paths using them
+LAZY_MODULES = [
+    'multiprocessing', 'numpy', 'openpyxl', 'progressbar',
+    'pronto', 'pyarrow', 'sqlite3', 'tarfile', 'zipfile',
+]
+
+
+def import_times(module):
+    """Import *module* in a new interpreter, and get the ``-X importtime`` figures.
+
+    Returns:
+        dict: the cumulative import time of each imported module, in
+        microseconds
+    """
+    env = dict(os.environ, PYTHONPATH=utils.MAINDIR)
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    _, err = process.communicate()
+    if process.returncode:
+        raise RuntimeError(err.decode('utf-8', 'replace'))
+    times = {}
+    for line in err.decode('utf-8').splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            try:
+                times[name.strip()] = int(cumulative)
+            except ValueError:  # the header line
+                pass
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7")
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        imported = set(import_times('nmrml2isa.parsing'))
+        self.assertEqual([m for m in LAZY_MODULES if m in imported], [])
+
+    def test_import_time(self):
+        elapsed = min(import_times('nmrml2isa.parsing')['nmrml2isa.parsing'] for _ in range(RUNS)) / 1000
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET,
+                        "importing nmrml2isa.parsing took {:.0f}ms (budget: {:.0f}ms)".format(
+                            elapsed, IMPORT_TIME_BUDGET))
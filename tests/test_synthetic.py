@@ -0,0 +1,44 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import shutil
+import tempfile
+import unittest
+
+from . import synthetic
+from nmrml2isa.nmrml import nmrMLmeta
+from nmrml2isa.ontology import load_index
+
+
+class TestSynthetic(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ontology = load_index(cache_dir=False)
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_deterministic(self):
+        self.assertEqual(synthetic.make_nmrml(seed=1), synthetic.make_nmrml(seed=1))
+        self.assertNotEqual(synthetic.make_nmrml(seed=1), synthetic.make_nmrml(seed=2))
+
+    def test_dialects(self):
+        paths = synthetic.write_corpus(self.tmpdir, 8, contacts=3, processing_methods=4)
+        self.assertEqual(len(paths), 8)
+        for path, dialect in zip(paths, synthetic.DIALECTS * 2):
+            meta = nmrMLmeta(path, self.ontology).meta
+            self.assertEqual(len(meta['study_contacts']), 3, dialect)
+            self.assertEqual(len(meta['Data Transformation Name']['entry_list']), 4, dialect)
+            self.assertIn('Instrument manufacturer', meta, dialect)
+
+    def test_points(self):
+        small = synthetic.make_nmrml(points=16, seed=0)
+        large = synthetic.make_nmrml(points=4096, seed=0)
+        self.assertGreater(len(large), len(small))
+        self.assertIn('numberOfDataPoints="4096"', large)
@@ -0,0 +1,43 @@
+from __future__ import (
+    absolute_import,
+    unicode_literals,
+)
+
+import unittest
+
+from nmrml2isa.utils import ChainMap, CompiledTemplate, PermissiveFormatter
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    meta = {
+        'Sample Name': {'value': 'sample1'},
+        'Temperature': {'value': 300.0, 'unit': {'name': 'kelvin'}},
+        'Data Transformation Name': {'entry_list': [{'name': 'Fourier transform'}]},
+        'Number of transients': {'value': 128},
+        'Nothing': None,
+    }
+    usermeta = {'study': {'title': 'Awesome Study'}, 'Sample Name': {'value': 'shadowed'}}
+
+    templates = [
+        'Extraction',
+        '{Sample Name[value]}',
+        '"{Temperature[value]}"\t"{Temperature[unit][name]}"\n',
+        '{Data Transformation Name[entry_list][0][name]}',
+        '{Data Transformation Name[entry_list][1][name]}',
+        '{Missing[value]}',
+        '{Nothing[value]}',
+        '{study[title]} ({Number of transients[value]:05d})',
+        '{Sample Name[value]:d}',
+        '{Sample Name[value]!r}',
+        '{Temperature.value}',
+        '{{escaped}} {0}',
+        'auto {}',
+        '{Number of transients[value]:{Sample Name[value]}}',
+    ]
+
+    def test_same_as_formatter(self):
+        fmt = PermissiveFormatter()
+        for template in self.templates:
+            expected = fmt.vformat(template, None, ChainMap(self.meta, self.usermeta))
+            self.assertEqual(CompiledTemplate(template).render(self.meta, self.usermeta), expected, template)
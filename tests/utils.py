@@ -31,6 +31,11 @@ else:
     config_directory = tempfile.mkdtemp()
     studies_directory = tempfile.mkdtemp()
 
+# keep the ontology snapshots and metadata caches written by the tests
+# out of the user cache directory (worker processes inherit it as well)
+cache_directory = tempfile.mkdtemp()
+os.environ['NMRML2ISA_CACHE_DIR'] = cache_directory
+
 def vprint(*args, **kwargs):
     if VERBOSE:
         print(*args, **kwargs)
@@ -94,6 +99,7 @@ def download_configuration_files(dl_directory=None):
     return dl_directory
 
 def cleanUp():
+    shutil.rmtree(cache_directory, ignore_errors=True)
     if not IN_CI:
         shutil.rmtree(config_directory)
         shutil.rmtree(studies_directory)